@@ -1,13 +1,15 @@
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Board, Card
-from users.models import Notification
+from .models import Board, List, Card
+from users.dashboard import touch_board, touch_user
+from users.models import User
+from users.notifications import notify, notify_board
 
 @receiver(post_save, sender=Board)
 def create_board_notification(sender, instance, created, **kwargs):
     if created:
-        Notification.objects.create(
-            user=instance.owner,
+        notify(
+            [instance.owner_id],
             title="New board created",
             message=f"Your new board '{instance.title}' has been created."
         )
@@ -15,7 +17,6 @@ def create_board_notification(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Board)
 def create_default_lists(sender, instance, created, **kwargs):
     if created:
-        from .models import List  # Import here to avoid circular
         List.objects.bulk_create([
             List(board=instance, title='To Plan', position=0),
             List(board=instance, title='In Progress', position=1),
@@ -25,11 +26,46 @@ def create_default_lists(sender, instance, created, **kwargs):
 
 @receiver(m2m_changed, sender=Card.assigned_members.through)
 def card_assigned_notification(sender, instance, action, pk_set, **kwargs):
-    if action == 'post_add':
-        for pk in pk_set:
-            user = instance.assigned_members.get(pk=pk)
-            Notification.objects.create(
-                user=user,
-                title="Task assigned to you",
-                message=f"You have been assigned to the task '{instance.title}' in board '{instance.list.board.title}'."
-            )
\ No newline at end of file
+    if action == 'post_add' and pk_set:
+        board_title = List.objects.filter(pk=instance.list_id).values_list('board__title', flat=True).first()
+        notify(
+            pk_set,
+            title="Task assigned to you",
+            message=f"You have been assigned to the task '{instance.title}' in board '{board_title}'."
+        )
+
+@receiver([post_save, post_delete], sender=Board)
+def invalidate_board_dashboards(sender, instance, created=False, **kwargs):
+    touch_board(instance.pk)
+    if created:
+        touch_user(instance.owner_id)
+
+@receiver(m2m_changed, sender=Board.members.through)
+def invalidate_member_dashboards(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        touch_board(instance.pk)
+        # Removed members still hold the board's token; added ones need a rebuild
+        if action == 'post_add' and pk_set:
+            touch_user(*pk_set)
+
+@receiver([post_save, post_delete], sender=List)
+def invalidate_list_dashboards(sender, instance, **kwargs):
+    touch_board(instance.board_id)
+
+@receiver([post_save, post_delete], sender=Card)
+def invalidate_card_dashboards(sender, instance, **kwargs):
+    touch_board(instance.list.board_id)
+
+@receiver(m2m_changed, sender=Board.members.through)
+def members_changed_notification(sender, instance, action, pk_set, **kwargs):
+    # Board.save adds the owner as a member; that is not news to anyone
+    if action not in ('post_add', 'post_remove') or not pk_set or pk_set == {instance.owner_id}:
+        return
+    names = ', '.join(User.objects.filter(pk__in=pk_set).order_by('username').values_list('username', flat=True))
+    verb = "joined" if action == 'post_add' else "left"
+    notify_board(
+        instance.pk, 'members_changed',
+        title="Board members changed",
+        message=f"{names} {verb} board '{instance.title}'.",
+        exclude_user_ids=pk_set
+    )
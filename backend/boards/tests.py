@@ -1,3 +1,58 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from travelkanban.caching import metrics
+from .models import Board, Card
 
-# Create your tests here.
+User = get_user_model()
+
+
+# Cached data is invalidated when writes commit, so these tests commit
+class BoardListCacheTest(APITransactionTestCase):
+    """Test cases for the cached board list."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com', password='testpass123')
+        self.board = Board.objects.create(title='Japan', owner=self.user)
+        self.board.members.add(self.friend)
+        self.url = reverse('boards')
+        self.tokens = {user.pk: RefreshToken.for_user(user).access_token for user in (self.user, self.friend)}
+        cache.clear()
+        metrics.reset()
+
+    def get_boards(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens[user.pk]}')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_repeat_reads_are_served_from_cache(self):
+        """Test that an unchanged list is served without queries."""
+        self.assertEqual(self.get_boards(self.user)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get_boards(self.user)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(metrics.snapshot()['BoardListCreateView'], {'hits': 1, 'misses': 1})
+
+    def test_writes_invalidate_dependent_lists(self):
+        """Test that card, membership and profile changes reach cached lists."""
+        self.get_boards(self.user)
+        self.get_boards(self.friend)
+
+        Card.objects.create(list=self.board.lists.first(), title='Book ryokan', position=0)
+        response = self.get_boards(self.user)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['lists'][0]['cards'][0]['title'], 'Book ryokan')
+
+        self.friend.first_name = 'Kenji'
+        self.friend.save()
+        members = self.get_boards(self.user).data['results'][0]['members']
+        self.assertIn('Kenji', [member['first_name'] for member in members])
+
+        self.board.members.remove(self.friend)
+        self.assertEqual(self.get_boards(self.friend).data['results'], [])
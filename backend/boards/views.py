@@ -6,12 +6,18 @@ from django.db import models
 from .models import Board, List, Card
 from .serializers import BoardSerializer, ListSerializer, CardSerializer
 from .permissions import IsBoardOwnerOrMember
+from travelkanban.caching import CachedResponseMixin, board_tag, user_tag
 from users.models import User
+from users.notifications import notify_board
 
-class BoardListCreateView(generics.ListCreateAPIView):
+class BoardListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
     serializer_class = BoardSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_cache_tags(self, request):
+        # Boards and their members, lists and cards are listed; new boards touch the user
+        return [user_tag(request.user.pk)] + [board_tag(pk) for pk in self.get_queryset().values_list('pk', flat=True)]
+
     def get_queryset(self):
         # Return boards where user is owner or member
         return Board.objects.filter(
@@ -126,7 +132,13 @@ class CardListCreateView(generics.ListCreateAPIView):
         board = get_object_or_404(Board, pk=self.kwargs['board_pk'])
         list_obj = get_object_or_404(List, pk=self.kwargs['list_pk'], board=board)
         self.check_object_permissions(self.request, board)
-        serializer.save(list=list_obj)
+        card = serializer.save(list=list_obj)
+        notify_board(
+            board.pk, 'card_created',
+            title="Card added",
+            message=f"{self.request.user.get_full_name()} added '{card.title}' to '{list_obj.title}' in board '{board.title}'.",
+            exclude_user_ids=[self.request.user.pk]
+        )
 
 class CardDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CardSerializer
@@ -220,6 +232,15 @@ class CardMoveView(generics.UpdateAPIView):
 
         instance.save()
 
+        if new_list != old_list:
+            board = old_list.board
+            notify_board(
+                board.pk, 'card_moved',
+                title="Card moved",
+                message=f"{self.request.user.get_full_name()} moved '{instance.title}' from '{old_list.title}' to '{new_list.title}' in board '{board.title}'.",
+                exclude_user_ids=[self.request.user.pk]
+            )
+
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_update(self.get_serializer(instance))
@@ -1,8 +1,25 @@
 from django.contrib import admin
-from .models import Expense
+from .models import Expense, BudgetTotal, MemberBalance, ExchangeRate
 
 @admin.register(Expense)
 class ExpenseAdmin(admin.ModelAdmin):
-    list_display = ('title', 'board', 'amount', 'category', 'date', 'created_by', 'created_at')
+    list_display = ('title', 'board', 'amount', 'currency', 'category', 'date', 'created_by', 'created_at')
     list_filter = ('board', 'category', 'date', 'created_by')
-    search_fields = ('title', 'notes')
\ No newline at end of file
+    search_fields = ('title', 'notes')
+
+@admin.register(BudgetTotal)
+class BudgetTotalAdmin(admin.ModelAdmin):
+    list_display = ('board', 'category', 'currency', 'total', 'expense_count')
+    list_filter = ('category', 'currency')
+    readonly_fields = ('board', 'category', 'currency', 'total', 'expense_count')
+
+@admin.register(MemberBalance)
+class MemberBalanceAdmin(admin.ModelAdmin):
+    list_display = ('board', 'user', 'currency', 'balance')
+    list_filter = ('currency',)
+    readonly_fields = ('board', 'user', 'currency', 'balance')
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'rate', 'updated_at')
+    search_fields = ('currency',)
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""Streaming CSV export of a board's expenses."""
+import csv
+from .rates import CENTS, MissingExchangeRate, conversion_factors
+
+EXPORT_CHUNK_SIZE = 1000
+
+# Spreadsheets evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def text_cell(value):
+    """Return user-supplied text for a CSV cell, quoted so spreadsheets never run it."""
+    value = value or ''
+    return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_expenses_csv(queryset, board):
+    """
+    Yield CSV lines for ``queryset`` with constant memory: rows are fetched in
+    chunks and written one at a time. Amounts are also given in the board's
+    currency, converting with one rate lookup per currency. Text cells that
+    would read as formulas are prefixed with a quote.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow([
+        'id', 'date', 'title', 'category', 'amount', 'currency',
+        f'amount_{board.currency.lower()}', 'notes', 'created_by', 'created_at',
+    ])
+
+    factors = {}
+    expenses = queryset.select_related('created_by').order_by('date', 'id').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for expense in expenses:
+        if expense.currency not in factors:
+            try:
+                factors[expense.currency] = conversion_factors([expense.currency], board.currency)[expense.currency]
+            except MissingExchangeRate:
+                factors[expense.currency] = None
+        factor = factors[expense.currency]
+
+        yield writer.writerow([
+            expense.pk,
+            expense.date.isoformat() if expense.date else '',
+            text_cell(expense.title),
+            text_cell(expense.category),
+            expense.amount,
+            expense.currency,
+            (expense.amount * factor).quantize(CENTS) if factor is not None else '',
+            text_cell(expense.notes),
+            text_cell(expense.created_by.email) if expense.created_by else '',
+            expense.created_at.isoformat(),
+        ])
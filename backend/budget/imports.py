@@ -0,0 +1,192 @@
+"""
+Bulk expense import from CSV files and OFX bank statements.
+
+Rows are parsed from the upload as a stream, validated with
+ExpenseSerializer and inserted with ``bulk_create`` in batches. Because
+``bulk_create`` skips model signals, the running totals are updated once per
+(category, date, currency) and a single summary notification is sent for the
+whole import.
+"""
+import codecs
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import Expense
+from .rates import MissingExchangeRate, convert_totals
+from .serializers import ExpenseSerializer
+from .totals import apply_expense_delta, notify_if_over_budget
+from users.notifications import notify, notify_board
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ROWS = 10000
+MAX_REPORTED_ERRORS = 50
+
+OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)')
+
+
+def iter_csv_rows(upload):
+    """
+    Yield ``(line_number, row)`` from a CSV upload with a header row. Empty
+    cells are dropped so optional fields fall back to their defaults. Files
+    that are not UTF-8 or not parseable CSV raise a ValidationError naming
+    the line.
+    """
+    reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            # Raised while reading the line after the last one counted
+            raise ValidationError({'file': [
+                f"Line {reader.line_num + 1} is not UTF-8 text. Save the file as CSV UTF-8 and try again."
+            ]})
+        except csv.Error as e:
+            raise ValidationError({'file': [f"Line {reader.line_num}: {e}"]})
+        yield reader.line_num, {
+            key.strip().lower(): value.strip()
+            for key, value in row.items()
+            if key and isinstance(value, str) and value.strip()
+        }
+
+
+def iter_ofx_rows(upload, category='misc'):
+    """
+    Yield ``(transaction_number, row)`` for the debits in an OFX statement.
+    Credits (refunds, deposits) are skipped since they are not expenses.
+    """
+    currency = None
+    txn = None
+    number = 0
+    for line in codecs.iterdecode(upload, 'utf-8', errors='replace'):
+        for closing, tag, value in OFX_TAG.findall(line):
+            value = value.strip()
+            if tag == 'CURDEF' and not closing:
+                currency = value
+            elif tag == 'STMTTRN':
+                if not closing:
+                    txn = {}
+                elif txn is not None:
+                    number += 1
+                    row = _ofx_transaction_row(txn, currency, category)
+                    if row is not None:
+                        yield number, row
+                    txn = None
+            elif txn is not None and not closing:
+                txn[tag] = value
+
+
+def _ofx_transaction_row(txn, currency, category):
+    try:
+        amount = Decimal(txn.get('TRNAMT', ''))
+    except InvalidOperation:
+        amount = None
+    if amount is not None and amount >= 0:
+        return None
+
+    row = {
+        'title': (txn.get('NAME') or txn.get('MEMO') or 'Imported expense')[:200],
+        'amount': str(-amount) if amount is not None else '',
+        'category': category,
+        'notes': txn.get('MEMO', ''),
+    }
+    posted = txn.get('DTPOSTED', '')[:8]
+    if posted:
+        try:
+            row['date'] = datetime.strptime(posted, '%Y%m%d').date().isoformat()
+        except ValueError:
+            row['date'] = posted
+    if currency:
+        row['currency'] = currency
+    return row
+
+
+def import_expenses(board, user, rows):
+    """
+    Validate and insert ``rows`` (``(line, data)`` pairs) as expenses on
+    ``board``. All rows are inserted or none are: any invalid row raises a
+    ValidationError listing the failing lines.
+
+    Returns the number of expenses created.
+    """
+    context = {'board': board}
+    batch = []
+    errors = {}
+    deltas = {}  # (category, date, currency) -> (amount, count)
+    today = timezone.now().date()
+
+    def flush():
+        Expense.objects.bulk_create(batch)
+        for expense in batch:
+            key = (expense.category, expense.date, expense.currency)
+            amount, count = deltas.get(key, (Decimal('0'), 0))
+            deltas[key] = (amount + expense.amount, count + 1)
+        batch.clear()
+
+    with transaction.atomic():
+        for number, (line, data) in enumerate(rows, start=1):
+            if number > MAX_IMPORT_ROWS:
+                raise ValidationError(f"Imports are limited to {MAX_IMPORT_ROWS} rows.")
+
+            serializer = ExpenseSerializer(data=data, context=context)
+            if not serializer.is_valid():
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors[str(line)] = serializer.errors
+                continue
+            if errors:
+                # Keep validating to report errors, but stop inserting rows
+                continue
+
+            values = serializer.validated_data
+            batch.append(Expense(
+                board=board,
+                created_by=user,
+                date=values.get('date') or today,
+                currency=values.get('currency') or board.currency,
+                **{key: value for key, value in values.items() if key not in ('date', 'currency')}
+            ))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+
+        if errors:
+            raise ValidationError({'rows': errors})
+        if batch:
+            flush()
+
+        for (category, date, currency), (amount, count) in deltas.items():
+            apply_expense_delta(board.pk, category, date, currency, amount, count)
+
+    created = sum(count for _, count in deltas.values())
+    if created:
+        _notify_import(board, user, created, [(currency, amount) for (_, _, currency), (amount, _) in deltas.items()])
+    return created
+
+
+def _notify_import(board, user, created, totals):
+    try:
+        total = convert_totals(totals, board.currency)
+    except MissingExchangeRate:
+        total = None
+
+    summary = f"{created} expenses"
+    if total is not None:
+        summary += f" totalling {total} {board.currency}"
+    notify(
+        [user.pk],
+        title="Expenses imported",
+        message=f"{summary} were imported into board '{board.title}'."
+    )
+    notify_board(
+        board.pk, 'expense_added',
+        title="Expenses imported",
+        message=f"{summary} were imported into board '{board.title}' by {user.get_full_name()}.",
+        exclude_user_ids=[user.pk]
+    )
+
+    if total is not None:
+        notify_if_over_budget(board, total)
@@ -0,0 +1,57 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from budget.models import ExchangeRate
+from budget.rates import clear_rates_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a CSV file with currency,rate columns or a JSON file "
+        "shaped like {\"base\": \"USD\", \"rates\": {\"EUR\": 0.92, ...}}. Rates are units per "
+        "one EXCHANGE_RATE_BASE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON rates file.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                if path.endswith('.json'):
+                    rates = self.read_json(f)
+                else:
+                    rates = {row['currency']: row['rate'] for row in csv.DictReader(f)}
+        except (OSError, KeyError, ValueError) as e:
+            raise CommandError(f"Could not read rates: {e}")
+
+        objs = []
+        for currency, rate in rates.items():
+            currency = currency.strip().upper()
+            try:
+                rate = Decimal(str(rate))
+            except InvalidOperation:
+                raise CommandError(f"Invalid rate for {currency}: {rate}")
+            if len(currency) != 3 or rate <= 0:
+                raise CommandError(f"Invalid rate for {currency}: {rate}")
+            objs.append(ExchangeRate(currency=currency, rate=rate))
+
+        ExchangeRate.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=['currency'],
+            update_fields=['rate', 'updated_at'],
+        )
+        # bulk_create skips signals, so clear this process's cache explicitly
+        clear_rates_cache()
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(objs)} exchange rates."))
+
+    def read_json(self, f):
+        data = json.load(f)
+        base = data.get('base', settings.EXCHANGE_RATE_BASE)
+        if base != settings.EXCHANGE_RATE_BASE:
+            raise ValueError(f"rates are based on {base}, expected {settings.EXCHANGE_RATE_BASE}")
+        return data['rates']
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from budget.totals import rebuild_budget_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute the running budget totals from expenses (after bulk SQL edits or restores)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', type=int, action='append', help="Only rebuild this board ID (repeatable).")
+
+    def handle(self, *args, **options):
+        rebuild_budget_totals(boards=options['board'])
+        self.stdout.write(self.style.SUCCESS("Budget totals rebuilt."))
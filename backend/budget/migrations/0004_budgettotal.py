@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_budget_totals(apps, schema_editor):
+    Expense = apps.get_model('budget', 'Expense')
+    BudgetTotal = apps.get_model('budget', 'BudgetTotal')
+    rows = Expense.objects.values('board_id', 'category').annotate(total=Sum('amount'), expense_count=Count('id')).order_by()
+    BudgetTotal.objects.bulk_create([BudgetTotal(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('budget', '0003_remove_budgetitem_budget_remove_budgetcategory_owner_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('travel', 'Travel/Flight'), ('lodging', 'Lodging'), ('food', 'Food'), ('activities', 'Activities'), ('fees', 'Fees'), ('misc', 'Misc')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_totals', to='boards.board')),
+            ],
+            options={
+                'db_table': 'budget_totals',
+                'ordering': ['category'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'category'), name='budget_totals_board_category_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_budget_totals, migrations.RunPython.noop),
+    ]
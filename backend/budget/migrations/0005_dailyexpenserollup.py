@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_daily_rollups(apps, schema_editor):
+    Expense = apps.get_model('budget', 'Expense')
+    DailyExpenseRollup = apps.get_model('budget', 'DailyExpenseRollup')
+    rows = (
+        Expense.objects.filter(date__isnull=False)
+        .values('board_id', 'date', 'category')
+        .annotate(total=Sum('amount'), expense_count=Count('id'))
+        .order_by()
+    )
+    DailyExpenseRollup.objects.bulk_create([DailyExpenseRollup(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('budget', '0004_budgettotal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('category', models.CharField(choices=[('travel', 'Travel/Flight'), ('lodging', 'Lodging'), ('food', 'Food'), ('activities', 'Activities'), ('fees', 'Fees'), ('misc', 'Misc')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_expense_rollups', to='boards.board')),
+            ],
+            options={
+                'db_table': 'expense_daily_rollups',
+                'ordering': ['date', 'category'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'date', 'category'), name='expense_rollups_board_date_category_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_rollups, migrations.RunPython.noop),
+    ]
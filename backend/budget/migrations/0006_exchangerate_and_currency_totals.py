@@ -0,0 +1,87 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def rebuild_totals_by_currency(apps, schema_editor):
+    Expense = apps.get_model('budget', 'Expense')
+    BudgetTotal = apps.get_model('budget', 'BudgetTotal')
+    DailyExpenseRollup = apps.get_model('budget', 'DailyExpenseRollup')
+
+    BudgetTotal.objects.all().delete()
+    DailyExpenseRollup.objects.all().delete()
+
+    total_rows = (
+        Expense.objects.values('board_id', 'category', 'currency')
+        .annotate(total=Sum('amount'), expense_count=Count('id'))
+        .order_by()
+    )
+    BudgetTotal.objects.bulk_create([BudgetTotal(**row) for row in total_rows])
+
+    rollup_rows = (
+        Expense.objects.filter(date__isnull=False)
+        .values('board_id', 'date', 'category', 'currency')
+        .annotate(total=Sum('amount'), expense_count=Count('id'))
+        .order_by()
+    )
+    DailyExpenseRollup.objects.bulk_create([DailyExpenseRollup(**row) for row in rollup_rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('budget', '0005_dailyexpenserollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3, unique=True)),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'exchange_rates',
+                'ordering': ['currency'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='budgettotal',
+            name='budget_totals_board_category_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='dailyexpenserollup',
+            name='expense_rollups_board_date_category_uniq',
+        ),
+        migrations.AlterModelOptions(
+            name='budgettotal',
+            options={'ordering': ['category', 'currency']},
+        ),
+        migrations.AlterModelOptions(
+            name='dailyexpenserollup',
+            options={'ordering': ['date', 'category', 'currency']},
+        ),
+        migrations.AddField(
+            model_name='budgettotal',
+            name='currency',
+            field=models.CharField(default='', max_length=3),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='dailyexpenserollup',
+            name='currency',
+            field=models.CharField(default='', max_length=3),
+            preserve_default=False,
+        ),
+        migrations.RunPython(rebuild_totals_by_currency, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='budgettotal',
+            constraint=models.UniqueConstraint(fields=('board', 'category', 'currency'), name='budget_totals_board_cat_cur_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyexpenserollup',
+            constraint=models.UniqueConstraint(fields=('board', 'date', 'category', 'currency'), name='expense_rollups_uniq'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('budget', '0006_exchangerate_and_currency_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='card',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='expenses', to='boards.card'),
+        ),
+    ]
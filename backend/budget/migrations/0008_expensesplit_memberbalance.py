@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('budget', '0007_expense_card'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseSplit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='splits', to='budget.expense')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_splits', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'expense_splits',
+                'ordering': ['id'],
+                'constraints': [models.UniqueConstraint(fields=('expense', 'user'), name='expense_splits_expense_user_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MemberBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_balances', to='boards.board')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='board_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'member_balances',
+                'ordering': ['user_id', 'currency'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'user', 'currency'), name='member_balances_board_user_cur_uniq')],
+            },
+        ),
+    ]
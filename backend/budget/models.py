@@ -1,5 +1,5 @@
-from django.db import models
-from boards.models import Board
+from django.db import models, transaction
+from boards.models import Board, Card
 from users.models import User
 from django.utils import timezone 
 
@@ -23,17 +23,141 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     currency = models.CharField(max_length=3)
+    # The planned item this expense pays for, if any (see budget.reconciliation)
+    card = models.ForeignKey(Card, on_delete=models.SET_NULL, null=True, blank=True, related_name='expenses')
 
     def __str__(self):
         return f"{self.title} ({self.board.title})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_totals_key()
+        return instance
+
+    def _remember_totals_key(self):
+        # Values last written to the database, so signals can move the
+        # amount out of the right BudgetTotal row on update and delete
+        self._saved_totals_key = (self.board_id, self.category, self.date, self.currency, self.amount)
+        # ...and the payer, so split balances move with it (see budget.splits)
+        self._saved_payer_id = self.created_by_id
+
     def save(self, *args, **kwargs):
         if not self.date:
             self.date = timezone.now().date()  # Fixed: Use date instead of datetime
         if not self.currency:
             self.currency = self.board.currency
-        super().save(*args, **kwargs)
+        # Keep the row and its BudgetTotal update in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._remember_totals_key()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     class Meta:
         db_table = 'expenses'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+
+class BudgetTotal(models.Model):
+    """
+    Running spend per board, category and currency, maintained by the Expense
+    signals so the budget summary never has to aggregate a board's expenses.
+    """
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='budget_totals')
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    currency = models.CharField(max_length=3)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.category}: {self.total} {self.currency} ({self.board.title})"
+
+    class Meta:
+        db_table = 'budget_totals'
+        ordering = ['category', 'currency']
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'category', 'currency'], name='budget_totals_board_cat_cur_uniq'),
+        ]
+
+
+class DailyExpenseRollup(models.Model):
+    """
+    Spend per board, day and category, maintained alongside BudgetTotal so
+    spending time series for large boards never scan individual expenses.
+    """
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='daily_expense_rollups')
+    date = models.DateField()
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    currency = models.CharField(max_length=3)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.category}: {self.total} {self.currency} ({self.board.title})"
+
+    class Meta:
+        db_table = 'expense_daily_rollups'
+        ordering = ['date', 'category', 'currency']
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'date', 'category', 'currency'], name='expense_rollups_uniq'),
+        ]
+
+
+class ExpenseSplit(models.Model):
+    """A member's share of an expense, in the expense's currency."""
+    expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='splits')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_splits')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.user}: {self.amount} {self.expense.currency} ({self.expense.title})"
+
+    class Meta:
+        db_table = 'expense_splits'
+        ordering = ['id']
+        constraints = [
+            models.UniqueConstraint(fields=['expense', 'user'], name='expense_splits_expense_user_uniq'),
+        ]
+
+
+class MemberBalance(models.Model):
+    """
+    What a member is owed (positive) or owes (negative) on a board, per
+    currency. Kept up to date from expense and split writes by
+    ``budget.splits`` so settling up never re-reads expenses.
+    """
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name='member_balances')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='board_balances')
+    currency = models.CharField(max_length=3)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.user}: {self.balance} {self.currency} ({self.board.title})"
+
+    class Meta:
+        db_table = 'member_balances'
+        ordering = ['user_id', 'currency']
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'user', 'currency'], name='member_balances_board_user_cur_uniq'),
+        ]
+
+
+class ExchangeRate(models.Model):
+    """
+    Units of ``currency`` per one unit of ``settings.EXCHANGE_RATE_BASE``,
+    loaded with `manage.py load_exchange_rates` and cached in memory by
+    ``budget.rates``.
+    """
+    currency = models.CharField(max_length=3, unique=True)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.currency}: {self.rate}"
+
+    class Meta:
+        db_table = 'exchange_rates'
+        ordering = ['currency']
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+In-memory exchange-rate table.
+
+Rates are read from ExchangeRate once and kept in process memory until the
+table changes (signals clear the cache) or ``EXCHANGE_RATE_CACHE_SECONDS``
+pass, so converting totals never costs a query per row.
+"""
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from travelkanban.caching import RATES_TAG, invalidate
+from .models import ExchangeRate
+
+CENTS = Decimal('0.01')
+
+_lock = threading.Lock()
+_rates = None
+_loaded_at = 0.0
+
+
+class MissingExchangeRate(ValueError):
+    pass
+
+
+def get_rates():
+    """Return ``{currency: units per base unit}``, loading the table if needed."""
+    global _rates, _loaded_at
+    rates = _rates
+    if rates is not None and time.monotonic() - _loaded_at < settings.EXCHANGE_RATE_CACHE_SECONDS:
+        return rates
+
+    with _lock:
+        if _rates is None or time.monotonic() - _loaded_at >= settings.EXCHANGE_RATE_CACHE_SECONDS:
+            loaded = dict(ExchangeRate.objects.values_list('currency', 'rate'))
+            loaded[settings.EXCHANGE_RATE_BASE] = Decimal('1')
+            _rates = loaded
+            _loaded_at = time.monotonic()
+        return _rates
+
+
+def clear_rates_cache():
+    """Reload rates on next use and invalidate cached responses with converted amounts."""
+    global _rates
+    _rates = None
+    invalidate(RATES_TAG)
+
+
+def is_convertible(from_currency, to_currency):
+    if from_currency == to_currency:
+        return True
+    rates = get_rates()
+    return from_currency in rates and to_currency in rates
+
+
+def conversion_factors(currencies, to_currency):
+    """
+    Return ``{currency: factor}`` converting each of ``currencies`` into
+    ``to_currency``, with one rate lookup per currency.
+    """
+    factors = {}
+    rates = None
+    for currency in set(currencies):
+        if currency == to_currency:
+            factors[currency] = Decimal('1')
+            continue
+        if rates is None:
+            rates = get_rates()
+        if currency not in rates or to_currency not in rates:
+            missing = currency if currency not in rates else to_currency
+            raise MissingExchangeRate(f"No exchange rate is loaded for {missing}.")
+        factors[currency] = rates[to_currency] / rates[currency]
+    return factors
+
+
+def convert(amount, from_currency, to_currency):
+    return (amount * conversion_factors([from_currency], to_currency)[from_currency]).quantize(CENTS)
+
+
+def convert_totals(totals, to_currency):
+    """
+    Sum ``(currency, amount)`` pairs into one ``to_currency`` amount, converting
+    each currency once rather than each row.
+    """
+    by_currency = {}
+    for currency, amount in totals:
+        by_currency[currency] = by_currency.get(currency, Decimal('0')) + amount
+    factors = conversion_factors(by_currency, to_currency)
+    total = sum((amount * factors[currency] for currency, amount in by_currency.items()), Decimal('0'))
+    return total.quantize(CENTS)
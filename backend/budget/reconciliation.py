@@ -0,0 +1,113 @@
+"""
+Planned-vs-actual reconciliation for a board.
+
+A card's planned cost is ``budget * people_number`` in the board's currency;
+its actual cost is the sum of the expenses linked to it. Cards and their
+linked spend per currency come from one grouped LEFT JOIN, and the board's
+overall spend from its running totals, so the cost does not depend on how
+many expenses a board has.
+"""
+from decimal import Decimal
+from django.db.models import Count, Sum
+from boards.models import Card
+from .models import BudgetTotal
+from .rates import CENTS, conversion_factors
+
+
+def _line(planned, actual):
+    return {
+        'planned': str(planned.quantize(CENTS)),
+        'actual': str(actual.quantize(CENTS)),
+        'variance': str((planned - actual).quantize(CENTS)),
+    }
+
+
+def reconcile_board(board):
+    """
+    Return planned vs actual spend for ``board`` per card, list, card category
+    and for the whole board. Raises MissingExchangeRate when an expense's
+    currency cannot be converted to the board's.
+    """
+    rows = list(
+        Card.objects.filter(list__board=board)
+        .values(
+            'id', 'title', 'category', 'budget', 'people_number',
+            'list_id', 'list__title', 'list__position', 'position', 'expenses__currency',
+        )
+        .annotate(actual=Sum('expenses__amount'), expense_count=Count('expenses'))
+        .order_by('list__position', 'position', 'id')
+    )
+    totals = list(
+        BudgetTotal.objects.filter(board=board, expense_count__gt=0).values_list('currency', 'total').order_by()
+    )
+    currencies = {currency for currency, _ in totals}
+    currencies.update(row['expenses__currency'] for row in rows if row['expenses__currency'] is not None)
+    factors = conversion_factors(currencies, board.currency)
+
+    # A card linked to expenses in several currencies spans several rows
+    cards = {}
+    for row in rows:
+        card = cards.get(row['id'])
+        if card is None:
+            card = cards[row['id']] = {
+                'card_id': row['id'],
+                'title': row['title'],
+                'list_id': row['list_id'],
+                'list_title': row['list__title'],
+                'category': row['category'],
+                'planned': row['budget'] * row['people_number'],
+                'actual': Decimal('0.00'),
+                'expense_count': 0,
+            }
+        currency = row['expenses__currency']
+        if currency is not None:
+            card['actual'] += row['actual'] * factors[currency]
+            card['expense_count'] += row['expense_count']
+
+    lists = {}
+    categories = {}
+    planned_total = linked_actual = Decimal('0.00')
+    for card in cards.values():
+        card['actual'] = card['actual'].quantize(CENTS)
+        planned_total += card['planned']
+        linked_actual += card['actual']
+
+        list_line = lists.setdefault(card['list_id'], {
+            'title': card['list_title'], 'planned': Decimal('0.00'), 'actual': Decimal('0.00'),
+        })
+        category_line = categories.setdefault(card['category'], {
+            'planned': Decimal('0.00'), 'actual': Decimal('0.00'),
+        })
+        for line in (list_line, category_line):
+            line['planned'] += card['planned']
+            line['actual'] += card['actual']
+
+    actual_total = sum((total * factors[currency] for currency, total in totals), Decimal('0.00')).quantize(CENTS)
+
+    return {
+        'currency': board.currency,
+        'board': {
+            'budget': str(board.budget),
+            'unlinked_actual': str(actual_total - linked_actual),
+            **_line(planned_total, actual_total),
+        },
+        'lists': [
+            {'list_id': list_id, 'title': line['title'], **_line(line['planned'], line['actual'])}
+            for list_id, line in lists.items()
+        ],
+        'categories': [
+            {'category': category, **_line(line['planned'], line['actual'])}
+            for category, line in categories.items()
+        ],
+        'cards': [
+            {
+                'card_id': card['card_id'],
+                'title': card['title'],
+                'list_id': card['list_id'],
+                'category': card['category'],
+                'expense_count': card['expense_count'],
+                **_line(card['planned'], card['actual']),
+            }
+            for card in cards.values()
+        ],
+    }
@@ -1,21 +1,102 @@
+from decimal import Decimal
+from django.db import transaction
 from rest_framework import serializers
-from .models import Expense
+from .models import Expense, ExpenseSplit
+from boards.models import Card
+from .rates import is_convertible
+from .splits import set_expense_splits, split_evenly
 from users.serializers import UserSerializer
 
 
+class ExpenseSplitSerializer(serializers.ModelSerializer):
+    # Omitted amounts split the expense evenly; negative shares would let the
+    # total match while moving more than the expense through the ledger
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), required=False)
+
+    class Meta:
+        model = ExpenseSplit
+        fields = ['user', 'amount']
+
+
 class ExpenseSerializer(serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
+    splits = ExpenseSplitSerializer(many=True, required=False)
+    # Defaults to the board's currency when omitted
+    currency = serializers.CharField(max_length=3, required=False)
+    card = serializers.PrimaryKeyRelatedField(
+        queryset=Card.objects.select_related('list'), required=False, allow_null=True
+    )
 
     class Meta:
         model = Expense
         fields = [
             'id', 'board', 'title', 'amount', 'category', 'date', 'notes',
-            'created_by', 'created_at', 'updated_at', 'currency'
+            'created_by', 'created_at', 'updated_at', 'currency', 'card', 'splits'
         ]
         read_only_fields = [
-            'id', 'board', 'created_by', 'created_at', 'updated_at', 'currency'
+            'id', 'board', 'created_by', 'created_at', 'updated_at'
         ]
 
+    def validate_currency(self, value):
+        if not value or len(value.strip()) != 3:
+            raise serializers.ValidationError("Currency must be a 3-letter code (e.g., USD)")
+        value = value.strip().upper()
+        board = self.context.get('board')
+        if board is not None and not is_convertible(value, board.currency):
+            raise serializers.ValidationError(f"No exchange rate is available to convert {value} to {board.currency}.")
+        return value
+
+    def validate_card(self, value):
+        board = self.context.get('board')
+        if value is not None and board is not None and value.list.board_id != board.pk:
+            raise serializers.ValidationError("Card must belong to the expense's board.")
+        return value
+
+    def validate(self, attrs):
+        splits = attrs.get('splits')
+        if splits is None:
+            return attrs
+
+        user_ids = [split['user'].pk for split in splits]
+        if len(set(user_ids)) != len(user_ids):
+            raise serializers.ValidationError({'splits': "Each member can only appear once."})
+        board = self.context.get('board')
+        if board is not None:
+            member_ids = {board.owner_id, *board.members.values_list('id', flat=True)}
+            if not member_ids.issuperset(user_ids):
+                raise serializers.ValidationError({'splits': "Expenses can only be split between board members."})
+
+        if not splits:
+            attrs['splits'] = []
+            return attrs
+        amount = attrs.get('amount', getattr(self.instance, 'amount', None))
+        amounts = [split.get('amount') for split in splits]
+        if all(share is None for share in amounts):
+            amounts = split_evenly(amount, len(amounts))
+        elif any(share is None for share in amounts):
+            raise serializers.ValidationError({'splits': "Give an amount for every split or for none."})
+        elif sum(amounts) != amount:
+            raise serializers.ValidationError({'splits': f"Split amounts must add up to the expense amount ({amount})."})
+        attrs['splits'] = list(zip(user_ids, amounts))
+        return attrs
+
+    def create(self, validated_data):
+        splits = validated_data.pop('splits', None)
+        with transaction.atomic():
+            expense = super().create(validated_data)
+            if splits:
+                set_expense_splits(expense, splits)
+        return expense
+
+    def update(self, instance, validated_data):
+        splits = validated_data.pop('splits', None)
+        with transaction.atomic():
+            # Existing splits are rescaled to a new amount by the signals
+            expense = super().update(instance, validated_data)
+            if splits is not None:
+                set_expense_splits(expense, splits)
+        return expense
+
 
 class BudgetSummaryByCategorySerializer(serializers.Serializer):
     category = serializers.CharField()
@@ -23,7 +104,73 @@ class BudgetSummaryByCategorySerializer(serializers.Serializer):
 
 
 class BudgetSummarySerializer(serializers.Serializer):
+    currency = serializers.CharField()  # All amounts are in the board's currency
     board_budget = serializers.CharField()
     actual_spend_total = serializers.CharField()
     remaining = serializers.CharField()
-    by_category = BudgetSummaryByCategorySerializer(many=True)
\ No newline at end of file
+    by_category = BudgetSummaryByCategorySerializer(many=True)
+
+
+class SpendingBucketSerializer(serializers.Serializer):
+    period = serializers.DateField()  # First day of the bucket
+    total = serializers.CharField()
+    by_category = BudgetSummaryByCategorySerializer(many=True)
+
+
+class SpendingTimeSeriesSerializer(serializers.Serializer):
+    bucket = serializers.CharField()
+    currency = serializers.CharField()
+    results = SpendingBucketSerializer(many=True)
+
+
+class ReconciliationLineSerializer(serializers.Serializer):
+    planned = serializers.CharField()
+    actual = serializers.CharField()
+    variance = serializers.CharField()  # planned - actual; negative when over plan
+
+
+class CardReconciliationSerializer(ReconciliationLineSerializer):
+    card_id = serializers.IntegerField()
+    title = serializers.CharField()
+    list_id = serializers.IntegerField()
+    category = serializers.CharField(allow_null=True)
+    expense_count = serializers.IntegerField()
+
+
+class ListReconciliationSerializer(ReconciliationLineSerializer):
+    list_id = serializers.IntegerField()
+    title = serializers.CharField()
+
+
+class CategoryReconciliationSerializer(ReconciliationLineSerializer):
+    category = serializers.CharField(allow_null=True)  # The card's category
+
+
+class BoardReconciliationSerializer(ReconciliationLineSerializer):
+    budget = serializers.CharField()
+    unlinked_actual = serializers.CharField()  # Spend on expenses not linked to a card
+
+
+class ReconciliationSerializer(serializers.Serializer):
+    currency = serializers.CharField()  # All amounts are in the board's currency
+    board = BoardReconciliationSerializer()
+    lists = ListReconciliationSerializer(many=True)
+    categories = CategoryReconciliationSerializer(many=True)
+    cards = CardReconciliationSerializer(many=True)
+
+
+class MemberBalanceSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    balance = serializers.CharField()  # Positive when the member is owed money
+
+
+class TransferSerializer(serializers.Serializer):
+    from_user_id = serializers.IntegerField()
+    to_user_id = serializers.IntegerField()
+    amount = serializers.CharField()
+
+
+class SettleUpSerializer(serializers.Serializer):
+    currency = serializers.CharField()  # All amounts are in the board's currency
+    balances = MemberBalanceSerializer(many=True)
+    transfers = TransferSerializer(many=True)
@@ -1,13 +1,99 @@
-from django.db.models.signals import post_save
+from decimal import Decimal
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import Expense
-from users.models import Notification
+from .models import Expense, ExchangeRate
+from .rates import MissingExchangeRate, clear_rates_cache, convert
+from .splits import rebalance_expense, reverse_expense
+from .totals import apply_expense_delta, notify_if_over_budget
+from users.notifications import notify, notify_board
 
 @receiver(post_save, sender=Expense)
 def create_expense_notification(sender, instance, created, **kwargs):
     if created:
-        Notification.objects.create(
-            user=instance.created_by,
+        notify(
+            [instance.created_by_id],
             title="Budget updated",
-            message=f"New expense '{instance.title}' of {instance.amount} {instance.currency} added to board '{instance.board.title}'."
+            message=f"New expense '{instance.title}' of {instance.amount} {instance.currency} added to board '{instance.board.title}'.",
+            board_id=instance.board_id,
+            event='expense_added'
         )
+        notify_board(
+            instance.board_id, 'expense_added',
+            title="Expense added",
+            message=f"Expense '{instance.title}' of {instance.amount} {instance.currency} was added to board '{instance.board.title}'.",
+            exclude_user_ids=[instance.created_by_id]
+        )
+
+@receiver(pre_save, sender=Expense)
+def remember_budget_totals_key(sender, instance, **kwargs):
+    # Instances not loaded from the database (e.g. built with an explicit pk)
+    # carry no saved values; read them once so the update moves the right amount
+    if instance.pk and not hasattr(instance, '_saved_totals_key'):
+        saved = (
+            Expense.objects.filter(pk=instance.pk)
+            .values_list('board_id', 'category', 'date', 'currency', 'amount', 'created_by_id')
+            .first()
+        )
+        if saved:
+            instance._saved_totals_key = saved[:5]
+            instance._saved_payer_id = saved[5]
+
+@receiver(post_save, sender=Expense)
+def update_budget_totals(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_saved_totals_key', None)
+    key = (instance.board_id, instance.category, instance.date, instance.currency)
+    amount = Decimal(str(instance.amount))
+
+    if created or previous is None:
+        apply_expense_delta(*key, amount, 1)
+        removed = None
+    else:
+        old_key, old_amount = previous[:4], previous[4]
+        if old_key == key:
+            if amount != old_amount:
+                apply_expense_delta(*key, amount - old_amount, 0)
+        else:
+            apply_expense_delta(*old_key, -old_amount, -1)
+            apply_expense_delta(*key, amount, 1)
+        # Only an expense already on this board offsets the spend increase
+        removed = (old_amount, old_key[3]) if old_key[0] == instance.board_id else None
+
+    board = instance.board
+    try:
+        delta = convert(amount, instance.currency, board.currency)
+        if removed is not None:
+            delta -= convert(removed[0], removed[1], board.currency)
+    except MissingExchangeRate:
+        return
+    notify_if_over_budget(board, delta)
+
+@receiver(post_delete, sender=Expense)
+def remove_from_budget_totals(sender, instance, **kwargs):
+    board_id, category, date, currency, amount = getattr(
+        instance, '_saved_totals_key',
+        (instance.board_id, instance.category, instance.date, instance.currency, instance.amount)
+    )
+    apply_expense_delta(board_id, category, date, currency, -Decimal(str(amount)), -1)
+
+@receiver(post_save, sender=Expense)
+def update_member_balances(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_saved_totals_key', None)
+    if created or previous is None:
+        return  # New expenses have no splits yet
+    board_id, _, _, currency, amount = previous
+    payer_id = getattr(instance, '_saved_payer_id', instance.created_by_id)
+    current = (instance.board_id, instance.created_by_id, instance.currency, Decimal(str(instance.amount)))
+    if (board_id, payer_id, currency, amount) != current:
+        rebalance_expense(instance, board_id, payer_id, currency, amount)
+
+@receiver(pre_delete, sender=Expense)
+def remove_from_member_balances(sender, instance, **kwargs):
+    board_id, _, _, currency, _ = getattr(
+        instance, '_saved_totals_key',
+        (instance.board_id, instance.category, instance.date, instance.currency, instance.amount)
+    )
+    reverse_expense(instance, board_id, getattr(instance, '_saved_payer_id', instance.created_by_id), currency)
+
+@receiver([post_save, post_delete], sender=ExchangeRate)
+def reload_exchange_rates(sender, **kwargs):
+    clear_rates_cache()
@@ -0,0 +1,158 @@
+"""
+Expense splits and the member balance ledger.
+
+An expense paid by ``created_by`` and split between members credits the payer
+with each share and debits each member by theirs. The net effect is applied to
+MemberBalance as a delta whenever splits or their expense change, so balances
+and settle-up read one row per member and currency.
+"""
+from decimal import Decimal, ROUND_DOWN
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import ExpenseSplit, MemberBalance
+from .rates import CENTS, conversion_factors
+
+
+def _distribute(exact_shares, total):
+    """
+    Round ``exact_shares`` to cents so they add up to ``total``, giving the
+    leftover cents to the first shares.
+    """
+    shares = [share.quantize(CENTS, rounding=ROUND_DOWN) for share in exact_shares]
+    leftover = total - sum(shares, Decimal('0.00'))
+    step = CENTS if leftover > 0 else -CENTS
+    for index in range(int(abs(leftover) / CENTS)):
+        shares[index % len(shares)] += step
+    return shares
+
+
+def split_evenly(amount, count):
+    return _distribute([amount / count] * count, amount)
+
+
+def _rescale(amounts, old_total, new_total):
+    if not old_total:
+        return split_evenly(new_total, len(amounts))
+    return _distribute([amount * new_total / old_total for amount in amounts], new_total)
+
+
+def _ledger_effect(payer_id, currency, splits):
+    """Return ``{(user_id, currency): delta}`` for ``(user_id, amount)`` splits."""
+    deltas = {}
+    if payer_id is None:
+        return deltas
+    for user_id, amount in splits:
+        for key, delta in (((user_id, currency), -amount), ((payer_id, currency), amount)):
+            deltas[key] = deltas.get(key, Decimal('0.00')) + delta
+    return deltas
+
+
+def _difference(old, new):
+    deltas = dict(new)
+    for key, delta in old.items():
+        deltas[key] = deltas.get(key, Decimal('0.00')) - delta
+    return deltas
+
+
+def apply_balance_deltas(board_id, deltas, create=True):
+    """
+    Add ``{(user_id, currency): delta}`` to the board's balances. With
+    ``create=False`` missing rows are left alone, which reversals use so a
+    board being deleted never gets new balance rows.
+    """
+    for (user_id, currency), delta in deltas.items():
+        if not delta:
+            continue
+        key = {'board_id': board_id, 'user_id': user_id, 'currency': currency}
+        updated = MemberBalance.objects.filter(**key).update(balance=F('balance') + delta)
+        if updated or not create:
+            continue
+        try:
+            with transaction.atomic():
+                MemberBalance.objects.create(balance=delta, **key)
+        except IntegrityError:
+            # Another writer created the row first; apply the delta to theirs
+            MemberBalance.objects.filter(**key).update(balance=F('balance') + delta)
+
+
+def set_expense_splits(expense, splits):
+    """Replace ``expense``'s splits with ``(user_id, amount)`` pairs and update balances."""
+    with transaction.atomic():
+        old = list(expense.splits.values_list('user_id', 'amount'))
+        expense.splits.all().delete()
+        ExpenseSplit.objects.bulk_create([
+            ExpenseSplit(expense=expense, user_id=user_id, amount=amount) for user_id, amount in splits
+        ])
+        apply_balance_deltas(expense.board_id, _difference(
+            _ledger_effect(expense.created_by_id, expense.currency, old),
+            _ledger_effect(expense.created_by_id, expense.currency, splits),
+        ))
+
+
+def rebalance_expense(expense, previous_board_id, previous_payer_id, previous_currency, previous_amount):
+    """
+    Move an updated expense's splits to its new amount, payer and currency.
+    Shares are rescaled proportionally when the amount changes.
+    """
+    splits = list(expense.splits.all())
+    if not splits:
+        return
+
+    old = [(split.user_id, split.amount) for split in splits]
+    amount = Decimal(str(expense.amount))
+    if amount != previous_amount:
+        for split, amount in zip(splits, _rescale([split.amount for split in splits], previous_amount, amount)):
+            split.amount = amount
+        ExpenseSplit.objects.bulk_update(splits, ['amount'])
+    new = [(split.user_id, split.amount) for split in splits]
+
+    old_effect = _ledger_effect(previous_payer_id, previous_currency, old)
+    new_effect = _ledger_effect(expense.created_by_id, expense.currency, new)
+    if previous_board_id == expense.board_id:
+        apply_balance_deltas(expense.board_id, _difference(old_effect, new_effect))
+    else:
+        apply_balance_deltas(previous_board_id, _difference(old_effect, {}), create=False)
+        apply_balance_deltas(expense.board_id, new_effect)
+
+
+def reverse_expense(expense, board_id, payer_id, currency):
+    """Remove a deleted expense's splits from the balances."""
+    old = list(expense.splits.values_list('user_id', 'amount'))
+    apply_balance_deltas(board_id, _difference(_ledger_effect(payer_id, currency, old), {}), create=False)
+
+
+def board_balances(board):
+    """Return ``{user_id: balance}`` for ``board`` in its currency, from the ledger."""
+    rows = list(
+        MemberBalance.objects.filter(board=board).exclude(balance=0).values_list('user_id', 'currency', 'balance')
+    )
+    factors = conversion_factors({currency for _, currency, _ in rows}, board.currency)
+
+    balances = {}
+    for user_id, currency, balance in rows:
+        balances[user_id] = balances.get(user_id, Decimal('0.00')) + balance * factors[currency]
+    return {user_id: balance.quantize(CENTS) for user_id, balance in balances.items()}
+
+
+def settle_up(balances):
+    """
+    Return ``(from_user_id, to_user_id, amount)`` transfers that settle
+    ``balances``. Largest debts are paired with largest credits, which needs
+    at most one transfer fewer than the number of members.
+    """
+    creditors = sorted(([balance, user_id] for user_id, balance in balances.items() if balance > 0), reverse=True)
+    debtors = sorted(([-balance, user_id] for user_id, balance in balances.items() if balance < 0), reverse=True)
+
+    transfers = []
+    c = d = 0
+    while c < len(creditors) and d < len(debtors):
+        amount = min(creditors[c][0], debtors[d][0])
+        if amount > 0:
+            transfers.append((debtors[d][1], creditors[c][1], amount))
+        creditors[c][0] -= amount
+        debtors[d][0] -= amount
+        if creditors[c][0] <= 0:
+            c += 1
+        if debtors[d][0] <= 0:
+            d += 1
+    return transfers
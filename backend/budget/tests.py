@@ -1,3 +1,448 @@
-from django.test import TestCase
+from decimal import Decimal
+import csv
+import os
+import tempfile
+from datetime import date
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from boards.models import Board, Card
+from users.models import Notification
+from .models import Expense, BudgetTotal, DailyExpenseRollup, ExchangeRate, MemberBalance
+from .rates import clear_rates_cache
+from .splits import settle_up
+from .totals import apply_expense_delta, rebuild_budget_totals
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(NOTIFICATIONS_EAGER=True)
+class BudgetTestCase(APITestCase):
+    """Shared setup: an authenticated board owner with a 1000 USD budget."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='traveller',
+            email='traveller@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Peru', owner=self.user, budget=Decimal('1000.00'))
+        # Rates are cached per process and test rollbacks do not send signals
+        clear_rates_cache()
+        self.addCleanup(clear_rates_cache)
+        # Invalidations wait for commits, which test transactions never make
+        cache.clear()
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def add_expense(self, amount, category='food', **kwargs):
+        kwargs.setdefault('currency', self.board.currency)
+        return Expense.objects.create(
+            board=self.board, title='Expense', amount=Decimal(amount),
+            category=category, created_by=self.user, **kwargs
+        )
+
+
+class BudgetTotalsTest(BudgetTestCase):
+    """Test cases for the incrementally maintained budget totals."""
+
+    def totals(self):
+        return {
+            row.category: (row.total, row.expense_count)
+            for row in BudgetTotal.objects.filter(board=self.board)
+        }
+
+    def test_totals_follow_expense_writes(self):
+        """Test that create, update and delete keep totals in sync."""
+        lunch = self.add_expense('20.00')
+        hostel = self.add_expense('80.00', category='lodging')
+        self.assertEqual(self.totals(), {'food': (Decimal('20.00'), 1), 'lodging': (Decimal('80.00'), 1)})
+
+        lunch.amount = Decimal('25.50')
+        lunch.save()
+        hostel = Expense.objects.get(pk=hostel.pk)
+        hostel.category = 'misc'
+        hostel.save()
+        self.assertEqual(self.totals()['food'], (Decimal('25.50'), 1))
+        self.assertEqual(self.totals()['lodging'], (Decimal('0.00'), 0))
+        self.assertEqual(self.totals()['misc'], (Decimal('80.00'), 1))
+
+        Expense.objects.get(pk=lunch.pk).delete()
+        self.assertEqual(self.totals()['food'], (Decimal('0.00'), 0))
+
+    def test_summary_reads_totals(self):
+        """Test that the summary endpoint reports the running totals."""
+        self.add_expense('100.00')
+        self.add_expense('50.00', category='travel')
+        url = reverse('board-budget-summary', args=[self.board.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['actual_spend_total'], '150.00')
+        self.assertEqual(response.data['remaining'], '850.00')
+        self.assertEqual(
+            [(item['category'], item['total']) for item in response.data['by_category']],
+            [('food', '100.00'), ('travel', '50.00')]
+        )
+
+    def test_over_budget_notification(self):
+        """Test that crossing the budget notifies the owner once."""
+        self.add_expense('900.00')
+        self.assertFalse(Notification.objects.filter(title='Budget exceeded').exists())
+        self.add_expense('200.00')
+        self.add_expense('10.00')
+        self.assertEqual(Notification.objects.filter(user=self.user, title='Budget exceeded').count(), 1)
+
+    def test_rebuild_and_board_delete(self):
+        """Test that totals can be rebuilt and are removed with the board."""
+        self.add_expense('10.00')
+        BudgetTotal.objects.update(total=0)
+        rebuild_budget_totals()
+        self.assertEqual(self.totals(), {'food': (Decimal('10.00'), 1)})
+
+        self.board.delete()
+        self.assertFalse(BudgetTotal.objects.exists())
+
+
+class SpendingTimeSeriesTest(BudgetTestCase):
+    """Test cases for the spending time series endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        super().setUp()
+        self.url = reverse('board-spending-timeseries', args=[self.board.pk])
+        self.add_expense('10.00', date=date(2030, 3, 4))
+        self.add_expense('15.00', category='travel', date=date(2030, 3, 4))
+        self.add_expense('5.00', date=date(2030, 3, 6))
+        self.add_expense('40.00', date=date(2030, 4, 1))
+
+    def test_week_buckets(self):
+        """Test totals per ISO week and category."""
+        response = self.client.get(self.url, {'bucket': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([(item['period'], item['total']) for item in results], [('2030-03-04', '30.00'), ('2030-04-01', '40.00')])
+        self.assertEqual(
+            [(item['category'], item['total']) for item in results[0]['by_category']],
+            [('food', '15.00'), ('travel', '15.00')]
+        )
+
+    def test_date_filters(self):
+        """Test that date filters match the expense list semantics."""
+        response = self.client.get(self.url, {'bucket': 'month', 'date_from': '2030-03-05', 'date_to': '2030-04-01'})
+        self.assertEqual([(item['period'], item['total']) for item in response.data['results']], [('2030-03-01', '5.00'), ('2030-04-01', '40.00')])
+
+        response = self.client.get(self.url, {'date_from': '2030-05-01', 'date_to': '2030-04-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rollups_match_expenses(self):
+        """Test that large boards served from daily rollups get the same answer."""
+        expected = self.client.get(self.url, {'bucket': 'day'}).data
+        Expense.objects.filter(date=date(2030, 4, 1)).first().delete()
+        self.assertFalse(DailyExpenseRollup.objects.filter(date=date(2030, 4, 1), expense_count__gt=0).exists())
+        self.add_expense('40.00', date=date(2030, 4, 1))
+
+        with override_settings(BUDGET_ROLLUP_MIN_EXPENSES=1):
+            response = self.client.get(self.url, {'bucket': 'day'})
+        self.assertEqual(response.data, expected)
+
+
+    def test_rollups_omit_emptied_days(self):
+        """Test that a day whose expenses were all deleted has no bucket on either path."""
+        Expense.objects.get(date=date(2030, 4, 1)).delete()
+        expected = self.client.get(self.url, {'bucket': 'day'}).data
+        self.assertNotIn('2030-04-01', [item['period'] for item in expected['results']])
+
+        with override_settings(BUDGET_ROLLUP_MIN_EXPENSES=1):
+            response = self.client.get(self.url, {'bucket': 'day'})
+        self.assertEqual(response.data, expected)
+
+    def test_negative_delta_creates_no_rollup(self):
+        """Test that removing from a missing rollup row does not create one."""
+        apply_expense_delta(self.board.pk, 'food', date(2030, 5, 1), self.board.currency, Decimal('-10.00'), 0)
+        apply_expense_delta(self.board.pk, 'food', date(2030, 5, 1), self.board.currency, Decimal('-10.00'), -1)
+        self.assertFalse(DailyExpenseRollup.objects.filter(date=date(2030, 5, 1)).exists())
+
+class MultiCurrencyTest(BudgetTestCase):
+    """Test cases for expenses in other currencies."""
+
+    def setUp(self):
+        """Set up test data."""
+        super().setUp()
+        self.expenses_url = reverse('board-expenses', args=[self.board.pk])
+        call_command('load_exchange_rates', self.write_rates('currency,rate\nEUR,0.5\nJPY,100\n'), stdout=StringIO())
+
+    def write_rates(self, content):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_expense_in_other_currency(self):
+        """Test that expenses keep their currency and default to the board's."""
+        response = self.client.post(self.expenses_url, {'title': 'Museum', 'amount': '20.00', 'category': 'activities', 'currency': 'eur'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['currency'], 'EUR')
+
+        response = self.client.post(self.expenses_url, {'title': 'Taxi', 'amount': '5.00', 'category': 'travel'}, format='json')
+        self.assertEqual(response.data['currency'], 'USD')
+
+    def test_unknown_currency_rejected(self):
+        """Test that currencies without a rate are rejected."""
+        response = self.client.post(self.expenses_url, {'title': 'Taxi', 'amount': '5.00', 'category': 'travel', 'currency': 'GBP'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('currency', response.data)
+
+    def test_summary_converts_to_board_currency(self):
+        """Test that totals are converted once per currency into the board currency."""
+        self.add_expense('20.00', currency='EUR')
+        self.add_expense('1000', currency='JPY')
+        self.add_expense('5.00')
+        response = self.client.get(reverse('board-budget-summary', args=[self.board.pk]))
+        self.assertEqual(response.data['currency'], 'USD')
+        self.assertEqual(response.data['actual_spend_total'], '55.00')
+        self.assertEqual(response.data['by_category'], [{'category': 'food', 'total': '55.00'}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.filter(currency='EUR').update(rate=Decimal('0.25'))
+            clear_rates_cache()
+        response = self.client.get(reverse('board-budget-summary', args=[self.board.pk]))
+        self.assertEqual(response.data['actual_spend_total'], '95.00')
+
+    def test_timeseries_converts_to_board_currency(self):
+        """Test that rollups report in the board currency."""
+        self.add_expense('20.00', currency='EUR', date=date(2030, 3, 4))
+        self.add_expense('5.00', date=date(2030, 3, 4))
+        response = self.client.get(reverse('board-spending-timeseries', args=[self.board.pk]))
+        self.assertEqual(response.data['results'][0]['total'], '45.00')
+
+
+class ReconciliationTest(BudgetTestCase):
+    """Test cases for planned vs actual reconciliation."""
+
+    def setUp(self):
+        """Set up test data."""
+        super().setUp()
+        self.url = reverse('board-reconciliation', args=[self.board.pk])
+        lists = list(self.board.lists.order_by('position'))
+        self.hotel = Card.objects.create(list=lists[0], title='Hotel', budget=Decimal('100.00'), people_number=2, category='hotel')
+        self.flight = Card.objects.create(list=lists[1], title='Flight', budget=Decimal('300.00'), category='flight')
+
+    def test_planned_vs_actual(self):
+        """Test variance per card, list, category and board, with unlinked spend."""
+        self.add_expense('150.00', card=self.hotel)
+        self.add_expense('80.00', card=self.hotel)
+        self.add_expense('25.00')
+
+        # Authentication and board permission checks, then cards with linked spend and board totals
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        cards = {card['title']: card for card in response.data['cards']}
+        self.assertEqual(cards['Hotel']['planned'], '200.00')
+        self.assertEqual(cards['Hotel']['actual'], '230.00')
+        self.assertEqual(cards['Hotel']['variance'], '-30.00')
+        self.assertEqual(cards['Hotel']['expense_count'], 2)
+        self.assertEqual(cards['Flight']['actual'], '0.00')
+
+        self.assertEqual([line['planned'] for line in response.data['lists']], ['200.00', '300.00'])
+        categories = {line['category']: line for line in response.data['categories']}
+        self.assertEqual(categories['flight']['variance'], '300.00')
+
+        board = response.data['board']
+        self.assertEqual(board['planned'], '500.00')
+        self.assertEqual(board['actual'], '255.00')
+        self.assertEqual(board['unlinked_actual'], '25.00')
+
+    def test_linked_expenses_in_other_currency(self):
+        """Test that linked spend is converted into the board currency."""
+        ExchangeRate.objects.create(currency='EUR', rate=Decimal('0.5'))
+        self.add_expense('50.00', card=self.hotel)
+        self.add_expense('20.00', card=self.hotel, currency='EUR')
+
+        response = self.client.get(self.url)
+        cards = {card['title']: card for card in response.data['cards']}
+        self.assertEqual(cards['Hotel']['actual'], '90.00')
+        self.assertEqual(cards['Hotel']['expense_count'], 2)
+
+    def test_card_must_be_on_board(self):
+        """Test that expenses cannot be linked to another board's card."""
+        other_board = Board.objects.create(title='Chile', owner=self.user)
+        other_card = Card.objects.create(list=other_board.lists.first(), title='Hostel')
+        url = reverse('board-expenses', args=[self.board.pk])
+
+        response = self.client.post(url, {'title': 'Hostel', 'amount': '10.00', 'category': 'lodging', 'card': other_card.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('card', response.data)
+
+        response = self.client.post(url, {'title': 'Hotel', 'amount': '10.00', 'category': 'lodging', 'card': self.hotel.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['card'], self.hotel.pk)
+
+
+class ExpenseSplitTest(BudgetTestCase):
+    """Test cases for expense splits and the member balance ledger."""
+
+    def setUp(self):
+        """Set up test data."""
+        super().setUp()
+        self.friend = User.objects.create_user(username='friend', email='friend@example.com', password='testpass123')
+        self.board.members.add(self.friend)
+        self.expenses_url = reverse('board-expenses', args=[self.board.pk])
+        self.settle_url = reverse('board-settle-up', args=[self.board.pk])
+
+    def balances(self):
+        return dict(MemberBalance.objects.filter(board=self.board).values_list('user_id', 'balance'))
+
+    def create_split_expense(self, amount, splits):
+        response = self.client.post(self.expenses_url, {
+            'title': 'Dinner', 'amount': amount, 'category': 'food', 'splits': splits,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response
+
+    def test_even_split_updates_ledger(self):
+        """Test that an even split credits the payer and debits each member."""
+        response = self.create_split_expense('30.01', [{'user': self.user.pk}, {'user': self.friend.pk}])
+        self.assertEqual([split['amount'] for split in response.data['splits']], ['15.01', '15.00'])
+        self.assertEqual(self.balances(), {self.user.pk: Decimal('15.00'), self.friend.pk: Decimal('-15.00')})
+
+        response = self.client.get(self.settle_url)
+        self.assertEqual(response.data['transfers'], [
+            {'from_user_id': self.friend.pk, 'to_user_id': self.user.pk, 'amount': '15.00'}
+        ])
+
+        self.board.delete()
+        self.assertFalse(MemberBalance.objects.exists())
+
+    def test_amount_change_rescales_splits(self):
+        """Test that changing the amount rescales shares and moves balances."""
+        response = self.create_split_expense('30.00', [
+            {'user': self.user.pk, 'amount': '10.00'}, {'user': self.friend.pk, 'amount': '20.00'},
+        ])
+        url = reverse('expense-detail', args=[response.data['id']])
+        response = self.client.patch(url, {'amount': '60.00'}, format='json')
+        self.assertEqual([split['amount'] for split in response.data['splits']], ['20.00', '40.00'])
+        self.assertEqual(self.balances()[self.friend.pk], Decimal('-40.00'))
+
+        self.client.delete(url)
+        self.assertEqual(set(self.balances().values()), {Decimal('0.00')})
+
+    def test_invalid_splits_rejected(self):
+        """Test that splits must add up, not be negative and only include board members."""
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', password='testpass123')
+        for splits in (
+            [{'user': self.user.pk, 'amount': '10.00'}, {'user': self.friend.pk, 'amount': '5.00'}],
+            [{'user': stranger.pk}],
+            [{'user': self.friend.pk}, {'user': self.friend.pk}],
+            [{'user': self.user.pk, 'amount': '40.00'}, {'user': self.friend.pk, 'amount': '-10.00'}],
+        ):
+            response = self.client.post(self.expenses_url, {
+                'title': 'Dinner', 'amount': '30.00', 'category': 'food', 'splits': splits,
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('splits', response.data)
+        self.assertFalse(MemberBalance.objects.exists())
+
+    def test_settle_up_minimises_transfers(self):
+        """Test that the largest debts are paired with the largest credits."""
+        transfers = settle_up({1: Decimal('50.00'), 2: Decimal('-30.00'), 3: Decimal('-20.00'), 4: Decimal('0.00')})
+        self.assertEqual(transfers, [(2, 1, Decimal('30.00')), (3, 1, Decimal('20.00'))])
+
+
+class ExpenseImportTest(BudgetTestCase):
+    """Test cases for bulk CSV and OFX expense imports."""
+
+    def setUp(self):
+        """Set up test data."""
+        super().setUp()
+        self.url = reverse('board-expenses-import', args=[self.board.pk])
+
+    def upload(self, name, content):
+        return self.client.post(self.url, {'file': SimpleUploadedFile(name, content.encode())}, format='multipart')
+
+    def test_csv_import(self):
+        """Test that rows are inserted in bulk with one summary notification."""
+        response = self.upload('statement.csv', (
+            'title,amount,category,date,notes\n'
+            'Hostel,45.00,lodging,2030-03-04,\n'
+            'Ceviche,12.50,food,2030-03-04,lunch\n'
+            'Bus,8.00,travel,,\n'
+        ))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(Expense.objects.filter(board=self.board, currency='USD', created_by=self.user).count(), 3)
+        self.assertEqual(BudgetTotal.objects.get(board=self.board, category='lodging').total, Decimal('45.00'))
+        self.assertEqual(Notification.objects.filter(title='Expenses imported').count(), 1)
+        self.assertFalse(Notification.objects.filter(title='Budget updated').exists())
+
+    def test_invalid_rows_reject_import(self):
+        """Test that an invalid row rejects the whole import."""
+        response = self.upload('statement.csv', (
+            'title,amount,category\n'
+            'Hostel,45.00,lodging\n'
+            'Ceviche,lots,food\n'
+        ))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('3', response.data['rows'])
+        self.assertFalse(Expense.objects.exists())
+        self.assertFalse(BudgetTotal.objects.exists())
+
+    def test_non_utf8_csv_is_rejected(self):
+        """Test that a Latin-1 export is refused with the failing line instead of an error page."""
+        upload = SimpleUploadedFile('statement.csv', 'title,amount\nHostel,45\ncafé,3\n'.encode('latin-1'))
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Line 3', response.data['file'][0])
+        self.assertFalse(Expense.objects.exists())
+
+    def test_ofx_import(self):
+        """Test that OFX debits are imported and credits skipped."""
+        response = self.upload('statement.ofx', (
+            'OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD\n<BANKTRANLIST>\n'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20300304120000<TRNAMT>-23.40<NAME>Cusco Cafe<MEMO>Breakfast</STMTTRN>\n'
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20300305<TRNAMT>100.00<NAME>Refund</STMTTRN>\n'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+        ))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        expense = Expense.objects.get(board=self.board)
+        self.assertEqual((expense.title, expense.amount, expense.date, expense.category), ('Cusco Cafe', Decimal('23.40'), date(2030, 3, 4), 'misc'))
+
+
+class ExpenseExportTest(BudgetTestCase):
+    """Test cases for the streaming CSV expense export."""
+
+    def test_export_applies_filters(self):
+        """Test that the export streams filtered rows with converted amounts."""
+        ExchangeRate.objects.create(currency='EUR', rate=Decimal('0.5'))
+        self.add_expense('10.00', date=date(2030, 3, 4), notes='street food')
+        self.add_expense('20.00', currency='EUR', date=date(2030, 3, 5))
+        self.add_expense('99.00', category='travel', date=date(2030, 3, 5))
+
+        url = reverse('board-expenses-export', args=[self.board.pk])
+        response = self.client.get(url, {'category': 'food', 'date_from': '2030-03-01'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([(row['amount'], row['currency'], row['amount_usd']) for row in rows], [('10.00', 'USD', '10.00'), ('20.00', 'EUR', '40.00')])
+        self.assertEqual(rows[0]['created_by'], self.user.email)
+
+    def test_export_escapes_formulas(self):
+        """Test that text cells starting like formulas are quoted, amounts are not."""
+        expense = self.add_expense('-5.00', date=date(2030, 3, 4), notes='@SUM(A1)')
+        Expense.objects.filter(pk=expense.pk).update(title='=HYPERLINK("http://evil.example")')
+        url = reverse('board-expenses-export', args=[self.board.pk])
+        response = self.client.get(url)
+        row = next(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(row['title'], '\'=HYPERLINK("http://evil.example")')
+        self.assertEqual(row['notes'], "'@SUM(A1)")
+        self.assertEqual(row['amount'], '-5.00')
@@ -0,0 +1,95 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from .models import Expense, BudgetTotal, DailyExpenseRollup
+from .rates import MissingExchangeRate, convert_totals
+from users.dashboard import touch_board
+from users.notifications import notify
+
+
+def _apply_delta(model, key, amount, count):
+    updated = model.objects.filter(**key).update(
+        total=F('total') + amount,
+        expense_count=F('expense_count') + count,
+    )
+    # Only deltas adding expenses create rows, so a negative delta whose row
+    # is missing never leaves a negative total behind
+    if updated or count <= 0:
+        return
+
+    try:
+        with transaction.atomic():
+            model.objects.create(total=amount, expense_count=count, **key)
+    except IntegrityError:
+        # Another writer created the row first; apply the delta to theirs
+        _apply_delta(model, key, amount, count)
+
+
+def apply_expense_delta(board_id, category, date, currency, amount, count):
+    """
+    Add ``amount`` (in ``currency``) and ``count`` to a board's running total
+    for ``category`` and to its rollup for ``date``.
+
+    Rows are only created when adding expenses, so removals during a board's
+    cascade delete never resurrect a row for a board being deleted.
+    """
+    key = {'board_id': board_id, 'category': category, 'currency': currency}
+    _apply_delta(BudgetTotal, key, amount, count)
+    if date is not None:
+        _apply_delta(DailyExpenseRollup, {**key, 'date': date}, amount, count)
+    touch_board(board_id)
+
+
+def board_spend(board):
+    """Return a board's total spend in its own currency from its running totals."""
+    totals = BudgetTotal.objects.filter(board=board, expense_count__gt=0).values_list('currency', 'total')
+    return convert_totals(totals, board.currency)
+
+
+def notify_if_over_budget(board, delta):
+    """
+    Tell the board owner when a write adding ``delta`` (in the board's
+    currency) takes spend past the board budget.
+    """
+    if not board.budget or delta <= 0:
+        return
+    try:
+        spend = board_spend(board)
+    except MissingExchangeRate:
+        return
+
+    if spend - delta <= board.budget < spend:
+        notify(
+            [board.owner_id],
+            title="Budget exceeded",
+            message=f"Spending on board '{board.title}' is now {spend} {board.currency}, over the budget of {board.budget} {board.currency}."
+        )
+
+
+def board_expense_count(board_id):
+    """Return a board's number of expenses from its running totals."""
+    count = BudgetTotal.objects.filter(board_id=board_id).aggregate(count=Sum('expense_count'))['count']
+    return count or 0
+
+
+def rebuild_budget_totals(boards=None):
+    """Recompute running totals and daily rollups from expenses, for repairs and backfills."""
+    expenses = Expense.objects.all()
+    totals = BudgetTotal.objects.all()
+    rollups = DailyExpenseRollup.objects.all()
+    if boards is not None:
+        expenses = expenses.filter(board__in=boards)
+        totals = totals.filter(board__in=boards)
+        rollups = rollups.filter(board__in=boards)
+
+    total_rows = expenses.values('board_id', 'category', 'currency').annotate(total=Sum('amount'), expense_count=Count('id')).order_by()
+    rollup_rows = (
+        expenses.filter(date__isnull=False)
+        .values('board_id', 'date', 'category', 'currency')
+        .annotate(total=Sum('amount'), expense_count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        totals.delete()
+        rollups.delete()
+        BudgetTotal.objects.bulk_create([BudgetTotal(**row) for row in total_rows])
+        DailyExpenseRollup.objects.bulk_create([DailyExpenseRollup(**row) for row in rollup_rows], batch_size=1000)
@@ -5,9 +5,24 @@ urlpatterns = [
     # Expenses for a board
     path('boards/<int:board_id>/expenses/', views.ExpenseListCreateView.as_view(), name='board-expenses'),
     
+    # Bulk import of a CSV file or OFX statement
+    path('boards/<int:board_id>/expenses/import/', views.ExpenseImportView.as_view(), name='board-expenses-import'),
+    
+    # Streaming CSV export, accepting the same filters as the expense list
+    path('boards/<int:board_id>/expenses/export/', views.ExpenseExportView.as_view(), name='board-expenses-export'),
+    
     # Expense detail (global, not nested under board)
     path('expenses/<int:pk>/', views.ExpenseDetailView.as_view(), name='expense-detail'),
     
     # Budget summary for a board
     path('boards/<int:board_id>/budget/summary/', views.BoardBudgetSummaryView.as_view(), name='board-budget-summary'),
+    
+    # Planned vs actual spend per card, list, category and board
+    path('boards/<int:board_id>/reconciliation/', views.BoardReconciliationView.as_view(), name='board-reconciliation'),
+    
+    # Member balances from expense splits and the transfers that settle them
+    path('boards/<int:board_id>/settle-up/', views.BoardSettleUpView.as_view(), name='board-settle-up'),
+    
+    # Spending per day/week/month for a board
+    path('boards/<int:board_id>/timeseries/', views.BoardSpendingTimeSeriesView.as_view(), name='board-spending-timeseries'),
 ]
\ No newline at end of file
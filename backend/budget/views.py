@@ -1,15 +1,55 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
 from decimal import Decimal
-from .models import Expense
-from .serializers import ExpenseSerializer, BudgetSummarySerializer
+from .models import Expense, BudgetTotal, DailyExpenseRollup
+from .serializers import (
+    ExpenseSerializer, BudgetSummarySerializer, SpendingTimeSeriesSerializer, ReconciliationSerializer,
+    SettleUpSerializer,
+)
+from .totals import board_expense_count
+from .rates import CENTS, MissingExchangeRate, conversion_factors
+from .imports import import_expenses, iter_csv_rows, iter_ofx_rows
+from .exports import iter_expenses_csv
+from .reconciliation import reconcile_board
+from .splits import board_balances, settle_up
 from boards.models import Board
+from travelkanban.caching import RATES_TAG, CachedResponseMixin, board_tag
 from boards.permissions import IsBoardOwnerOrMember
 
 
+def get_conversion_factors(currencies, to_currency):
+    try:
+        return conversion_factors(currencies, to_currency)
+    except MissingExchangeRate as e:
+        raise ValidationError(str(e))
+
+
+def apply_expense_filters(queryset, query_params):
+    """Apply the category and date range filters shared by the expense endpoints."""
+    category = query_params.get('category')
+    date_from = query_params.get('date_from')
+    date_to = query_params.get('date_to')
+
+    if category:
+        queryset = queryset.filter(category=category)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    if date_from and date_to and date_from > date_to:
+        raise ValidationError("date_from must be before or equal to date_to")
+
+    return queryset
+
+
 class ExpenseListCreateView(generics.ListCreateAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
@@ -17,31 +57,17 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
-        queryset = Expense.objects.filter(board=board)
+        queryset = Expense.objects.filter(board=board).prefetch_related('splits')
 
         # Apply filters
-        category = self.request.query_params.get('category')
-        date_from = self.request.query_params.get('date_from')
-        date_to = self.request.query_params.get('date_to')
-
-        if category:
-            queryset = queryset.filter(category=category)
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
-        if date_from and date_to and date_from > date_to:
-            raise ValidationError("date_from must be before or equal to date_to")
-
-        return queryset
+        return apply_expense_filters(queryset, self.request.query_params)
 
     def perform_create(self, serializer):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
         serializer.save(
             board=board,
-            created_by=self.request.user,
-            currency=board.currency
+            created_by=self.request.user
         )
 
     def get_serializer_context(self):
@@ -50,6 +76,42 @@ class ExpenseListCreateView(generics.ListCreateAPIView):
         return context
 
 
+class ExpenseImportView(APIView):
+    """Import a CSV file or OFX bank statement as expenses on a board"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, board_id):
+        board = get_object_or_404(Board, pk=board_id)
+        self.check_object_permissions(request, board)
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError("file is required")
+
+        if upload.name.lower().endswith(('.ofx', '.qfx')):
+            rows = iter_ofx_rows(upload, category=request.data.get('category') or 'misc')
+        else:
+            rows = iter_csv_rows(upload)
+
+        created = import_expenses(board, request.user, rows)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+
+class ExpenseExportView(APIView):
+    """Stream a board's expenses as CSV, with the same filters as the expense list"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+
+    def get(self, request, board_id):
+        board = get_object_or_404(Board, pk=board_id)
+        self.check_object_permissions(request, board)
+        queryset = apply_expense_filters(Expense.objects.filter(board=board), request.query_params)
+
+        response = StreamingHttpResponse(iter_expenses_csv(queryset, board), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="board-{board.pk}-expenses.csv"'
+        return response
+
+
 class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
@@ -62,12 +124,6 @@ class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         self.check_object_permissions(self.request, obj)
         return obj
 
-    def perform_update(self, serializer):
-        board = serializer.instance.board
-        if 'currency' in serializer.validated_data and serializer.validated_data['currency'] != board.currency:
-            raise ValidationError("Currency must match the board's currency.")
-        serializer.save()
-
     def get_serializer_context(self):
         context = super().get_serializer_context()
         if self.get_object():
@@ -75,10 +131,13 @@ class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
         return context
 
 
-class BoardBudgetSummaryView(generics.RetrieveAPIView):
+class BoardBudgetSummaryView(CachedResponseMixin, generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
     serializer_class = BudgetSummarySerializer
 
+    def get_cache_tags(self, request):
+        return [board_tag(self.kwargs['board_id']), RATES_TAG]
+
     def get_object(self):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
@@ -86,29 +145,35 @@ class BoardBudgetSummaryView(generics.RetrieveAPIView):
 
     def retrieve(self, request, *args, **kwargs):
         board = self.get_object()
-        expenses = board.expenses.all()
 
-        # Aggregate total spending
-        total_result = expenses.aggregate(total=Sum('amount'))
-        actual_spend_total = total_result['total'] or Decimal('0.00')
+        # Running totals are maintained on every expense write (see signals)
+        totals = list(
+            BudgetTotal.objects.filter(board=board, expense_count__gt=0).values_list('category', 'currency', 'total')
+        )
+        factors = get_conversion_factors({currency for _, currency, _ in totals}, board.currency)
+
+        by_category = {}
+        for category, currency, total in totals:
+            by_category[category] = by_category.get(category, Decimal('0.00')) + total * factors[currency]
+        by_category = {category: total.quantize(CENTS) for category, total in by_category.items()}
+        actual_spend_total = sum(by_category.values(), Decimal('0.00'))
 
         # Calculate remaining budget
         remaining = board.budget - actual_spend_total
         if remaining < Decimal('0.00'):
             remaining = Decimal('0.00')
 
-        # Group by category
-        by_category = expenses.values('category').annotate(total=Sum('amount')).order_by('category')
         by_category_list = [
             {
-                'category': item['category'],
-                'total': str(item['total']) if item['total'] else '0.00'
+                'category': category,
+                'total': str(total) if total else '0.00'
             }
-            for item in by_category
+            for category, total in by_category.items()
         ]
 
         # Prepare data for serialization
         summary_data = {
+            'currency': board.currency,
             'board_budget': str(board.budget),
             'actual_spend_total': str(actual_spend_total),
             'remaining': str(remaining),
@@ -116,4 +181,112 @@ class BoardBudgetSummaryView(generics.RetrieveAPIView):
         }
 
         serializer = self.get_serializer(summary_data)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class BoardSpendingTimeSeriesView(generics.GenericAPIView):
+    """Spending per day, week or month and category for a board"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = SpendingTimeSeriesSerializer
+    buckets = {
+        'day': TruncDay,
+        'week': TruncWeek,
+        'month': TruncMonth,
+    }
+
+    def get_object(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_id'])
+        self.check_object_permissions(self.request, board)
+        return board
+
+    def get(self, request, *args, **kwargs):
+        board = self.get_object()
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in self.buckets:
+            raise ValidationError("bucket must be one of: day, week, month")
+
+        # Large boards are served from the daily rollups kept by the expense signals
+        if board_expense_count(board.pk) >= settings.BUDGET_ROLLUP_MIN_EXPENSES:
+            queryset, amount_field = DailyExpenseRollup.objects.filter(board=board, expense_count__gt=0), 'total'
+        else:
+            queryset, amount_field = Expense.objects.filter(board=board, date__isnull=False), 'amount'
+        queryset = apply_expense_filters(queryset, request.query_params)
+
+        rows = list(
+            queryset.annotate(period=self.buckets[bucket]('date'))
+            .values_list('period', 'category', 'currency')
+            .annotate(total=Sum(amount_field))
+            .order_by('period', 'category', 'currency')
+        )
+        factors = get_conversion_factors({currency for _, _, currency, _ in rows}, board.currency)
+
+        # Rows arrive sorted, so each bucket and category is contiguous
+        results = []
+        for period, category, currency, total in rows:
+            if not results or results[-1]['period'] != period:
+                results.append({'period': period, 'by_category': {}})
+            by_category = results[-1]['by_category']
+            by_category[category] = by_category.get(category, Decimal('0.00')) + total * factors[currency]
+        for item in results:
+            totals = {category: total.quantize(CENTS) for category, total in item['by_category'].items()}
+            item['total'] = str(sum(totals.values(), Decimal('0.00')))
+            item['by_category'] = [{'category': category, 'total': str(total)} for category, total in totals.items()]
+
+        serializer = self.get_serializer({
+            'bucket': bucket,
+            'currency': board.currency,
+            'results': results,
+        })
+        return Response(serializer.data)
+
+
+class BoardReconciliationView(generics.RetrieveAPIView):
+    """Planned (card budget x people) vs actual (linked expenses) spend for a board"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = ReconciliationSerializer
+
+    def get_object(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_id'])
+        self.check_object_permissions(self.request, board)
+        return board
+
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        try:
+            data = reconcile_board(board)
+        except MissingExchangeRate as e:
+            raise ValidationError(str(e))
+
+        serializer = self.get_serializer(data)
+        return Response(serializer.data)
+
+
+class BoardSettleUpView(generics.RetrieveAPIView):
+    """Member balances from the split ledger and the transfers that settle them"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+    serializer_class = SettleUpSerializer
+
+    def get_object(self):
+        board = get_object_or_404(Board, pk=self.kwargs['board_id'])
+        self.check_object_permissions(self.request, board)
+        return board
+
+    def retrieve(self, request, *args, **kwargs):
+        board = self.get_object()
+        try:
+            balances = board_balances(board)
+        except MissingExchangeRate as e:
+            raise ValidationError(str(e))
+
+        serializer = self.get_serializer({
+            'currency': board.currency,
+            'balances': [
+                {'user_id': user_id, 'balance': str(balance)}
+                for user_id, balance in sorted(balances.items())
+            ],
+            'transfers': [
+                {'from_user_id': from_user_id, 'to_user_id': to_user_id, 'amount': str(amount)}
+                for from_user_id, to_user_id, amount in settle_up(balances)
+            ],
+        })
+        return Response(serializer.data)
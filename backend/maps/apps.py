@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class MapsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'maps'
\ No newline at end of file
+    name = 'maps'
+
+    def ready(self):
+        import maps.signals  # noqa: F401 - Import to connect signals
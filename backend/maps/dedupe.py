@@ -0,0 +1,154 @@
+"""
+Near-duplicate detection for board locations.
+
+Two locations are duplicates when they are on the same board, within
+``DUPLICATE_RADIUS_METERS`` of each other and have similar names. Candidates
+come from bounding-box queries that the (board, lat, lng) index answers, so
+the check never scans a board's locations. Boxes crossing the antimeridian
+are split in two.
+"""
+import math
+import operator
+import re
+from difflib import SequenceMatcher
+from functools import reduce
+from django.db.models import Q
+from .gazetteer import normalize
+from .models import Location
+
+DUPLICATE_RADIUS_METERS = 30
+NAME_SIMILARITY_THRESHOLD = 0.8
+WORD_RE = re.compile(r'\w+')
+
+EARTH_RADIUS_METERS = 6371000
+METERS_PER_DEGREE = 111320
+
+# Bounding boxes ORed into one candidate query by DuplicateIndex
+BOXES_PER_QUERY = 100
+
+
+def distance_meters(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points (haversine)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _words(name):
+    """Space-padded words of ``name``, so containment only matches whole words."""
+    words = ' '.join(WORD_RE.findall(name))
+    return f' {words} '
+
+
+def names_similar(a, b):
+    a, b = normalize(a), normalize(b)
+    if not a or not b:
+        return False
+    # Whole-word containment: "Park Hyatt" matches "Park Hyatt Tokyo", but
+    # "Paris" does not match "Parisian Cafe"
+    words_a, words_b = _words(a), _words(b)
+    if words_a.strip() and words_b.strip() and (words_a in words_b or words_b in words_a):
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= NAME_SIMILARITY_THRESHOLD
+
+
+def _degree_margins(lat, radius):
+    lat_margin = radius / METERS_PER_DEGREE
+    # Longitude degrees shrink towards the poles; clamp to avoid dividing by ~0
+    lng_margin = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lat_margin, lng_margin
+
+
+def _box(lat_low, lat_high, lng_low, lng_high):
+    """Filter for a bounding box, wrapping longitudes past the antimeridian."""
+    if lng_low < -180:
+        lng_filter = Q(lng__gte=lng_low + 360) | Q(lng__lte=lng_high)
+    elif lng_high > 180:
+        lng_filter = Q(lng__gte=lng_low) | Q(lng__lte=lng_high - 360)
+    else:
+        lng_filter = Q(lng__range=(lng_low, lng_high))
+    return Q(lat__range=(lat_low, lat_high)) & lng_filter
+
+
+def is_duplicate(location, name, lat, lng, radius=DUPLICATE_RADIUS_METERS):
+    return (
+        distance_meters(location.lat, location.lng, lat, lng) <= radius
+        and names_similar(location.name, name)
+    )
+
+
+def find_near_duplicate(board, name, lat, lng, exclude_pk=None, radius=DUPLICATE_RADIUS_METERS):
+    """Return an existing location on ``board`` that duplicates the given one, or None."""
+    lat_margin, lng_margin = _degree_margins(lat, radius)
+    candidates = Location.objects.filter(
+        _box(lat - lat_margin, lat + lat_margin, lng - lng_margin, lng + lng_margin),
+        board=board,
+    ).order_by('created_at')
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+
+    for candidate in candidates:
+        if is_duplicate(candidate, name, lat, lng, radius):
+            return candidate
+    return None
+
+
+class DuplicateIndex:
+    """
+    In-memory grid over a board's locations near a batch of points, used by
+    bulk imports to check every row without a query each. The grid cells
+    holding rows, widened by one cell, are fetched as ORed bounding boxes, so
+    rows spread across continents only load the locations near them. Rows
+    accepted from the batch are added so duplicates within the batch are
+    caught too.
+    """
+
+    def __init__(self, board, rows, radius=DUPLICATE_RADIUS_METERS):
+        self.radius = radius
+        self._cells = {}
+        if not rows:
+            self.lat_cell = self.lng_cell = 1.0
+            return
+
+        # Margins at the batch's most poleward latitude cover every row, and
+        # double as the grid cell size so a 3x3 neighbourhood spans the radius
+        self.lat_cell, self.lng_cell = _degree_margins(max(abs(lat) for _, lat, _ in rows), radius)
+        boxes = [
+            _box(
+                (lat_key - 1) * self.lat_cell, (lat_key + 2) * self.lat_cell,
+                (lng_key - 1) * self.lng_cell, (lng_key + 2) * self.lng_cell,
+            )
+            for lat_key, lng_key in sorted({self._key(lat, lng) for _, lat, lng in rows})
+        ]
+        seen = set()
+        for start in range(0, len(boxes), BOXES_PER_QUERY):
+            existing = Location.objects.filter(
+                reduce(operator.or_, boxes[start:start + BOXES_PER_QUERY]), board=board
+            ).only('id', 'name', 'lat', 'lng')
+            for location in existing:
+                # Neighbouring boxes overlap across queries
+                if location.pk not in seen:
+                    seen.add(location.pk)
+                    self.add(location)
+
+    def _key(self, lat, lng):
+        return math.floor(lat / self.lat_cell), math.floor(lng / self.lng_cell)
+
+    def add(self, location):
+        self._cells.setdefault(self._key(location.lat, location.lng), []).append(location)
+        # Points near the antimeridian are also filed next to the points across it
+        if location.lng + 2 * self.lng_cell > 180:
+            self._cells.setdefault(self._key(location.lat, location.lng - 360), []).append(location)
+        elif location.lng - 2 * self.lng_cell < -180:
+            self._cells.setdefault(self._key(location.lat, location.lng + 360), []).append(location)
+
+    def find(self, name, lat, lng):
+        lat_key, lng_key = self._key(lat, lng)
+        for d_lat in (-1, 0, 1):
+            for d_lng in (-1, 0, 1):
+                for location in self._cells.get((lat_key + d_lat, lng_key + d_lng), ()):
+                    if is_duplicate(location, name, lat, lng, self.radius):
+                        return location
+        return None
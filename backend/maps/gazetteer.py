@@ -0,0 +1,183 @@
+"""
+Offline place-name gazetteer.
+
+``build_gazetteer`` turns a place-name CSV into a compact binary file: a
+header, fixed-size records sorted by normalized name, and a blob holding the
+names. ``get_gazetteer`` memory-maps that file on first use, so prefix lookups
+are a binary search over the mapped records and never touch the database.
+"""
+import bisect
+import csv
+import mmap
+import os
+import struct
+import threading
+import unicodedata
+from django.conf import settings
+from .serializers import lat_in_bounds, lng_in_bounds
+
+MAGIC = b'TKGAZ001'
+HEADER = struct.Struct('<8sI')  # magic, record count
+# blob offset, key length, name length, country length, lat, lng
+RECORD = struct.Struct('<IHHHdd')
+
+NAME_COLUMNS = ('name', 'asciiname', 'place')
+LAT_COLUMNS = ('lat', 'latitude')
+LNG_COLUMNS = ('lng', 'lon', 'long', 'longitude')
+COUNTRY_COLUMNS = ('country', 'country_code', 'countrycode')
+
+# GeoNames dumps (allCountries.txt, cities500.txt, ...) are tab separated with
+# no header row; these name their first nine columns
+GEONAMES_COLUMNS = (
+    'geonameid', 'name', 'asciiname', 'alternatenames', 'latitude', 'longitude',
+    'feature_class', 'feature_code', 'country_code',
+)
+
+
+def normalize(text):
+    """Casefold, strip accents and collapse whitespace for prefix matching."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.split())
+
+
+def _pick_column(fieldnames, candidates):
+    lowered = {name.strip().lower(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def build_gazetteer(source, output_path, delimiter=',', geonames=False):
+    """
+    Read place names from the CSV file object ``source`` and write a sorted
+    gazetteer to ``output_path``. The file is replaced atomically so running
+    servers pick up the new version on their next lookup. With ``geonames``,
+    ``source`` is a headerless GeoNames dump instead.
+
+    Returns the number of places written.
+    """
+    if geonames:
+        # GeoNames fields are never quoted but may contain quote characters
+        reader = csv.DictReader(source, fieldnames=GEONAMES_COLUMNS, delimiter='\t', quoting=csv.QUOTE_NONE)
+    else:
+        reader = csv.DictReader(source, delimiter=delimiter)
+    fieldnames = reader.fieldnames or []
+    name_column = _pick_column(fieldnames, NAME_COLUMNS)
+    lat_column = _pick_column(fieldnames, LAT_COLUMNS)
+    lng_column = _pick_column(fieldnames, LNG_COLUMNS)
+    country_column = _pick_column(fieldnames, COUNTRY_COLUMNS)
+    if not (name_column and lat_column and lng_column):
+        raise ValueError("CSV must have name, lat and lng columns.")
+
+    places = []
+    for row in reader:
+        name = (row.get(name_column) or '').strip()
+        key = normalize(name)
+        try:
+            lat, lng = float(row[lat_column]), float(row[lng_column])
+        except (TypeError, ValueError):
+            continue
+        if not key or not lat_in_bounds(lat) or not lng_in_bounds(lng):
+            continue
+        country = (row.get(country_column) or '').strip() if country_column else ''
+        places.append((key.encode(), name.encode(), country.encode(), lat, lng))
+
+    places.sort()
+
+    records = bytearray()
+    blob = bytearray()
+    for key, name, country, lat, lng in places:
+        records += RECORD.pack(len(blob), len(key), len(name), len(country), lat, lng)
+        blob += key + name + country
+
+    tmp_path = f'{output_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(places)))
+        f.write(records)
+        f.write(blob)
+    os.replace(tmp_path, output_path)
+    return len(places)
+
+
+class Gazetteer:
+    """Read-only, memory-mapped view over a gazetteer file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime_ns
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a gazetteer file.")
+        self._blob_start = HEADER.size + self.count * RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, index):
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+
+    def _key(self, index):
+        offset, key_len = self._record(index)[:2]
+        start = self._blob_start + offset
+        return self._map[start:start + key_len]
+
+    def search(self, query, limit=10):
+        """Return up to ``limit`` places whose normalized name starts with ``query``."""
+        prefix = normalize(query).encode()
+        if not prefix:
+            return []
+
+        index = bisect.bisect_left(range(self.count), prefix, key=self._key)
+        results = []
+        while index < self.count and len(results) < limit:
+            offset, key_len, name_len, country_len, lat, lng = self._record(index)
+            start = self._blob_start + offset
+            if not self._map[start:start + key_len].startswith(prefix):
+                break
+            name_start = start + key_len
+            country_start = name_start + name_len
+            results.append({
+                'name': self._map[name_start:country_start].decode(),
+                'country': self._map[country_start:country_start + country_len].decode(),
+                'lat': lat,
+                'lng': lng,
+            })
+            index += 1
+        return results
+
+    def close(self):
+        self._map.close()
+
+
+_lock = threading.Lock()
+_gazetteer = None
+
+
+def get_gazetteer():
+    """
+    Return the gazetteer at ``settings.GAZETTEER_PATH``, mapping it on first
+    use and remapping when the file is rebuilt. Returns None if the file has
+    not been built.
+    """
+    global _gazetteer
+    path = str(settings.GAZETTEER_PATH)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    current = _gazetteer
+    if current is not None and current.path == path and current.mtime == mtime:
+        return current
+
+    with _lock:
+        if _gazetteer is None or _gazetteer.path != path or _gazetteer.mtime != mtime:
+            # Previous maps are left to the garbage collector, since other
+            # threads may still be reading from them.
+            _gazetteer = Gazetteer(path)
+        return _gazetteer
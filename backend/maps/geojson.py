@@ -0,0 +1,86 @@
+import json
+from .serializers import lat_in_bounds, lng_in_bounds
+
+# Rows per INSERT statement when importing a FeatureCollection
+IMPORT_BATCH_SIZE = 1000
+
+# Rows fetched per round trip when streaming an export
+EXPORT_CHUNK_SIZE = 2000
+
+NAME_MAX_LENGTH = 200
+
+
+def parse_feature_collection(data):
+    """
+    Validate a GeoJSON FeatureCollection of Point features.
+
+    Returns a tuple ``(rows, errors)`` where ``rows`` is a list of
+    ``(name, lat, lng)`` tuples and ``errors`` maps feature indexes to
+    messages. Bounds match ``LocationSerializer.validate_lat``/``validate_lng``.
+    """
+    if not isinstance(data, dict) or data.get('type') != 'FeatureCollection':
+        raise ValueError("Expected a GeoJSON FeatureCollection.")
+
+    features = data.get('features')
+    if not isinstance(features, list):
+        raise ValueError("FeatureCollection must contain a 'features' list.")
+
+    rows = []
+    errors = {}
+    for index, feature in enumerate(features):
+        if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+            errors[index] = "Item is not a GeoJSON Feature."
+            continue
+
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') != 'Point':
+            errors[index] = "Only Point geometries are supported."
+            continue
+
+        coordinates = geometry.get('coordinates')
+        try:
+            # GeoJSON positions are [longitude, latitude]
+            lng, lat = float(coordinates[0]), float(coordinates[1])
+        except (TypeError, ValueError, IndexError):
+            errors[index] = "Point coordinates must be [lng, lat] numbers."
+            continue
+
+        if not lat_in_bounds(lat):
+            errors[index] = "Latitude must be between -90 and 90."
+            continue
+        if not lng_in_bounds(lng):
+            errors[index] = "Longitude must be between -180 and 180."
+            continue
+
+        properties = feature.get('properties') or {}
+        name = str(properties.get('name') or '').strip()
+        if not name:
+            errors[index] = "Feature properties must include a name."
+            continue
+        if len(name) > NAME_MAX_LENGTH:
+            errors[index] = f"Name must be at most {NAME_MAX_LENGTH} characters."
+            continue
+
+        rows.append((name, lat, lng))
+
+    return rows, errors
+
+
+def iter_feature_collection(queryset):
+    """
+    Yield a GeoJSON FeatureCollection for ``queryset`` in chunks, so large
+    boards are exported with constant memory.
+    """
+    yield '{"type": "FeatureCollection", "features": ['
+    rows = queryset.values_list('id', 'name', 'lat', 'lng').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    separator = ''
+    for pk, name, lat, lng in rows:
+        feature = {
+            'type': 'Feature',
+            'id': pk,
+            'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+            'properties': {'name': name},
+        }
+        yield separator + json.dumps(feature)
+        separator = ', '
+    yield ']}'
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from boards.models import Card
+from maps.sync import backfill_card_locations
+
+
+class Command(BaseCommand):
+    help = "Project existing Card.location JSON into indexed maps.Location rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', type=int, help="Only backfill cards on this board ID.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Cards processed per batch (default: 500).")
+
+    def handle(self, *args, **options):
+        cards = Card.objects.all()
+        if options['board']:
+            cards = cards.filter(list__board_id=options['board'])
+
+        created, updated, removed = backfill_card_locations(cards, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Card locations backfilled: {created} created, {updated} updated, {removed} removed."
+        ))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from maps.gazetteer import build_gazetteer
+
+
+class Command(BaseCommand):
+    help = "Build the offline place-name gazetteer used by /api/maps/autocomplete/ from a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV (or TSV with --delimiter) with name, lat, lng and optional country columns.")
+        parser.add_argument('--delimiter', default=',', help="Field delimiter (default: ','). Use '\\t' for tab-separated files.")
+        parser.add_argument('--geonames', action='store_true', help="Read a headerless GeoNames dump (e.g. cities500.txt).")
+        parser.add_argument('--output', default=None, help="Output file (default: settings.GAZETTEER_PATH).")
+
+    def handle(self, *args, **options):
+        delimiter = '\t' if options['delimiter'] in ('\\t', 'tab') else options['delimiter']
+        output = options['output'] or str(settings.GAZETTEER_PATH)
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as source:
+                count = build_gazetteer(source, output, delimiter=delimiter, geonames=options['geonames'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f"Gazetteer built with {count} places at {output}."))
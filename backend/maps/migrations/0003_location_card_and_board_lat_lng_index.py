@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('maps', '0002_location_delete_maplocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='card',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='map_location', to='boards.card'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['board', 'lat', 'lng'], name='locations_board_lat_lng_idx'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from boards.models import Board
+from boards.models import Board, Card
 from users.models import User
 
 class Location(models.Model):
@@ -8,6 +8,8 @@ class Location(models.Model):
     lat = models.FloatField()
     lng = models.FloatField()
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_locations')
+    # Set when the row is the projection of a card's ``location`` JSON
+    card = models.OneToOneField(Card, on_delete=models.CASCADE, null=True, blank=True, related_name='map_location')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -16,4 +18,7 @@ class Location(models.Model):
 
     class Meta:
         db_table = 'locations'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['board', 'lat', 'lng'], name='locations_board_lat_lng_idx'),
+        ]
\ No newline at end of file
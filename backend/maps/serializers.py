@@ -2,23 +2,35 @@ from rest_framework import serializers
 from .models import Location
 from users.serializers import UserSerializer
 
+LAT_BOUNDS = (-90, 90)
+LNG_BOUNDS = (-180, 180)
+
+
+def lat_in_bounds(value):
+    return LAT_BOUNDS[0] <= value <= LAT_BOUNDS[1]
+
+
+def lng_in_bounds(value):
+    return LNG_BOUNDS[0] <= value <= LNG_BOUNDS[1]
+
+
 class LocationSerializer(serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
 
     class Meta:
         model = Location
         fields = [
-            'id', 'board', 'name', 'lat', 'lng',
+            'id', 'board', 'name', 'lat', 'lng', 'card',
             'created_by', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'board', 'created_by', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'board', 'card', 'created_by', 'created_at', 'updated_at']
 
     def validate_lat(self, value):
-        if not -90 <= value <= 90:
+        if not lat_in_bounds(value):
             raise serializers.ValidationError("Latitude must be between -90 and 90.")
         return value
 
     def validate_lng(self, value):
-        if not -180 <= value <= 180:
+        if not lng_in_bounds(value):
             raise serializers.ValidationError("Longitude must be between -180 and 180.")
         return value
\ No newline at end of file
@@ -0,0 +1,37 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from boards.models import Card
+from users.dashboard import touch_board
+from .models import Location
+from .sync import card_coordinates, sync_card_location
+
+# Card fields the projected Location row is built from
+CARD_LOCATION_FIELDS = {'title', 'location', 'list', 'list_id'}
+
+
+def projected_location(card):
+    return card.list_id, card_coordinates(card)
+
+
+@receiver(post_init, sender=Card)
+def remember_card_location(sender, instance, **kwargs):
+    # Reading deferred fields here would cost a query per card loaded
+    if instance.pk is not None and not CARD_LOCATION_FIELDS & instance.get_deferred_fields():
+        instance._projected_location = projected_location(instance)
+
+@receiver(post_save, sender=Card)
+def sync_card_map_location(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not CARD_LOCATION_FIELDS & set(update_fields):
+        return
+    projected = projected_location(instance)
+    previous = instance.__dict__.get('_projected_location')
+    instance._projected_location = projected
+    # A new card without coordinates has no projected row to create or remove,
+    # and saves that leave the projection alone (e.g. reordering) have nothing to sync
+    if (created and projected[1] is None) or (not created and projected == previous):
+        return
+    sync_card_location(instance)
+
+@receiver([post_save, post_delete], sender=Location)
+def invalidate_board_locations(sender, instance, **kwargs):
+    touch_board(instance.board_id)
@@ -0,0 +1,94 @@
+from django.utils import timezone
+from users.dashboard import touch_board
+from .models import Location
+from .serializers import lat_in_bounds, lng_in_bounds
+
+NAME_MAX_LENGTH = Location._meta.get_field('name').max_length
+
+
+def card_coordinates(card):
+    """
+    Return ``(name, lat, lng)`` from a card's ``location`` JSON, or None if it
+    is empty or not a valid ``{"name", "lat", "lng"}`` point.
+    """
+    location = card.location
+    if not isinstance(location, dict):
+        return None
+    try:
+        lat, lng = float(location['lat']), float(location['lng'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not lat_in_bounds(lat) or not lng_in_bounds(lng):
+        return None
+    name = str(location.get('name') or card.title).strip()[:NAME_MAX_LENGTH]
+    return name, lat, lng
+
+
+def sync_card_location(card):
+    """Create, update or remove the Location row projected from ``card``."""
+    coordinates = card_coordinates(card)
+    if coordinates is None:
+        Location.objects.filter(card=card).delete()
+        return None
+
+    name, lat, lng = coordinates
+    location, _ = Location.objects.update_or_create(
+        card=card,
+        defaults={'board_id': card.list.board_id, 'name': name, 'lat': lat, 'lng': lng},
+    )
+    return location
+
+
+def backfill_card_locations(cards, batch_size=500):
+    """
+    Project the ``location`` JSON of ``cards`` into Location rows in batches.
+
+    Returns a ``(created, updated, removed)`` tuple of row counts.
+    """
+    created = updated = removed = 0
+    cards = cards.select_related('list').only('id', 'title', 'location', 'list__board_id')
+
+    batch = []
+    for card in cards.iterator(chunk_size=batch_size):
+        batch.append(card)
+        if len(batch) >= batch_size:
+            counts = _backfill_batch(batch)
+            created, updated, removed = created + counts[0], updated + counts[1], removed + counts[2]
+            batch = []
+    if batch:
+        counts = _backfill_batch(batch)
+        created, updated, removed = created + counts[0], updated + counts[1], removed + counts[2]
+
+    return created, updated, removed
+
+
+def _backfill_batch(cards):
+    existing = {
+        location.card_id: location
+        for location in Location.objects.filter(card__in=cards)
+    }
+
+    to_create, to_update, to_remove = [], [], []
+    for card in cards:
+        coordinates = card_coordinates(card)
+        location = existing.get(card.pk)
+        if coordinates is None:
+            if location is not None:
+                to_remove.append(location.pk)
+            continue
+
+        name, lat, lng = coordinates
+        if location is None:
+            to_create.append(Location(card=card, board_id=card.list.board_id, name=name, lat=lat, lng=lng))
+        elif (location.board_id, location.name, location.lat, location.lng) != (card.list.board_id, name, lat, lng):
+            location.board_id, location.name, location.lat, location.lng = card.list.board_id, name, lat, lng
+            location.updated_at = timezone.now()
+            to_update.append(location)
+
+    Location.objects.bulk_create(to_create)
+    Location.objects.bulk_update(to_update, ['board', 'name', 'lat', 'lng', 'updated_at'])
+    Location.objects.filter(pk__in=to_remove).delete()
+    # Bulk writes send no signals
+    if to_create or to_update:
+        touch_board(*{location.board_id for location in to_create + to_update})
+    return len(to_create), len(to_update), len(to_remove)
@@ -1,3 +1,309 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from boards.models import Board, Card
+from .dedupe import names_similar
+from .models import Location
 
-# Create your tests here.
+User = get_user_model()
+
+
+def point(name, lng, lat):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+        'properties': {'name': name},
+    }
+
+
+class LocationGeoJSONTest(APITestCase):
+    """Test cases for bulk GeoJSON import and export of locations."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='traveller',
+            email='traveller@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Japan', owner=self.user)
+        self.import_url = reverse('board-locations-import', args=[self.board.pk])
+        self.export_url = reverse('board-locations-export', args=[self.board.pk])
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def test_import_feature_collection(self):
+        """Test that valid features are inserted in bulk."""
+        data = {
+            'type': 'FeatureCollection',
+            'features': [point(f'Place {i}', 139.0 + i / 100, 35.0) for i in range(25)],
+        }
+        response = self.client.post(self.import_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 25)
+        self.assertEqual(Location.objects.filter(board=self.board).count(), 25)
+
+    def test_import_rejects_out_of_bounds(self):
+        """Test that one invalid feature rejects the whole import."""
+        data = {
+            'type': 'FeatureCollection',
+            'features': [point('Tokyo', 139.69, 35.68), point('Nowhere', 200, 10)],
+        }
+        response = self.client.post(self.import_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('1', response.data['features'])
+        self.assertFalse(Location.objects.exists())
+
+    def test_import_requires_feature_collection(self):
+        """Test that non-FeatureCollection payloads are rejected."""
+        response = self.client.post(self.import_url, point('Tokyo', 139.69, 35.68), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_streams_feature_collection(self):
+        """Test that the export is a valid FeatureCollection."""
+        Location.objects.create(board=self.board, name='Kyoto', lat=35.01, lng=135.77)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        collection = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual(collection['features'][0]['geometry']['coordinates'], [135.77, 35.01])
+        self.assertEqual(collection['features'][0]['properties']['name'], 'Kyoto')
+
+    def test_import_skips_near_duplicates(self):
+        """Test that the import skips rows matching existing or earlier rows."""
+        existing = Location.objects.create(board=self.board, name='Hotel Gracery', lat=35.6945, lng=139.7017)
+        data = {
+            'type': 'FeatureCollection',
+            'features': [
+                point('Hotel Gracery Shinjuku', 139.70172, 35.69451),
+                point('Senso-ji', 139.7967, 35.7148),
+                point('Sensoji', 139.79671, 35.71481),
+            ],
+        }
+        response = self.client.post(self.import_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(
+            [(item['index'], item['duplicate']['name']) for item in response.data['duplicates']],
+            [(0, 'Hotel Gracery'), (2, 'Senso-ji')]
+        )
+        self.assertEqual(response.data['duplicates'][0]['duplicate']['id'], existing.pk)
+
+
+    def test_import_checks_duplicates_near_each_row(self):
+        """Test that rows far apart are checked, including across the antimeridian."""
+        Location.objects.create(board=self.board, name='Taveuni Island Resort', lat=-16.8, lng=179.9999)
+        Location.objects.create(board=self.board, name='Louvre', lat=48.8606, lng=2.3376)
+        data = {
+            'type': 'FeatureCollection',
+            'features': [
+                point('Taveuni Island Resort', -179.9999, -16.8),
+                point('Louvre', 2.33761, 48.86061),
+                point('Golden Gate Bridge', -122.4783, 37.8199),
+            ],
+        }
+        response = self.client.post(self.import_url, data, format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([item['index'] for item in response.data['duplicates']], [0, 1])
+
+class LocationDuplicateTest(APITestCase):
+    """Test cases for near-duplicate detection on location create."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='traveller',
+            email='traveller@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Japan', owner=self.user)
+        self.url = reverse('board-locations', args=[self.board.pk])
+        self.existing = Location.objects.create(board=self.board, name='Park Hyatt Tokyo', lat=35.6856, lng=139.6907)
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def test_near_duplicate_returns_match(self):
+        """Test that a nearby location with a similar name is rejected with the match."""
+        data = {'name': 'Park Hyatt', 'lat': 35.68562, 'lng': 139.69073}
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['duplicate']['id'], self.existing.pk)
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_distinct_locations_are_created(self):
+        """Test that nearby places with different names, and far places, are allowed."""
+        response = self.client.post(self.url, {'name': 'Tokyo Opera City', 'lat': 35.68565, 'lng': 139.69075}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(self.url, {'name': 'Park Hyatt Tokyo', 'lat': 35.70, 'lng': 139.70}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_names_must_share_whole_words(self):
+        """Test that a name merely starting with another is not a duplicate."""
+        Location.objects.create(board=self.board, name='Paris', lat=35.6900, lng=139.6950)
+        response = self.client.post(self.url, {'name': 'Parisian Cafe', 'lat': 35.69001, 'lng': 139.69501}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(names_similar('Park Hyatt', 'Park Hyatt, Tokyo'))
+
+    def test_allow_duplicates(self):
+        """Test that clients can insert a duplicate explicitly."""
+        data = {'name': 'Park Hyatt Tokyo', 'lat': 35.6856, 'lng': 139.6907}
+        response = self.client.post(f'{self.url}?allow_duplicates=true', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class CardLocationSyncTest(TestCase):
+    """Test cases for projecting Card.location into Location rows."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='traveller',
+            email='traveller@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Italy', owner=self.user)
+        self.list = self.board.lists.first()
+
+    def test_card_location_is_projected(self):
+        """Test that saving a card with coordinates creates and updates its row."""
+        card = Card.objects.create(list=self.list, title='Colosseum', location={'name': 'Colosseum', 'lat': 41.89, 'lng': 12.49})
+        location = Location.objects.get(card=card)
+        self.assertEqual((location.board_id, location.lat, location.lng), (self.board.pk, 41.89, 12.49))
+
+        card.location = {'name': 'Pantheon', 'lat': 41.9, 'lng': 12.48}
+        card.save()
+        location.refresh_from_db()
+        self.assertEqual(location.name, 'Pantheon')
+        self.assertEqual(Location.objects.filter(board=self.board).count(), 1)
+
+    def test_clearing_card_location_removes_row(self):
+        """Test that clearing a card's location removes its projected row."""
+        card = Card.objects.create(list=self.list, title='Trevi', location={'name': 'Trevi', 'lat': 41.9, 'lng': 12.48})
+        card.location = {}
+        card.save()
+        self.assertFalse(Location.objects.filter(card=card).exists())
+
+    def test_reordering_skips_sync(self):
+        """Test that saves leaving the card's location alone do not touch its row."""
+        card = Card.objects.create(list=self.list, title='Forum', location={'name': 'Forum', 'lat': 41.89, 'lng': 12.48})
+        card = Card.objects.get(pk=card.pk)
+        card.position = 5
+        with CaptureQueriesContext(connection) as queries:
+            card.save(update_fields=['position'])
+            card.save()
+        self.assertFalse([query for query in queries if '"locations"' in query['sql']])
+
+        card.title = 'Roman Forum'
+        card.save()
+        self.assertEqual(Location.objects.get(card=card).name, 'Forum')
+        card.location = {'lat': 41.89, 'lng': 12.48}
+        card.save()
+        self.assertEqual(Location.objects.get(card=card).name, 'Roman Forum')
+
+    def test_backfill_command(self):
+        """Test that the backfill command projects existing card JSON."""
+        card = Card.objects.create(list=self.list, title='Vatican')
+        Card.objects.filter(pk=card.pk).update(location={'lat': 41.9, 'lng': 12.45})
+        call_command('backfill_card_locations', stdout=StringIO())
+        location = Location.objects.get(card=card)
+        self.assertEqual(location.name, 'Vatican')
+
+
+class PlaceAutocompleteTest(APITestCase):
+    """Test cases for the offline gazetteer and autocomplete endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(
+            username='traveller',
+            email='traveller@example.com',
+            password='testpass123'
+        )
+        self.url = reverse('place-autocomplete')
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.csv_path = os.path.join(tmp_dir, 'places.csv')
+        self.gazetteer_path = os.path.join(tmp_dir, 'gazetteer.bin')
+        with open(self.csv_path, 'w', encoding='utf-8') as f:
+            f.write('name,lat,lng,country\n')
+            f.write('Paris,48.8566,2.3522,FR\n')
+            f.write('Parma,44.8015,10.3279,IT\n')
+            f.write('Zürich,47.3769,8.5417,CH\n')
+            f.write('Lima,-12.0464,-77.0428,PE\n')
+            f.write('Broken,north,east,XX\n')
+
+    def test_prefix_lookup(self):
+        """Test that the loader builds a searchable gazetteer."""
+        call_command('load_gazetteer', self.csv_path, output=self.gazetteer_path, stdout=StringIO())
+        with override_settings(GAZETTEER_PATH=self.gazetteer_path):
+            response = self.client.get(self.url, {'q': 'par'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual([place['name'] for place in response.data['results']], ['Paris', 'Parma'])
+
+            # Accents and case are ignored
+            response = self.client.get(self.url, {'q': 'ZUR'})
+            self.assertEqual(response.data['results'][0]['country'], 'CH')
+
+    def test_geonames_dump(self):
+        """Test that headerless GeoNames dumps are read by column position."""
+        geonames_path = os.path.join(os.path.dirname(self.csv_path), 'cities500.txt')
+        with open(geonames_path, 'w', encoding='utf-8') as f:
+            f.write('2988507\tParis\tParis\tPa"ree,Lutece\t48.85341\t2.3488\tP\tPPLC\tFR\t\t11\n')
+            f.write('3174659\tLima\tLima\t\t-12.04318\t-77.02824\tP\tPPLC\tPE\t\t15\n')
+        call_command('load_gazetteer', geonames_path, geonames=True, output=self.gazetteer_path, stdout=StringIO())
+        with override_settings(GAZETTEER_PATH=self.gazetteer_path):
+            response = self.client.get(self.url, {'q': 'par'})
+        self.assertEqual(response.data['results'][0]['name'], 'Paris')
+        self.assertEqual(response.data['results'][0]['country'], 'FR')
+
+    def test_missing_gazetteer(self):
+        """Test that the endpoint reports when no gazetteer is built."""
+        with override_settings(GAZETTEER_PATH=self.gazetteer_path):
+            response = self.client.get(self.url, {'q': 'par'})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+# Cached data is invalidated when writes commit, so these tests commit
+class LocationListCacheTest(APITransactionTestCase):
+    """Test cases for the cached location list."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        self.board = Board.objects.create(title='Japan', owner=self.user)
+        self.url = reverse('board-locations', args=[self.board.pk])
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        cache.clear()
+
+    def test_location_writes_invalidate_the_list(self):
+        """Test that saved, imported and deleted locations reach the cached list."""
+        self.assertEqual(self.client.get(self.url).data['count'], 0)
+
+        location = Location.objects.create(board=self.board, name='Kyoto', lat=35.0, lng=135.7)
+        self.assertEqual(self.client.get(self.url).data['count'], 1)
+
+        self.client.post(reverse('board-locations-import', args=[self.board.pk]), {
+            'type': 'FeatureCollection', 'features': [point('Osaka', 135.5, 34.7)],
+        }, format='json')
+        self.assertEqual(self.client.get(self.url).data['count'], 2)
+
+        location.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
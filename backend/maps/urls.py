@@ -5,6 +5,13 @@ urlpatterns = [
     # Locations for a board
     path('boards/<int:board_id>/locations/', views.LocationListCreateView.as_view(), name='board-locations'),
     
+    # Bulk GeoJSON import/export of a board's locations
+    path('boards/<int:board_id>/locations/import/', views.LocationGeoJSONImportView.as_view(), name='board-locations-import'),
+    path('boards/<int:board_id>/locations/export/', views.LocationGeoJSONExportView.as_view(), name='board-locations-export'),
+    
+    # Place name autocomplete from the offline gazetteer
+    path('autocomplete/', views.PlaceAutocompleteView.as_view(), name='place-autocomplete'),
+    
     # Location detail (global, not nested under board)
     path('locations/<int:pk>/', views.LocationDetailView.as_view(), name='location-detail'),
-]
\ No newline at end of file
+]
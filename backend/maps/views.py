@@ -1,15 +1,40 @@
-from rest_framework import generics, permissions
-from rest_framework.exceptions import ValidationError
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from .models import Location
 from .serializers import LocationSerializer
+from .geojson import IMPORT_BATCH_SIZE, parse_feature_collection, iter_feature_collection
+from .gazetteer import get_gazetteer
+from .dedupe import DuplicateIndex, find_near_duplicate
 from boards.models import Board
 from boards.permissions import IsBoardOwnerOrMember
+from travelkanban.caching import CachedResponseMixin, board_tag
+from users.dashboard import touch_board
 
-class LocationListCreateView(generics.ListCreateAPIView):
+def allow_duplicates(request):
+    return request.query_params.get('allow_duplicates', '').lower() in ('1', 'true', 'yes')
+
+class DuplicateLocation(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A similar location already exists on this board.'
+    default_code = 'duplicate_location'
+
+    def __init__(self, match):
+        super().__init__()
+        # Return the existing row as-is so the client can merge into it
+        self.detail = {'error': self.default_detail, 'duplicate': LocationSerializer(match).data}
+
+class LocationListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
     serializer_class = LocationSerializer
     permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
 
+    def get_cache_tags(self, request):
+        return [board_tag(self.kwargs['board_id'])]
+
     def get_queryset(self):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
@@ -18,6 +43,11 @@ class LocationListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         board = get_object_or_404(Board, pk=self.kwargs['board_id'])
         self.check_object_permissions(self.request, board)
+        if not allow_duplicates(self.request):
+            data = serializer.validated_data
+            match = find_near_duplicate(board, data['name'], data['lat'], data['lng'])
+            if match is not None:
+                raise DuplicateLocation(match)
         serializer.save(
             board=board,
             created_by=self.request.user
@@ -33,4 +63,96 @@ class LocationDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_object(self):
         obj = get_object_or_404(Location, pk=self.kwargs['pk'])
         self.check_object_permissions(self.request, obj)
-        return obj
\ No newline at end of file
+        return obj
+
+    def perform_update(self, serializer):
+        if serializer.instance.card_id:
+            raise ValidationError("This location is synced from a card. Edit the card's location instead.")
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if instance.card_id:
+            raise ValidationError("This location is synced from a card. Clear the card's location instead.")
+        instance.delete()
+
+class LocationGeoJSONImportView(APIView):
+    """Bulk-create a board's locations from a GeoJSON FeatureCollection"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+
+    def post(self, request, board_id):
+        board = get_object_or_404(Board, pk=board_id)
+        self.check_object_permissions(request, board)
+
+        try:
+            rows, errors = parse_feature_collection(request.data)
+        except ValueError as e:
+            raise ValidationError(str(e))
+        if errors:
+            raise ValidationError({'features': {str(index): message for index, message in errors.items()}})
+
+        locations = []
+        duplicates = []
+        index = None if allow_duplicates(request) else DuplicateIndex(board, rows)
+        for position, (name, lat, lng) in enumerate(rows):
+            match = index.find(name, lat, lng) if index else None
+            if match is not None:
+                duplicates.append((position, match))
+                continue
+            location = Location(board=board, name=name, lat=lat, lng=lng, created_by=request.user)
+            locations.append(location)
+            if index:
+                index.add(location)
+
+        with transaction.atomic():
+            Location.objects.bulk_create(locations, batch_size=IMPORT_BATCH_SIZE)
+        # bulk_create sends no post_save
+        touch_board(board.pk)
+
+        return Response({
+            'created': len(locations),
+            'duplicates': [
+                {
+                    'index': position,
+                    'duplicate': {'id': match.pk, 'name': match.name, 'lat': match.lat, 'lng': match.lng},
+                }
+                for position, match in duplicates
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+class LocationGeoJSONExportView(APIView):
+    """Stream a board's locations as a GeoJSON FeatureCollection"""
+    permission_classes = [permissions.IsAuthenticated, IsBoardOwnerOrMember]
+
+    def get(self, request, board_id):
+        board = get_object_or_404(Board, pk=board_id)
+        self.check_object_permissions(request, board)
+
+        queryset = Location.objects.filter(board=board).order_by('id')
+        response = StreamingHttpResponse(
+            iter_feature_collection(queryset),
+            content_type='application/geo+json'
+        )
+        response['Content-Disposition'] = f'attachment; filename="board-{board.pk}-locations.geojson"'
+        return response
+
+class PlaceAutocompleteView(APIView):
+    """Prefix search over the offline place-name gazetteer"""
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError("q is required")
+
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            raise ValidationError("limit must be a valid integer")
+
+        gazetteer = get_gazetteer()
+        if gazetteer is None:
+            return Response({'error': 'Place search is not available'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return Response({'results': gazetteer.search(query, limit=max(limit, 1))})
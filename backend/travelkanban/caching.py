@@ -0,0 +1,147 @@
+"""
+Response caching with dependency tags.
+
+A cached entry stores the version token of every tag it depends on, such as
+``board:3`` or ``user:5``. Writes call ``invalidate`` with the tags they
+affect, which only replaces those tokens once the write commits: no queries
+and no key scans. The next read of a dependent entry sees the mismatch and
+recomputes it. Model signals do the invalidating (see
+users.dashboard.touch_board/touch_user and the apps' signals modules).
+
+Tokens live in the default cache, so invalidation reaches every process only
+with a shared ``CACHE_BACKEND`` (e.g. Redis), which production settings
+require. The local-memory default is per process, for development and tests.
+Entries are computed from the primary database, so one built right after an
+invalidation never holds a lagging replica's data until the next write.
+"""
+import threading
+import uuid
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+from .db_router import primary_reads
+
+
+def board_tag(board_id):
+    return f'board:{board_id}'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+# Exchange rates, which converted amounts depend on
+RATES_TAG = 'rates'
+
+
+def _version_key(tag):
+    return f'cache-tag:{tag}'
+
+
+def invalidate(*tags):
+    """
+    Invalidate every cached entry that depends on one of ``tags`` when the
+    current transaction commits (at once outside one). Replacing the tokens
+    earlier would let a concurrent read cache the old, still committed data
+    under the new tokens.
+    """
+    tokens = {_version_key(tag): uuid.uuid4().hex for tag in tags}
+    if tokens:
+        transaction.on_commit(lambda: cache.set_many(tokens, None))
+
+
+def current_versions(tags):
+    """Return ``{tag: token}`` for ``tags``, creating missing tokens."""
+    keys = {_version_key(tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        # Evicted tokens are replaced, so entries cached under them go stale
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: token for key, token in found.items()}
+
+
+class CacheMetrics:
+    """Hit and miss counts per namespace, for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, namespace, hit):
+        with self._lock:
+            self._counts[namespace, 'hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        namespaces = sorted({namespace for namespace, _ in counts})
+        return {
+            namespace: {
+                'hits': counts.get((namespace, 'hits'), 0),
+                'misses': counts.get((namespace, 'misses'), 0),
+            }
+            for namespace in namespaces
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+metrics = CacheMetrics()
+
+
+def get_cached(key, namespace):
+    """Return the data cached under ``key`` if none of its tags changed, else None."""
+    cached = cache.get(key)
+    if cached is not None:
+        data, versions = cached
+        if current_versions(versions) == versions:
+            metrics.record(namespace, hit=True)
+            return data
+    metrics.record(namespace, hit=False)
+    return None
+
+
+def set_cached(key, data, versions, timeout=None):
+    """Cache ``data`` under ``key``, valid while ``versions`` (read before computing it) hold."""
+    cache.set(key, (data, versions), settings.RESPONSE_CACHE_SECONDS if timeout is None else timeout)
+
+
+class CachedResponseMixin:
+    """
+    Serve a view's successful GET responses from the cache, per user and full
+    path, until one of ``get_cache_tags`` is invalidated. The tags must cover
+    whatever decides access too (board membership is part of the board tag),
+    since cached responses skip the view's object permission checks.
+    """
+
+    cache_namespace = None
+
+    def get_cache_tags(self, request):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_SECONDS:
+            return super().get(request, *args, **kwargs)
+        namespace = self.cache_namespace or type(self).__name__
+        key = f'response:{namespace}:{request.user.pk}:{request.get_full_path()}'
+        data = get_cached(key, namespace)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        # Read the tokens before computing, so writes made meanwhile invalidate it
+        versions = current_versions(self.get_cache_tags(request))
+        # From the primary, since a replica may still lag behind the invalidating write
+        with primary_reads():
+            response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_cached(key, response.data, versions)
+        response['X-Cache'] = 'MISS'
+        return response
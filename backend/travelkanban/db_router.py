@@ -0,0 +1,117 @@
+"""
+Read replica routing with read-your-writes consistency.
+
+``ReplicaRouter`` sends reads to a random alias in ``DATABASE_REPLICAS`` and
+everything else to the primary (``default``). Reads stay on the primary when:
+
+* the request is not a safe method, since writes validate against what they
+  read;
+* the current request or context already wrote, or a transaction is open;
+* the authenticated user wrote within ``READ_YOUR_WRITES_SECONDS``.
+  ``ReadYourWritesMiddleware`` records a pin for the user in the shared cache
+  after requests that wrote, and authentication applies it (see
+  ``pin_recent_writer``), so the user's next reads see their own writes while
+  the replicas catch up;
+* the code runs inside ``primary_reads()``.
+
+The state lives in context variables, so it is per request (thread) and is
+reset by the middleware, which carries it into streamed responses. Outside
+requests (commands, workers), a context that has written keeps reading from
+the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_primary = ContextVar('use_primary', default=False)
+_wrote = ContextVar('wrote', default=False)
+
+
+def _pin_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def pin_recent_writer(user_id):
+    """Keep this request's reads on the primary if ``user_id`` wrote within ``READ_YOUR_WRITES_SECONDS``."""
+    if settings.DATABASE_REPLICAS and not _use_primary.get() and cache.get(_pin_key(user_id)):
+        _use_primary.set(True)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, e.g. to compute data that is cached for others."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or _use_primary.get() or _wrote.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _use_primary.set(True)
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        primary_token = _use_primary.set(request.method not in SAFE_METHODS)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                self.pin(request)
+            if response.streaming and not getattr(response, 'is_async', False):
+                # Streamed content is generated after this returns
+                response.streaming_content = _routed(response.streaming_content, _use_primary.get() or _wrote.get())
+        finally:
+            _use_primary.reset(primary_token)
+            _wrote.reset(wrote_token)
+        return response
+
+    def pin(self, request):
+        # DRF sets request.user once the view has authenticated the request
+        user = getattr(request, 'user', None)
+        if settings.DATABASE_REPLICAS and user is not None and user.is_authenticated:
+            cache.set(_pin_key(user.pk), True, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def _routed(content, use_primary):
+    """Yield from ``content``, reading from the primary while generating it if ``use_primary``."""
+    iterator = iter(content)
+    while True:
+        token = _use_primary.set(use_primary)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _use_primary.reset(token)
+        yield chunk
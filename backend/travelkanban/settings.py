@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'travelkanban.db_router.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -106,6 +107,40 @@ else:
         )
     }
 
+# Read replicas, e.g. DATABASE_REPLICA_URLS=postgres://replica-1/db,postgres://replica-2/db
+# (locally, sqlite:////absolute/path/replica.sqlite3 pointing at a copy of the
+# database), aliased replica_1, replica_2, ... Safe requests read from a replica
+# unless the user wrote within the last READ_YOUR_WRITES_SECONDS (see
+# travelkanban.db_router)
+DATABASE_REPLICAS = []
+for index, url in enumerate((url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600, conn_health_checks=True)
+    # Tests read the test database through the replica aliases
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['travelkanban.db_router.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
+# Cache: local memory (per process) for development. Production needs a cache
+# every process shares, since cached response invalidation, throttle buckets,
+# notification stream wakeups and token revocations go through it, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://localhost:6379/0
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+if not DEBUG and CACHE_BACKEND.endswith(('.LocMemCache', '.DummyCache')):
+    raise ValueError("The CACHE_BACKEND environment variable must name a shared cache (e.g. Redis) in production.")
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'travelkanban'),
+    }
+}
+
+# How long read endpoints cache their responses (see travelkanban.caching);
+# entries are invalidated sooner by writes to what they depend on. 0 disables
+RESPONSE_CACHE_SECONDS = int(os.environ.get('RESPONSE_CACHE_SECONDS', 300))
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -152,6 +187,9 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Offline place-name gazetteer built by `manage.py load_gazetteer`
+GAZETTEER_PATH = os.environ.get('GAZETTEER_PATH', BASE_DIR / 'gazetteer.bin')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -159,7 +197,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -169,8 +207,88 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Token buckets (see travelkanban.throttling): N requests in a burst,
+    # refilled at N per period. 'user' covers every request, 'writes' unsafe
+    # methods, and the rest views with a matching throttle_scope
+    'DEFAULT_THROTTLE_CLASSES': [
+        'travelkanban.throttling.UserTokenBucketThrottle',
+        'travelkanban.throttling.WriteTokenBucketThrottle',
+        'travelkanban.throttling.ScopedTokenBucketThrottle',
+    ],
+    # Proxies in front of the app (Render's load balancer in production). DRF
+    # takes the client address this many entries from the end of
+    # X-Forwarded-For, so clients cannot pick their own throttle bucket
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0 if DEBUG else 1)),
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('THROTTLE_RATE_USER', '600/min'),
+        'writes': os.environ.get('THROTTLE_RATE_WRITES', '120/min'),
+        'login': os.environ.get('THROTTLE_RATE_LOGIN', '10/min'),
+        'register': os.environ.get('THROTTLE_RATE_REGISTER', '20/hour'),
+        # Invitations sent, counting each address of a bulk invite
+        'invite': os.environ.get('THROTTLE_RATE_INVITE', '30/hour'),
+    },
 }
 
+# Boards with at least this many expenses serve spending time series from
+# the precomputed daily rollups instead of grouping individual expenses
+BUDGET_ROLLUP_MIN_EXPENSES = int(os.environ.get('BUDGET_ROLLUP_MIN_EXPENSES', 5000))
+
+# Exchange rates are stored as units per one EXCHANGE_RATE_BASE and cached in
+# process memory for EXCHANGE_RATE_CACHE_SECONDS
+EXCHANGE_RATE_BASE = os.environ.get('EXCHANGE_RATE_BASE', 'USD')
+EXCHANGE_RATE_CACHE_SECONDS = int(os.environ.get('EXCHANGE_RATE_CACHE_SECONDS', 3600))
+
+# Notifications are queued as NotificationJob rows and created by
+# `manage.py process_notifications --watch` (the Procfile's worker process);
+# eager mode creates them inline, so development needs no worker. Failed jobs
+# are retried after NOTIFICATION_JOB_RETRY_SECONDS, doubling each attempt, and
+# dropped and logged after NOTIFICATION_JOB_MAX_ATTEMPTS
+NOTIFICATIONS_EAGER = os.environ.get('NOTIFICATIONS_EAGER', str(DEBUG)) == 'True'
+NOTIFICATION_JOB_BATCH_SIZE = int(os.environ.get('NOTIFICATION_JOB_BATCH_SIZE', 100))
+NOTIFICATION_JOB_RETRY_SECONDS = int(os.environ.get('NOTIFICATION_JOB_RETRY_SECONDS', 30))
+NOTIFICATION_JOB_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_JOB_MAX_ATTEMPTS', 5))
+
+# Repeats of the same board event within this many seconds bump an unread
+# notification's count instead of adding rows (0 disables coalescing)
+NOTIFICATION_COALESCE_SECONDS = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', 60))
+
+# `manage.py purge_notifications` deletes read notifications after
+# NOTIFICATION_READ_RETENTION_DAYS and all of them after the unread period
+NOTIFICATION_READ_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_READ_RETENTION_DAYS', 30))
+NOTIFICATION_UNREAD_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_UNREAD_RETENTION_DAYS', 90))
+
+# Long-poll and SSE notification streams hold a request for up to
+# NOTIFICATION_STREAM_TIMEOUT seconds, checking the shared cache for
+# notifications created by other processes every NOTIFICATION_STREAM_CHECK_SECONDS
+NOTIFICATION_STREAM_TIMEOUT = int(os.environ.get('NOTIFICATION_STREAM_TIMEOUT', 25))
+NOTIFICATION_STREAM_CHECK_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_CHECK_SECONDS', 5))
+# Streams waiting at once per web process; keep it below the worker's threads
+# (WEB_THREADS in the Procfile) so streams never take every thread
+NOTIFICATION_STREAM_MAX_WAITERS = int(os.environ.get('NOTIFICATION_STREAM_MAX_WAITERS', 8))
+
+# Board events that notify every other board member (users can mute each one)
+NOTIFICATION_FANOUT_EVENTS = os.environ.get(
+    'NOTIFICATION_FANOUT_EVENTS', 'card_created,card_moved,expense_added,members_changed'
+).split(',')
+
+# Authenticated users are cached in process memory for this many seconds (the
+# longest a deactivation made by another process can go unnoticed)
+AUTH_USER_CACHE_SECONDS = int(os.environ.get('AUTH_USER_CACHE_SECONDS', 60))
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))
+
+# Worker processes hashing passwords for `manage.py provision_users`; 1 hashes
+# inline. /api/users/provision/ always hashes inline in the request
+PROVISION_HASH_WORKERS = int(os.environ.get('PROVISION_HASH_WORKERS', 1))
+
+# Refresh tokens are checked against an in-process Bloom filter of blacklisted
+# jtis before the blacklist table. The filter catches up with other processes'
+# blacklistings at least every REVOCATION_FILTER_SYNC_SECONDS (immediately when
+# the cache is shared) and is rebuilt every REVOCATION_FILTER_REBUILD_SECONDS.
+# `manage.py purge_expired_tokens` deletes expired tokens from both tables
+REVOCATION_FILTER_SYNC_SECONDS = int(os.environ.get('REVOCATION_FILTER_SYNC_SECONDS', 5))
+REVOCATION_FILTER_REBUILD_SECONDS = int(os.environ.get('REVOCATION_FILTER_REBUILD_SECONDS', 3600))
+REVOCATION_FILTER_ERROR_RATE = float(os.environ.get('REVOCATION_FILTER_ERROR_RATE', 0.001))
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -235,12 +353,21 @@ if DEBUG:
     CSRF_TRUSTED_ORIGINS.extend(['http://localhost:3000', 'http://127.0.0.1:3000'])
 
 # Email configuration 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@tripboard.com')
+
+# Emails are queued in EmailOutbox and sent by `manage.py send_outbox --watch`
+# (the Procfile's mailer process). Failed sends are retried after
+# EMAIL_OUTBOX_RETRY_SECONDS, doubling each attempt, and given up after
+# EMAIL_OUTBOX_MAX_ATTEMPTS
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 100))
+EMAIL_OUTBOX_RETRY_SECONDS = int(os.environ.get('EMAIL_OUTBOX_RETRY_SECONDS', 60))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
 
 # Security settings
 SECURE_BROWSER_XSS_FILTER = True
@@ -0,0 +1,88 @@
+import contextvars
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from .db_router import ReadYourWritesMiddleware, ReplicaRouter, pin_recent_writer, primary_reads
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], READ_YOUR_WRITES_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+    """Test cases for replica routing and read-your-writes pinning."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = User(pk=7, username='traveller')
+        cache.clear()
+
+    def run_isolated(self, function, *args):
+        # A fresh context, unaffected by writes made elsewhere in this process
+        return contextvars.Context().run(function, *args)
+
+    def request(self, method='get', user=None, write=False):
+        """Run a request through the middleware; return the read alias and response."""
+        seen = {}
+
+        def view(request):
+            # As DRF authentication does
+            request.user = user or AnonymousUser()
+            if user is not None:
+                pin_recent_writer(user.pk)
+            if write:
+                self.router.db_for_write(User)
+            seen['read'] = self.router.db_for_read(User)
+            return HttpResponse()
+
+        request = getattr(self.factory, method)('/api/boards/')
+        response = self.run_isolated(ReadYourWritesMiddleware(view), request)
+        return seen['read'], response
+
+    def test_reads_go_to_replicas_until_a_write(self):
+        """Test that reads leave the primary and come back once the context writes."""
+        def reads():
+            before = self.router.db_for_read(User)
+            with primary_reads():
+                inside = self.router.db_for_read(User)
+            self.assertEqual(self.router.db_for_write(User), 'default')
+            return before, inside, self.router.db_for_read(User)
+
+        self.assertEqual(self.run_isolated(reads), ('replica_1', 'default', 'default'))
+        with self.settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.run_isolated(self.router.db_for_read, User), 'default')
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        """Test that a user's write keeps their next reads, and only theirs, on the primary."""
+        self.assertEqual(self.request('get', user=self.user)[0], 'replica_1')
+        self.assertEqual(self.request('post', user=self.user, write=True)[0], 'default')
+
+        self.assertEqual(self.request('get', user=self.user)[0], 'default')
+        self.assertEqual(self.request('get', user=User(pk=8, username='friend'))[0], 'replica_1')
+        self.assertEqual(self.request('get')[0], 'replica_1')
+
+        cache.clear()
+        self.assertEqual(self.request('get', user=self.user)[0], 'replica_1')
+
+    def test_streamed_responses_keep_the_pin(self):
+        """Test that content streamed after the middleware returns reads where the view did."""
+        def view(request):
+            request.user = self.user
+            pin_recent_writer(self.user.pk)
+            return StreamingHttpResponse(self.router.db_for_read(User) for _ in range(2))
+
+        def stream():
+            response = ReadYourWritesMiddleware(view)(self.factory.get('/api/boards/export/'))
+            return [chunk.decode() for chunk in response.streaming_content]
+
+        self.assertEqual(self.run_isolated(stream), ['replica_1', 'replica_1'])
+        self.request('post', user=self.user, write=True)
+        self.assertEqual(self.run_isolated(stream), ['default', 'default'])
+
+    def test_replicas_are_never_migrated(self):
+        """Test that migrations only run on the primary."""
+        self.assertFalse(self.router.allow_migrate('replica_1', 'boards'))
+        self.assertIsNone(self.router.allow_migrate('default', 'boards'))
@@ -0,0 +1,101 @@
+"""
+Token bucket request throttling on Django's cache.
+
+Each client gets a bucket per scope holding up to N tokens that refills at
+N per period (rates use DRF's ``"N/period"`` format in
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``). Requests take one token, so
+clients may burst up to N requests and then proceed at the refill rate; views
+with a ``throttle_scope`` can charge more through ``get_throttle_cost``. A
+request costs one cache read and one write; rejected requests get a 429 with
+``Retry-After`` set to when enough tokens are due.
+
+Buckets are read and written without a lock, so concurrent requests from the
+same client can occasionally both take the last token.
+"""
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Base class: subclasses set ``scope`` and implement ``get_cache_key``."""
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_rate(self):
+        # Read at request time so rate changes in settings apply without a restart
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def client_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.client_ident(request)}
+
+    def get_cost(self, request, view):
+        return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        now = self.timer()
+        cost = self.get_cost(request, view)
+        refill_rate = self.num_requests / self.duration
+        tokens, updated_at = self.cache.get(key, (self.num_requests, now))
+        tokens = min(self.num_requests, tokens + (now - updated_at) * refill_rate)
+        if tokens < cost:
+            self.retry_after = (cost - tokens) / refill_rate
+            return False
+        # A full bucket is the default, so the entry can expire once it refills
+        self.cache.set(key, (tokens - cost, now), self.duration)
+        return True
+
+    def wait(self):
+        return getattr(self, 'retry_after', None)
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Limits every request per user, or per IP address for anonymous clients."""
+
+    scope = 'user'
+
+
+class WriteTokenBucketThrottle(TokenBucketThrottle):
+    """Limits unsafe (writing) requests per user or IP address."""
+
+    scope = 'writes'
+
+    def allow_request(self, request, view):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        return super().allow_request(request, view)
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Limits the views sharing a ``throttle_scope`` attribute as a group, per
+    user or IP address. Views without one are not limited. A view's
+    ``get_throttle_cost(request)``, if any, gives the tokens a request takes,
+    e.g. one per recipient; it runs before the request data is validated.
+    """
+
+    def __init__(self):
+        # The scope is only known once the view is
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cost(self, request, view):
+        get_throttle_cost = getattr(view, 'get_throttle_cost', None)
+        return get_throttle_cost(request) if get_throttle_cost else 1
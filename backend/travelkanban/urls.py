@@ -3,6 +3,10 @@ from django.urls import path, include
 from django.http import JsonResponse
 from django.conf import settings
 from django.conf.urls.static import static
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from .caching import metrics
 
 def api_root(request):
     """Root API endpoint with basic info and available endpoints"""
@@ -31,6 +35,12 @@ def health_check(request):
         'debug_mode': settings.DEBUG
     })
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_metrics(request):
+    """Response cache hits and misses per endpoint, for this worker process (staff only)"""
+    return Response(metrics.snapshot())
+
 urlpatterns = [
     # Django admin
     path('admin/', admin.site.urls),
@@ -38,6 +48,7 @@ urlpatterns = [
     # API root and health endpoints
     path('api/', api_root, name='api_root'),
     path('api/health/', health_check, name='health_check'),
+    path('api/cache-metrics/', cache_metrics, name='cache_metrics'),
     path('', api_root, name='home'),  # Root URL also shows API info
 
     # Authentication endpoints - separated from user management
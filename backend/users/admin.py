@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
-from .models import User, Notification
+from .models import User, Notification, NotificationJob, EmailOutbox
 
 class CustomUserCreationForm(UserCreationForm):
     """Custom form for creating users in admin."""
@@ -77,3 +77,15 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ('is_read', 'user')
     search_fields = ('title', 'message')
     ordering = ('-created_at',)
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', '__str__', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('attempts',)
+    readonly_fields = ('payload', 'attempts', 'next_attempt_at', 'last_error', 'created_at')
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'subject')
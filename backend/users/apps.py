@@ -13,6 +13,4 @@ class UsersConfig(AppConfig):
         Perform initialization tasks when the app is ready.
         This method is called once Django has finished loading all apps.
         """
-        # Import signals if you have any
-        # from . import signals
-        pass
\ No newline at end of file
+        import users.signals  # noqa: F401 - Import to connect signals
@@ -14,5 +14,6 @@ urlpatterns = [
     path('me/delete/', views.UserDeleteView.as_view(), name='user-delete'),
     path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),  # FIXED: Use custom view
     path('invite/', views.InviteView.as_view(), name='invite'),
+    path('invite/bulk/', views.BulkInviteView.as_view(), name='invite-bulk'),
     path('notifications/', views.NotificationListView.as_view(), name='notifications'), 
 ]
\ No newline at end of file
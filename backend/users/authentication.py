@@ -0,0 +1,82 @@
+"""
+JWT authentication without a user query on every request.
+
+``CachedJWTAuthentication`` validates the token as usual but resolves its user
+through a small in-process cache. Entries expire after
+``AUTH_USER_CACHE_SECONDS`` and are dropped as soon as the user is saved or
+deleted in this process (see users.signals), so deactivations apply
+immediately here and within the TTL in other processes.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from travelkanban.db_router import pin_recent_writer
+
+
+class UserCache:
+    """
+    Thread-safe LRU of users with a time-to-live. Keys are user ids as
+    strings, the form tokens carry them in.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # Each request gets its own copy, so per-request changes never leak
+        return copy.deepcopy(user)
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (copy.deepcopy(user), time.monotonic() + settings.AUTH_USER_CACHE_SECONDS)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.AUTH_USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            # Users who just wrote read from the primary until replicas catch up
+            pin_recent_writer(result[0].pk)
+        return result
+
+    def get_user(self, validated_token):
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = user_cache.get(user_id)
+        if user is None:
+            # Unknown and inactive users raise here and are never cached
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
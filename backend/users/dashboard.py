@@ -0,0 +1,123 @@
+"""
+Per-user home-screen dashboard.
+
+``build_dashboard`` gathers everything the home screen needs with a fixed
+number of grouped queries, however many boards the user has. Results are
+cached per user and tagged with the user and each of their boards (see
+travelkanban.caching), so a write to any of them rebuilds it on the next read.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from boards.models import Board, List, Card
+from budget.models import BudgetTotal
+from budget.rates import CENTS, MissingExchangeRate, conversion_factors
+from travelkanban.caching import RATES_TAG, board_tag, current_versions, get_cached, invalidate, set_cached, user_tag
+from travelkanban.db_router import primary_reads
+from .models import Notification
+
+DASHBOARD_CACHE_SECONDS = 300
+UPCOMING_DUE_DAYS = 14
+UPCOMING_DUE_LIMIT = 20
+
+
+def touch_user(*user_ids):
+    """Invalidate cached dashboards and responses that depend on ``user_ids``."""
+    invalidate(*(user_tag(user_id) for user_id in user_ids))
+
+
+def touch_board(*board_ids):
+    """Invalidate cached dashboards and responses that include one of ``board_ids``."""
+    invalidate(*(board_tag(board_id) for board_id in board_ids))
+
+
+def get_dashboard(user):
+    """Return the user's dashboard, from cache when nothing it covers has changed."""
+    cache_key = f'dashboard:{user.pk}'
+    data = get_cached(cache_key, 'dashboard')
+    if data is not None:
+        return data
+
+    # Replicas may not have the write that invalidated it yet
+    with primary_reads():
+        # Read the tokens before aggregating, so writes made meanwhile invalidate it
+        boards = _user_boards(user)
+        versions = current_versions([user_tag(user.pk), RATES_TAG] + [board_tag(board['id']) for board in boards])
+        data = build_dashboard(user, boards)
+    set_cached(cache_key, data, versions, DASHBOARD_CACHE_SECONDS)
+    return data
+
+
+def _user_boards(user):
+    return list(
+        Board.objects.filter(Q(owner=user) | Q(members=user))
+        .distinct()
+        .order_by('-created_at')
+        .values('id', 'title', 'status', 'budget', 'currency', 'start_date', 'end_date')
+    )
+
+
+def build_dashboard(user, boards=None):
+    """
+    Return per-board spend against budget and card counts by list, the
+    user's upcoming due cards and their unread notification count.
+    """
+    if boards is None:
+        boards = _user_boards(user)
+    board_ids = [board['id'] for board in boards]
+
+    spend_rows = (
+        BudgetTotal.objects.filter(board_id__in=board_ids, expense_count__gt=0)
+        .values_list('board_id', 'currency')
+        .annotate(total=Sum('total'))
+        .order_by()
+    )
+    spend_by_board = {}
+    for board_id, currency, total in spend_rows:
+        spend_by_board.setdefault(board_id, []).append((currency, total))
+
+    lists_by_board = {}
+    list_rows = (
+        List.objects.filter(board_id__in=board_ids)
+        .annotate(card_count=Count('cards'))
+        .order_by('board_id', 'position')
+        .values('board_id', 'id', 'title', 'card_count')
+    )
+    for row in list_rows:
+        lists_by_board.setdefault(row.pop('board_id'), []).append(row)
+
+    today = timezone.now().date()
+    upcoming_due = list(
+        Card.objects.filter(
+            list__board_id__in=board_ids,
+            due_date__gte=today,
+            due_date__lte=today + timedelta(days=UPCOMING_DUE_DAYS),
+        )
+        .order_by('due_date', 'id')
+        .values('id', 'title', 'due_date', 'list_id', 'list__board_id')[:UPCOMING_DUE_LIMIT]
+    )
+    for card in upcoming_due:
+        card['board_id'] = card.pop('list__board_id')
+
+    unread_notifications = Notification.objects.filter(user=user, is_read=False).count()
+
+    for board in boards:
+        totals = spend_by_board.get(board['id'], [])
+        try:
+            # Rates are in memory, so this costs no queries per board
+            factors = conversion_factors({currency for currency, _ in totals}, board['currency'])
+            spent = sum((total * factors[currency] for currency, total in totals), Decimal('0.00')).quantize(CENTS)
+        except MissingExchangeRate:
+            spent = None
+
+        board['budget'] = str(board['budget'])
+        board['spent'] = str(spent) if spent is not None else None
+        board['remaining'] = str(max(Decimal(board['budget']) - spent, Decimal('0.00'))) if spent is not None else None
+        board['lists'] = lists_by_board.get(board['id'], [])
+
+    return {
+        'boards': boards,
+        'upcoming_due': upcoming_due,
+        'unread_notifications': unread_notifications,
+    }
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from users.notifications import process_notification_jobs
+
+
+class Command(BaseCommand):
+    help = "Create the notifications queued as NotificationJob rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Jobs processed per transaction (default: NOTIFICATION_JOB_BATCH_SIZE).")
+        parser.add_argument('--watch', action='store_true', help="Keep polling for new jobs instead of exiting once the queue is empty.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between polls with --watch (default: 1).")
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            done, failed = process_notification_jobs(batch_size=options['batch_size'])
+            processed += done
+            # Failed jobs wait out their backoff; a watch that only hit failures pauses
+            if done or failed and not options['watch']:
+                continue
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Notification jobs processed: {processed}."))
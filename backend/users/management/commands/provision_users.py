@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from budget.imports import iter_csv_rows
+from users.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a CSV file with email and username columns and optional "
+        "full_name (or first_name and last_name) and password columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to read.")
+        parser.add_argument('--board', type=int, action='append', default=[], dest='boards',
+                            help="Add the users to this board; repeat for several boards.")
+        parser.add_argument('--workers', type=int, default=settings.PROVISION_HASH_WORKERS,
+                            help="Processes hashing passwords (default: PROVISION_HASH_WORKERS).")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as upload:
+                users = provision_users(
+                    iter_csv_rows(upload), board_ids=options['boards'], hash_workers=options['workers']
+                )
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+        except ValidationError as e:
+            raise CommandError(f"No users were created: {e.detail}")
+        self.stdout.write(self.style.SUCCESS(f"Users created: {len(users)}."))
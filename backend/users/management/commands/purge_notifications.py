@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from users.notifications import purge_notifications
+
+
+class Command(BaseCommand):
+    help = "Delete notifications older than the retention periods, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Notifications deleted per statement (default: 1000).")
+        parser.add_argument('--pause', type=float, default=0, help="Seconds to sleep between batches (default: 0).")
+
+    def handle(self, *args, **options):
+        deleted = purge_notifications(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Notifications purged: {deleted}."))
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from users.outbox import send_outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued EmailOutbox messages, one mail-server connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Emails sent per connection (default: EMAIL_OUTBOX_BATCH_SIZE).")
+        parser.add_argument('--watch', action='store_true', help="Keep polling for due emails instead of exiting once none are due.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls with --watch (default: 5).")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_outbox(batch_size=options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Emails sent: {total_sent}, failed attempts: {total_failed}."))
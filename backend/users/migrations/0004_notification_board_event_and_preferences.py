@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('users', '0003_notificationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='board',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='boards.board'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='event',
+            field=models.CharField(blank=True, choices=[('card_created', 'Card created'), ('card_moved', 'Card moved'), ('expense_added', 'Expense added'), ('members_changed', 'Members changed')], max_length=30),
+        ),
+        migrations.CreateModel(
+            name='NotificationPreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('card_created', 'Card created'), ('card_moved', 'Card moved'), ('expense_added', 'Expense added'), ('members_changed', 'Members changed')], max_length=30)),
+                ('enabled', models.BooleanField(default=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_preferences', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'notification_preferences',
+                'constraints': [models.UniqueConstraint(fields=('user', 'event'), name='notification_prefs_user_event_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boards', '0005_card_category'),
+        ('users', '0004_notification_board_event_and_preferences'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', '-created_at'], name='notifications_user_read_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 class User(AbstractUser):
     """
@@ -37,6 +39,13 @@ class User(AbstractUser):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         ordering = ['-created_at']
+        indexes = [
+            # Case-insensitive prefix search (see users.search)
+            models.Index(Lower('email'), name='users_email_lower_idx'),
+            models.Index(Lower('username'), name='users_username_lower_idx'),
+            models.Index(Lower('first_name'), name='users_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='users_last_name_lower_idx'),
+        ]
 
     def __str__(self):
         """Return string representation of the user."""
@@ -68,14 +77,105 @@ class User(AbstractUser):
         super().save(*args, **kwargs)
 
 class Notification(models.Model):
+    EVENT_CHOICES = [
+        ('card_created', 'Card created'),
+        ('card_moved', 'Card moved'),
+        ('expense_added', 'Expense added'),
+        ('members_changed', 'Members changed'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    # Set on board-wide fan-out notifications (see users.notifications.notify_board)
+    board = models.ForeignKey('boards.Board', on_delete=models.CASCADE, null=True, blank=True, related_name='notifications')
+    event = models.CharField(max_length=30, choices=EVENT_CHOICES, blank=True)
     title = models.CharField(max_length=200)
     message = models.TextField(blank=True, null=True)
     is_read = models.BooleanField(default=False)
+    # Events coalesced into this row (see users.notifications.create_notifications)
+    count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the per-user list (newest first), unread filters and counts
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notifications_user_read_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} for {self.user.email}"
+
+
+class NotificationPreference(models.Model):
+    """A user's choice to receive or mute one kind of board-wide notification."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_preferences')
+    event = models.CharField(max_length=30, choices=Notification.EVENT_CHOICES)
+    enabled = models.BooleanField(default=True)
+
+    class Meta:
+        db_table = 'notification_preferences'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'event'], name='notification_prefs_user_event_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {'on' if self.enabled else 'off'} for {self.user.email}"
+
+
+class NotificationJob(models.Model):
+    """
+    Notifications waiting to be created by `manage.py process_notifications`.
+    ``payload`` holds ``title`` and ``message`` plus either ``user_ids`` or,
+    for board-wide fan-out, ``board_id``, ``event`` and ``exclude_user_ids``.
+    """
+    payload = models.JSONField()
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'notification_jobs'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='notification_job_due_idx'),
+        ]
+
+    def __str__(self):
+        # Per-user jobs carry the board they concern too, as None when there is none
+        if 'user_ids' not in self.payload:
+            return f"{self.payload.get('title')} for board {self.payload['board_id']}"
+        return f"{self.payload.get('title')} for {len(self.payload.get('user_ids', []))} users"
+
+
+class EmailOutbox(models.Model):
+    """
+    An email waiting to be sent by `manage.py send_outbox`, so requests never
+    talk to the mail server (see users.outbox).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to_email} ({self.status})"
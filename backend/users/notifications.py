@@ -0,0 +1,284 @@
+"""
+Deferred notification delivery.
+
+Signal handlers and services call ``notify`` instead of creating
+Notification rows themselves. The request only writes one NotificationJob row,
+inside its own transaction: rolled-back writes notify nobody, and committed
+ones cannot lose their job between the commit and the enqueue. The worker
+(`manage.py process_notifications`) then creates every recipient's row with
+one ``bulk_create`` per batch of jobs, so request latency does not grow with
+the number of recipients.
+
+With ``settings.NOTIFICATIONS_EAGER`` the rows are created inline instead,
+for development and tests.
+"""
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.utils import timezone
+from .dashboard import touch_user
+from .models import User, Notification, NotificationJob, NotificationPreference
+from .stream import publish
+
+logger = logging.getLogger(__name__)
+
+UNREAD_COUNT_CACHE_SECONDS = 600
+
+
+def notify(user_ids, title, message, board_id=None, event=''):
+    """
+    Queue a notification with ``title`` and ``message`` for each of
+    ``user_ids``. Passing the ``board_id`` and ``event`` it concerns lets
+    bursts of them coalesce into one digest.
+    """
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if user_ids:
+        _enqueue({'user_ids': user_ids, 'board_id': board_id, 'event': event, 'title': title, 'message': message})
+
+
+def notify_board(board_id, event, title, message, exclude_user_ids=()):
+    """
+    Queue a notification for every member of ``board_id`` except
+    ``exclude_user_ids`` (usually whoever acted), unless ``event`` is not in
+    ``settings.NOTIFICATION_FANOUT_EVENTS``. Recipients are resolved when the
+    job runs, so members who muted the event are skipped then.
+    """
+    if event not in settings.NOTIFICATION_FANOUT_EVENTS:
+        return
+    _enqueue({
+        'board_id': board_id,
+        'event': event,
+        'exclude_user_ids': sorted({user_id for user_id in exclude_user_ids if user_id is not None}),
+        'title': title,
+        'message': message,
+    })
+
+
+def _enqueue(payload):
+    if settings.NOTIFICATIONS_EAGER:
+        create_notifications([payload])
+    else:
+        NotificationJob.objects.create(payload=payload)
+
+
+def board_recipients(board_id, event, exclude_user_ids=()):
+    """
+    Return the members of ``board_id`` who have not muted ``event``.
+    Owners are always members (Board.save adds them).
+    """
+    muted = NotificationPreference.objects.filter(user=OuterRef('pk'), event=event, enabled=False)
+    return (
+        User.objects.filter(member_boards=board_id)
+        .exclude(pk__in=exclude_user_ids)
+        .exclude(Exists(muted))
+    )
+
+
+def _recipients(payload, now):
+    """
+    Return ``(user_id, digest_id)`` for the payload's recipients with one
+    query, where ``digest_id`` is the recipient's unread notification for the
+    same board, event and title from the last ``NOTIFICATION_COALESCE_SECONDS``
+    (or None).
+    """
+    if 'user_ids' in payload:
+        # Recipients may have been deleted while the job was queued
+        users = User.objects.filter(pk__in=payload['user_ids'])
+    else:
+        users = board_recipients(payload['board_id'], payload['event'], payload['exclude_user_ids'])
+
+    window = settings.NOTIFICATION_COALESCE_SECONDS
+    if not (window and payload.get('board_id') and payload.get('event')):
+        return [(user_id, None) for user_id in users.values_list('pk', flat=True)]
+
+    digest = Notification.objects.filter(
+        user=OuterRef('pk'),
+        board_id=payload['board_id'],
+        event=payload['event'],
+        title=payload['title'],
+        is_read=False,
+        created_at__gte=now - timedelta(seconds=window),
+    ).order_by('-created_at').values('pk')[:1]
+    return list(users.annotate(digest_id=Subquery(digest)).values_list('pk', 'digest_id'))
+
+
+def create_notifications(payloads):
+    """
+    Insert the notifications described by ``payloads`` with one bulk_create.
+    Recipients with a recent unread notification of the same kind get that
+    row's count bumped instead, so bursts read as a single digest.
+    """
+    now = timezone.now()
+    notifications = []
+    recipients = set()
+    for payload in payloads:
+        digest_ids = []
+        for user_id, digest_id in _recipients(payload, now):
+            recipients.add(user_id)
+            if digest_id is not None:
+                digest_ids.append(digest_id)
+                continue
+            notifications.append(Notification(
+                user_id=user_id,
+                board_id=payload.get('board_id'),
+                event=payload.get('event', ''),
+                title=payload['title'],
+                message=payload['message'],
+            ))
+        if digest_ids:
+            # Digests show the latest message and move to the top of the list
+            Notification.objects.filter(pk__in=digest_ids).update(
+                count=F('count') + 1, message=payload['message'], created_at=now,
+            )
+    Notification.objects.bulk_create(notifications)
+
+    # bulk_create sends no post_save, so update the recipients' counters here
+    created = {}
+    for notification in notifications:
+        created[notification.user_id] = created.get(notification.user_id, 0) + 1
+    adjust_unread_counts(created)
+    if recipients:
+        touch_user(*recipients)
+        publish(recipients)
+    return len(notifications)
+
+
+def purge_notifications(batch_size=1000, pause=0):
+    """
+    Delete notifications past the retention periods in batches of
+    ``batch_size``, each in its own short transaction so no lock is held for
+    long. Read notifications are kept ``NOTIFICATION_READ_RETENTION_DAYS``,
+    unread ones ``NOTIFICATION_UNREAD_RETENTION_DAYS``. Returns the number
+    deleted.
+    """
+    now = timezone.now()
+    stale = Notification.objects.filter(
+        Q(is_read=True, created_at__lt=now - timedelta(days=settings.NOTIFICATION_READ_RETENTION_DAYS))
+        | Q(created_at__lt=now - timedelta(days=settings.NOTIFICATION_UNREAD_RETENTION_DAYS))
+    ).order_by('pk')
+
+    deleted = 0
+    while True:
+        batch = list(stale.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        # Deleting by primary key keeps each statement's locks to one batch
+        deleted += Notification.objects.filter(pk__in=batch).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def _unread_count_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def unread_count(user_id):
+    """Return the user's unread notification count, counting only on a cache miss."""
+    count = cache.get(_unread_count_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        # add() so a counter adjusted meanwhile is not overwritten
+        cache.add(_unread_count_key(user_id), count, UNREAD_COUNT_CACHE_SECONDS)
+    return count
+
+
+def adjust_unread_counts(deltas):
+    """
+    Apply ``{user_id: delta}`` to cached unread counts once the current
+    transaction commits, so rolled-back writes leave them alone; uncached
+    ones are counted on the next read.
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    def apply():
+        for user_id, delta in deltas.items():
+            try:
+                cache.incr(_unread_count_key(user_id), delta)
+            except ValueError:
+                pass
+
+    transaction.on_commit(apply)
+
+
+def forget_unread_count(user_id):
+    transaction.on_commit(lambda: cache.delete(_unread_count_key(user_id)))
+
+
+def mark_read(user, ids=None, before=None):
+    """
+    Mark ``user``'s unread notifications read with one UPDATE: those in
+    ``ids``, those created before ``before``, or all of them. Returns the
+    number of notifications marked.
+    """
+    queryset = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if before is not None:
+        queryset = queryset.filter(created_at__lt=before)
+    updated = queryset.update(is_read=True)
+    if updated:
+        adjust_unread_counts({user.pk: -updated})
+        touch_user(user.pk)
+    return updated
+
+
+def _create_for_jobs(jobs):
+    """Create the jobs' notifications; returns ``{job_id: error}`` for the jobs that failed."""
+    try:
+        with transaction.atomic():
+            create_notifications([job.payload for job in jobs])
+        return {}
+    except Exception as e:
+        if len(jobs) == 1:
+            logger.exception("Failed to create notifications for job %s", jobs[0].pk)
+            return {jobs[0].pk: str(e)}
+    # Retry one by one so a bad job does not hold back the rest of its batch
+    failed = {}
+    for job in jobs:
+        failed.update(_create_for_jobs([job]))
+    return failed
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.NOTIFICATION_JOB_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def process_notification_jobs(batch_size=None):
+    """
+    Create the notifications for up to ``batch_size`` due jobs and delete
+    them. Returns ``(processed, failed)`` counts; 0 for both means nothing was
+    due. Rows locked by another worker are skipped on databases that support
+    it. Failed jobs are retried with exponential backoff
+    (``NOTIFICATION_JOB_RETRY_SECONDS`` doubled per attempt) and dropped, with
+    their payload logged, after ``NOTIFICATION_JOB_MAX_ATTEMPTS``.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_JOB_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            NotificationJob.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if not jobs:
+            return 0, 0
+        failed = _create_for_jobs(jobs)
+        NotificationJob.objects.filter(pk__in=[job.pk for job in jobs if job.pk not in failed]).delete()
+        for job in jobs:
+            if job.pk not in failed:
+                continue
+            job.attempts += 1
+            if job.attempts >= settings.NOTIFICATION_JOB_MAX_ATTEMPTS:
+                logger.error("Dropping notification job %s after %s attempts: %s", job.pk, job.attempts, job.payload)
+                job.delete()
+            else:
+                job.last_error = failed[job.pk]
+                job.next_attempt_at = now + retry_delay(job.attempts)
+                job.save(update_fields=['attempts', 'last_error', 'next_attempt_at'])
+    return len(jobs) - len(failed), len(failed)
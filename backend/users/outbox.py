@@ -0,0 +1,104 @@
+"""
+Outgoing email queue.
+
+Views enqueue EmailOutbox rows and return; `manage.py send_outbox` sends
+due rows in batches over one mail-server connection per batch. Failed sends
+are retried with exponential backoff (``EMAIL_OUTBOX_RETRY_SECONDS`` doubled
+per attempt) until ``EMAIL_OUTBOX_MAX_ATTEMPTS`` is reached.
+"""
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# How long a worker owns the rows it claimed; unsent rows are retried after
+CLAIM_SECONDS = 300
+
+
+def enqueue_email(to_email, subject, body, from_email=None):
+    return EmailOutbox.objects.create(
+        to_email=to_email, subject=subject, body=body, from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def enqueue_emails(messages, from_email=None):
+    """Queue ``(to_email, subject, body)`` messages with one bulk insert."""
+    return EmailOutbox.objects.bulk_create([
+        EmailOutbox(to_email=to_email, subject=subject, body=body, from_email=from_email or settings.DEFAULT_FROM_EMAIL)
+        for to_email, subject, body in messages
+    ])
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (attempts - 1))
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if emails:
+            # Push the rows out of other workers' reach while they are being sent
+            EmailOutbox.objects.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+            )
+    return emails
+
+
+def send_outbox(batch_size=None):
+    """
+    Send up to ``batch_size`` due emails over a single connection and record
+    the results. Returns ``(sent, failed)`` counts; 0 for both means nothing
+    was due.
+    """
+    emails = _claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning("Could not connect to the mail server: %s", e)
+        failed = [(email, e) for email in emails]
+    else:
+        try:
+            for email in emails:
+                message = EmailMessage(email.subject, email.body, email.from_email, [email.to_email], connection=connection)
+                try:
+                    message.send()
+                except Exception as e:
+                    failed.append((email, e))
+                else:
+                    sent.append(email)
+        finally:
+            connection.close()
+
+    now = timezone.now()
+    if sent:
+        EmailOutbox.objects.filter(pk__in=[email.pk for email in sent]).update(
+            status='sent', sent_at=now, attempts=F('attempts') + 1, last_error='',
+        )
+    for email, error in failed:
+        email.attempts += 1
+        email.last_error = str(error)
+        if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            email.status = 'failed'
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+    if failed:
+        EmailOutbox.objects.bulk_update(
+            [email for email, _ in failed], ['attempts', 'last_error', 'status', 'next_attempt_at']
+        )
+    return len(sent), len(failed)
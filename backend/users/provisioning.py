@@ -0,0 +1,129 @@
+"""
+Bulk user provisioning from CSV.
+
+Rows are validated without touching the database, then every email and
+username is checked against existing users with one query. Hashing passwords
+dominates the cost, so `manage.py provision_users` hashes them in a process
+pool (``PROVISION_HASH_WORKERS``); the API hashes inline rather than fork the
+web worker. Users are inserted with ``bulk_create`` in batches, and adding
+them to boards takes one ``members.add`` per board.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework.exceptions import ValidationError
+from boards.models import Board
+from .models import User
+from .serializers import ProvisionUserSerializer
+
+PROVISION_BATCH_SIZE = 500
+MAX_PROVISION_ROWS = 5000
+MAX_REPORTED_ERRORS = 50
+
+# Below this many passwords starting worker processes costs more than it saves
+MIN_POOLED_PASSWORDS = 8
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Return ``make_password`` of each password, using ``workers`` processes;
+    None gives an unusable password.
+    """
+    to_hash = [password for password in passwords if password]
+    if workers > 1 and len(to_hash) >= MIN_POOLED_PASSWORDS:
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            hashed = iter(pool.map(make_password, to_hash, chunksize=max(1, len(to_hash) // (workers * 4))))
+    else:
+        hashed = iter(map(make_password, to_hash))
+    return [next(hashed) if password else make_password(None) for password in passwords]
+
+
+def _existing_conflicts(emails, usernames):
+    """Return the emails (lowercased) and usernames already taken, with one query."""
+    taken = (
+        User.objects.annotate(email_key=Lower('email'))
+        .filter(Q(email_key__in=emails) | Q(username__in=usernames))
+        .values_list('email_key', 'username')
+    )
+    taken_emails, taken_usernames = set(), set()
+    for email, username in taken:
+        taken_emails.add(email)
+        taken_usernames.add(username)
+    return taken_emails, taken_usernames
+
+
+def provision_users(rows, board_ids=(), hash_workers=1):
+    """
+    Validate and create users from ``rows`` (``(line, data)`` pairs) and add
+    them to ``board_ids``, hashing passwords in ``hash_workers`` processes.
+    All rows are created or none are: invalid rows and emails or usernames
+    already in use raise a ValidationError listing the failing lines.
+
+    Returns the created users.
+    """
+    boards = list(Board.objects.filter(pk__in=board_ids))
+    missing = set(board_ids) - {board.pk for board in boards}
+    if missing:
+        raise ValidationError({'boards': f"Boards not found: {', '.join(map(str, sorted(missing)))}."})
+
+    valid = []
+    errors = {}
+    seen_emails, seen_usernames = {}, {}
+
+    def report(line, error):
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors[str(line)] = error
+
+    for number, (line, data) in enumerate(rows, start=1):
+        if number > MAX_PROVISION_ROWS:
+            raise ValidationError(f"Provisioning is limited to {MAX_PROVISION_ROWS} rows.")
+        serializer = ProvisionUserSerializer(data=data)
+        if not serializer.is_valid():
+            report(line, serializer.errors)
+            continue
+        values = serializer.validated_data
+        duplicates = {}
+        if values['email'] in seen_emails:
+            duplicates['email'] = [f"Duplicate of line {seen_emails[values['email']]}."]
+        if values['username'] in seen_usernames:
+            duplicates['username'] = [f"Duplicate of line {seen_usernames[values['username']]}."]
+        if duplicates:
+            report(line, duplicates)
+            continue
+        seen_emails[values['email']] = seen_usernames[values['username']] = line
+        valid.append((line, values))
+
+    taken_emails, taken_usernames = _existing_conflicts(list(seen_emails), list(seen_usernames))
+    for line, values in valid:
+        conflicts = {}
+        if values['email'] in taken_emails:
+            conflicts['email'] = ["A user with this email already exists."]
+        if values['username'] in taken_usernames:
+            conflicts['username'] = ["A user with this username already exists."]
+        if conflicts:
+            report(line, conflicts)
+    if errors:
+        raise ValidationError({'rows': errors})
+
+    passwords = hash_passwords([values.get('password') for _, values in valid], workers=hash_workers)
+    users = [
+        User(
+            email=values['email'],
+            username=values['username'],
+            first_name=values.get('first_name', ''),
+            last_name=values.get('last_name', ''),
+            password=password,
+        )
+        for (_, values), password in zip(valid, passwords)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=PROVISION_BATCH_SIZE)
+        if users and users[0].pk is None:
+            # Backends that do not return ids from bulk inserts
+            users = list(User.objects.filter(email__in=[user.email for user in users]))
+        for board in boards:
+            board.members.add(*users)
+    return users
@@ -0,0 +1,170 @@
+"""
+Refresh token revocation checks and blacklist cleanup.
+
+Every refresh rotates the token and blacklists the old one, so checking a
+token against ``BlacklistedToken`` would cost a query per refresh.
+``RevocableRefreshToken`` asks an in-process Bloom filter of the unexpired
+blacklisted jtis first and only queries the blacklist when the filter says
+the token may be in it, which rules out most tokens without a query.
+
+The filter catches up with rows blacklisted elsewhere when the shared cache's
+generation counter changes (each blacklisting bumps it on commit) and at least
+every ``REVOCATION_FILTER_SYNC_SECONDS``, and it is rebuilt from scratch every
+``REVOCATION_FILTER_REBUILD_SECONDS`` so expired jtis drop out of it.
+
+`manage.py purge_expired_tokens` keeps both tables from growing forever.
+"""
+import hashlib
+import math
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+GENERATION_KEY = 'auth:revocations:generation'
+
+# Blacklist rows are read again from this many ids below the last one seen,
+# so rows committed out of id order by concurrent transactions are not missed.
+# It only needs to cover the blacklistings in flight at once; rows read again
+# are already in the filter and do not count towards its capacity
+CATCH_UP_OVERLAP = 100
+
+MIN_CAPACITY = 10000
+
+
+class BloomFilter:
+    """A set of strings that can answer "definitely not in it" without false negatives."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, item):
+        """Add ``item``; items already in the filter are not counted again."""
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationFilter:
+    """Bloom filter over the unexpired blacklisted jtis, kept in sync with the blacklist."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._last_id = 0
+        self._generation = None
+        self._synced_at = self._built_at = 0
+
+    def _load(self, rows):
+        for pk, jti in rows:
+            self._bloom.add(jti)
+            self._last_id = max(self._last_id, pk)
+
+    def _blacklisted(self):
+        return BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list('pk', 'token__jti')
+
+    def _rebuild(self):
+        rows = list(self._blacklisted())
+        # Room for the rows blacklisted until the next rebuild
+        self._bloom = BloomFilter(max(MIN_CAPACITY, 2 * len(rows)), settings.REVOCATION_FILTER_ERROR_RATE)
+        self._last_id = 0
+        self._load(rows)
+        self._built_at = time.monotonic()
+
+    def _catch_up(self):
+        self._load(self._blacklisted().filter(pk__gt=self._last_id - CATCH_UP_OVERLAP))
+
+    def might_be_revoked(self, jti):
+        """Return False if ``jti`` is certainly not blacklisted, True if it may be."""
+        # Read the generation before the blacklist so no bump can be missed
+        generation = cache.get(GENERATION_KEY)
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._bloom is None
+                or now - self._built_at >= settings.REVOCATION_FILTER_REBUILD_SECONDS
+                or self._bloom.count > self._bloom.capacity
+            ):
+                self._rebuild()
+                self._generation, self._synced_at = generation, now
+            elif generation != self._generation or now - self._synced_at >= settings.REVOCATION_FILTER_SYNC_SECONDS:
+                self._catch_up()
+                self._generation, self._synced_at = generation, now
+            return jti in self._bloom
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+
+
+revocations = RevocationFilter()
+
+
+def announce_revocation(jti):
+    """Add ``jti`` to this process's filter and tell other processes to catch up on commit."""
+    revocations.add(jti)
+    transaction.on_commit(lambda: cache.set(GENERATION_KEY, uuid.uuid4().hex, None))
+
+
+class RevocableRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if revocations.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        announce_revocation(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+def purge_expired_tokens(batch_size=1000, pause=0):
+    """
+    Delete outstanding tokens past their expiry, and with them their
+    blacklist entries, in batches of ``batch_size``. Expired tokens fail
+    validation anyway, so their rows are no longer needed. Returns the number
+    of outstanding tokens deleted.
+    """
+    now = timezone.now()
+    deleted = 0
+    last_id = 0
+    while True:
+        # Walking the primary key finds the oldest (expired) tokens first
+        batch = list(
+            OutstandingToken.objects.filter(pk__gt=last_id, expires_at__lte=now)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        last_id = batch[-1]
+        OutstandingToken.objects.filter(pk__in=batch).delete()
+        deleted += len(batch)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,66 @@
+"""
+User autocomplete.
+
+Queries match case-insensitive prefixes of username, first or last name.
+Each field is searched with a range over its ``Lower()`` index, ordered by
+the indexed value and limited, so a search reads about ``limit`` index
+entries per field however many users there are. Ranges are used instead of
+LIKE, which databases only serve from an ordinary index under the C
+collation.
+
+Email addresses are never matched by prefix, which would let anyone probe
+them a character at a time: a query containing ``@`` only finds the account
+with exactly that address.
+"""
+from django.db.models.functions import Lower
+from .models import User
+
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+MIN_QUERY_LENGTH = 2
+MAX_RESULTS = 25
+
+
+def _prefix_search(users, field, prefix, limit):
+    # Every string starting with the prefix sorts between it and the prefix
+    # with its last character incremented
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return list(
+        users.annotate(search_key=Lower(field))
+        .filter(search_key__gte=prefix, search_key__lt=upper, search_key__startswith=prefix)
+        .order_by('search_key')[:limit]
+    )
+
+
+def is_email_query(query):
+    return '@' in query
+
+
+def search_users(query, exclude_board_id=None, limit=10):
+    """
+    Return up to ``limit`` users matching ``query``, username matches first.
+    ``"first last"`` queries match full names, and email addresses match
+    exactly. Users on ``exclude_board_id`` are left out.
+    """
+    terms = query.lower().split()
+    if not terms or len(' '.join(terms)) < MIN_QUERY_LENGTH:
+        return []
+    limit = min(limit, MAX_RESULTS)
+
+    users = User.objects.only('id', 'username', 'email', 'first_name', 'last_name', 'created_at')
+    if exclude_board_id is not None:
+        users = users.exclude(member_boards=exclude_board_id)
+
+    if is_email_query(query):
+        return list(users.annotate(email_key=Lower('email')).filter(email_key=query.strip().lower())[:1])
+
+    if len(terms) > 1:
+        users = users.annotate(last_name_key=Lower('last_name')).filter(last_name_key__startswith=' '.join(terms[1:]))
+        return _prefix_search(users, 'first_name', terms[0], limit)
+
+    results = {}
+    for field in SEARCH_FIELDS:
+        for user in _prefix_search(users, field, terms[0], limit):
+            results.setdefault(user.pk, user)
+        if len(results) >= limit:
+            break
+    return list(results.values())[:limit]
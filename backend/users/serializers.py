@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.exceptions import ValidationError
 from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.exceptions import InvalidToken
 from django.contrib.auth import get_user_model
-from .models import User, Notification
+from .models import User, Notification, NotificationPreference
+from .revocation import RevocableRefreshToken
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,6 +15,12 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+class UserSearchResultSerializer(serializers.ModelSerializer):
+    """Users found by name or username, without their email address."""
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name']
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
         write_only=True,
@@ -121,11 +129,68 @@ class LoginSerializer(serializers.Serializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'title', 'message', 'is_read', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'board', 'event', 'title', 'message', 'count', 'is_read', 'created_at']
+        read_only_fields = ['id', 'board', 'event', 'count', 'created_at']
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationPreference
+        fields = ['event', 'enabled']
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    before = serializers.DateTimeField(required=False)
+    all = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        if not (attrs.get('ids') is not None or attrs.get('before') or attrs['all']):
+            raise serializers.ValidationError("Provide ids, before or all.")
+        return attrs
+
+# Bulk invites are also charged one 'invite' throttle token per address
+MAX_BULK_INVITE_EMAILS = 25
+
+class BulkInviteSerializer(serializers.Serializer):
+    emails = serializers.ListField(child=serializers.EmailField(), allow_empty=False, max_length=MAX_BULK_INVITE_EMAILS)
+
+class ProvisionUserSerializer(serializers.Serializer):
+    """
+    One row of a provisioning CSV. Uniqueness is checked for the whole file
+    at once (see users.provisioning), so this serializer makes no queries.
+    """
+    email = serializers.EmailField()
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    full_name = serializers.CharField(max_length=255, required=False)
+    first_name = serializers.CharField(max_length=150, required=False)
+    last_name = serializers.CharField(max_length=150, required=False)
+    password = serializers.CharField(required=False)
+
+    def validate_email(self, value):
+        return value.lower()
+
+    def validate_password(self, value):
+        try:
+            validate_password(value)
+        except ValidationError as e:
+            raise serializers.ValidationError(list(e.messages))
+        return value
+
+    def validate(self, attrs):
+        full_name = attrs.pop('full_name', '')
+        if full_name and not (attrs.get('first_name') or attrs.get('last_name')):
+            name_parts = full_name.strip().split(' ', 1)
+            attrs['first_name'] = name_parts[0]
+            attrs['last_name'] = name_parts[1] if len(name_parts) > 1 else ''
+        return attrs
+
+class ProvisionUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    boards = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
 
 # FIX: Custom TokenRefreshSerializer to handle deleted users gracefully
 class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
     def validate(self, attrs):
         try:
             return super().validate(attrs)
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.db.models import Q
+from django.dispatch import receiver
+from boards.models import Board
+from .authentication import user_cache
+from .dashboard import touch_board, touch_user
+from .models import User, Notification
+from .notifications import adjust_unread_counts, forget_unread_count
+from .stream import publish
+
+@receiver([post_save, post_delete], sender=Notification)
+def invalidate_notification_dashboard(sender, instance, **kwargs):
+    touch_user(instance.user_id)
+
+@receiver(post_save, sender=Notification)
+def update_unread_count(sender, instance, created, **kwargs):
+    if created:
+        publish([instance.user_id])
+        if not instance.is_read:
+            adjust_unread_counts({instance.user_id: 1})
+    else:
+        # The previous read state is unknown, so count again on the next read
+        forget_unread_count(instance.user_id)
+
+@receiver(post_delete, sender=Notification)
+def forget_deleted_unread_count(sender, instance, **kwargs):
+    forget_unread_count(instance.user_id)
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+    touch_user(instance.pk)
+
+@receiver([post_save, pre_delete], sender=User)
+def invalidate_user_boards(sender, instance, created=False, **kwargs):
+    # Boards list their owner's and members' details; before a delete the
+    # memberships still exist
+    if not created:
+        touch_board(*Board.objects.filter(Q(owner=instance) | Q(members=instance)).values_list('pk', flat=True).distinct())
@@ -0,0 +1,147 @@
+"""
+Live notification delivery for long-poll and Server-Sent Events clients.
+
+Waiting requests sleep on an in-process condition that ``publish`` wakes when
+notifications are created, so an idle connection costs no queries. Writers in
+other processes (e.g. the notification worker) are noticed through a per-user
+token in the shared cache, checked every ``NOTIFICATION_STREAM_CHECK_SECONDS``.
+
+A waiting request holds a server thread, so the web process runs threaded
+workers (see the Procfile) and at most ``NOTIFICATION_STREAM_MAX_WAITERS``
+requests per process wait at a time; the rest are answered at once, like a
+short poll, and the client retries.
+
+Event IDs encode the notification's ``(created_at, id)``, which digests bump
+when they absorb another event, so resuming from ``Last-Event-ID`` also
+delivers updated digests.
+"""
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Notification
+
+STREAM_BATCH_LIMIT = 100
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class NotificationHub:
+    """Wakes requests waiting for a user's notifications in this process."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._versions = {}
+        self._waiters = 0
+
+    def version(self, user_id):
+        with self._condition:
+            return self._versions.get(user_id, 0)
+
+    def publish(self, user_ids):
+        with self._condition:
+            for user_id in user_ids:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._condition.notify_all()
+
+    def wait(self, user_id, version, timeout):
+        """Wait until ``user_id``'s version moves past ``version``; returns whether it did."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._versions.get(user_id, 0) != version, timeout)
+
+    @contextmanager
+    def waiting(self, limit):
+        """Claim one of ``limit`` waiting slots for the block; yields whether one was free."""
+        with self._condition:
+            admitted = self._waiters < limit
+            if admitted:
+                self._waiters += 1
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                with self._condition:
+                    self._waiters -= 1
+
+
+hub = NotificationHub()
+
+
+def _token_key(user_id):
+    return f'notifications:stream:{user_id}'
+
+
+def publish(user_ids):
+    """Wake streams for ``user_ids`` once the current transaction commits."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    def wake():
+        cache.set_many({_token_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None)
+        hub.publish(user_ids)
+
+    transaction.on_commit(wake)
+
+
+def encode_cursor(cursor):
+    created_at, pk = cursor
+    return f"{(created_at - EPOCH) // MICROSECOND}-{pk}"
+
+
+def event_id(notification):
+    return encode_cursor((notification.created_at, notification.pk))
+
+
+def decode_cursor(value):
+    """Return the ``(created_at, id)`` cursor encoded by ``value``, or None if invalid."""
+    try:
+        micros, pk = (int(part) for part in value.split('-', 1))
+        created_at = EPOCH + micros * MICROSECOND
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+    return created_at, pk
+
+
+def current_cursor():
+    return timezone.now(), 0
+
+
+def notifications_after(user, cursor):
+    """Return the user's notifications created (or bumped) after ``cursor``, oldest first."""
+    created_at, pk = cursor
+    return list(
+        Notification.objects.filter(user=user)
+        .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+        .order_by('created_at', 'pk')[:STREAM_BATCH_LIMIT]
+    )
+
+
+def wait_for_notifications(user, cursor, timeout, check_interval):
+    """
+    Return the user's notifications after ``cursor``, waiting up to
+    ``timeout`` seconds for some to arrive. The database is only queried on
+    entry and when this process or the shared cache reports new ones.
+    """
+    deadline = time.monotonic() + timeout
+    version = hub.version(user.pk)
+    token = cache.get(_token_key(user.pk))
+    notifications = notifications_after(user, cursor)
+
+    while not notifications:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        woken = hub.wait(user.pk, version, min(remaining, check_interval))
+        version = hub.version(user.pk)
+        latest = cache.get(_token_key(user.pk))
+        if woken or latest != token:
+            token = latest
+            notifications = notifications_after(user, cursor)
+    return notifications
@@ -1,9 +1,32 @@
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from io import StringIO
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.conf import settings
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from rest_framework_simplejwt.tokens import RefreshToken
+from boards.models import Board, Card
+from budget.models import Expense
+from users.models import Notification, NotificationJob, NotificationPreference, EmailOutbox
+from users.notifications import notify, notify_board, process_notification_jobs
+from users.revocation import BloomFilter, GENERATION_KEY, revocations
+from users.stream import NotificationHub, encode_cursor, event_id, hub
+from travelkanban.caching import current_versions, user_tag
 
 User = get_user_model()
 
@@ -178,4 +201,795 @@ class AuthAPITest(APITestCase):
         # Try to register with same email
         response = self.client.post(self.register_url, self.user_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('email', response.data)
\ No newline at end of file
+        self.assertIn('email', response.data)
+
+
+# Cached data is invalidated when writes commit, so these tests commit
+class DashboardTest(APITransactionTestCase):
+    """Test cases for the cached home-screen dashboard."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(
+            username='traveller',
+            email='traveller@example.com',
+            password='testpass123'
+        )
+        self.board = Board.objects.create(title='Peru', owner=self.user, budget=Decimal('1000.00'))
+        self.first_list = self.board.lists.order_by('position').first()
+        self.url = reverse('users:dashboard')
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def test_dashboard_contents(self):
+        """Test the dashboard reports spend, list counts, due cards and unread count."""
+        due = timezone.now().date() + timedelta(days=3)
+        Card.objects.create(list=self.first_list, title='Book hostel', position=0, due_date=due)
+        Card.objects.create(list=self.first_list, title='Someday', position=1)
+        Expense.objects.create(
+            board=self.board, title='Dinner', amount=Decimal('40.00'),
+            category='food', created_by=self.user
+        )
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        board = response.data['boards'][0]
+        self.assertEqual(board['spent'], '40.00')
+        self.assertEqual(board['remaining'], '960.00')
+        self.assertEqual(board['lists'][0]['card_count'], 2)
+        self.assertEqual([card['title'] for card in response.data['upcoming_due']], ['Book hostel'])
+        self.assertEqual(
+            response.data['unread_notifications'],
+            Notification.objects.filter(user=self.user, is_read=False).count()
+        )
+
+    def test_query_count_does_not_grow_with_boards(self):
+        """Test the dashboard is built with a fixed number of queries."""
+        for index in range(5):
+            Board.objects.create(title=f'Trip {index}', owner=self.user)
+        cache.clear()
+        # Authentication, then boards, spend, lists, due cards and unread count
+        with self.assertNumQueries(6):
+            self.client.get(self.url)
+
+    def test_cached_until_board_changes(self):
+        """Test repeat reads hit the cache and writes to a board invalidate it."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        Card.objects.create(list=self.first_list, title='New card', position=0)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['boards'][0]['lists'][0]['card_count'], 1)
+
+        Expense.objects.create(
+            board=self.board, title='Taxi', amount=Decimal('15.00'),
+            category='transport', created_by=self.user
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['boards'][0]['spent'], '15.00')
+
+    def test_membership_and_notifications_invalidate(self):
+        """Test joining a board and new notifications refresh the dashboard."""
+        other = User.objects.create_user(username='guide', email='guide@example.com', password='testpass123')
+        shared = Board.objects.create(title='Chile', owner=other)
+        self.client.get(self.url)
+
+        shared.members.add(self.user)
+        Notification.objects.create(user=self.user, title='Hello', message='Welcome')
+        response = self.client.get(self.url)
+        self.assertEqual({board['title'] for board in response.data['boards']}, {'Peru', 'Chile'})
+        self.assertEqual(
+            response.data['unread_notifications'],
+            Notification.objects.filter(user=self.user, is_read=False).count()
+        )
+
+
+@override_settings(NOTIFICATIONS_EAGER=False)
+class NotificationQueueTest(TestCase):
+    """Test cases for the queued notification pipeline."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.guide = User.objects.create_user(username='guide', email='guide@example.com', password='testpass123')
+        self.driver = User.objects.create_user(username='driver', email='driver@example.com', password='testpass123')
+
+    def test_signals_enqueue_instead_of_creating(self):
+        """Test that writes queue jobs and the worker creates the notifications."""
+        board = Board.objects.create(title='Peru', owner=self.owner)
+        card = Card.objects.create(list=board.lists.first(), title='Book transfer')
+        card.assigned_members.add(self.guide, self.driver)
+
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(NotificationJob.objects.count(), 2)
+
+        call_command('process_notifications', stdout=StringIO())
+        self.assertFalse(NotificationJob.objects.exists())
+        self.assertEqual(Notification.objects.get(user=self.owner).title, 'New board created')
+        assigned = Notification.objects.filter(title='Task assigned to you')
+        self.assertEqual(set(assigned.values_list('user_id', flat=True)), {self.guide.pk, self.driver.pk})
+        self.assertIn("board 'Peru'", assigned.first().message)
+
+    def test_deleted_recipients_skipped(self):
+        """Test that recipients deleted while queued do not fail the batch."""
+        board = Board.objects.create(title='Peru', owner=self.owner)
+        card = Card.objects.create(list=board.lists.first(), title='Book transfer')
+        card.assigned_members.add(self.guide, self.driver)
+        self.driver.delete()
+
+        call_command('process_notifications', stdout=StringIO())
+        self.assertFalse(NotificationJob.objects.exists())
+        self.assertEqual(Notification.objects.filter(title='Task assigned to you').count(), 1)
+
+
+    @override_settings(NOTIFICATION_JOB_MAX_ATTEMPTS=2, NOTIFICATION_JOB_RETRY_SECONDS=60)
+    def test_failing_jobs_are_retried_then_dropped(self):
+        """Test that a bad job neither blocks its batch nor stays queued forever."""
+        NotificationJob.objects.create(payload={'user_ids': [self.guide.pk]})
+        notify([self.owner.pk], title="Welcome", message="Hello")
+        self.assertEqual(str(NotificationJob.objects.last()), "Welcome for 1 users")
+
+        with self.assertLogs('users.notifications', 'ERROR'):
+            self.assertEqual(process_notification_jobs(), (1, 1))
+        self.assertEqual(Notification.objects.get().user, self.owner)
+        job = NotificationJob.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        # Not retried before its backoff runs out
+        self.assertEqual(process_notification_jobs(), (0, 0))
+        self.assertEqual(NotificationJob.objects.get().attempts, 1)
+
+        NotificationJob.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('users.notifications', 'ERROR') as logs:
+            process_notification_jobs()
+        self.assertIn('Dropping notification job', logs.output[-1])
+        self.assertFalse(NotificationJob.objects.exists())
+
+@override_settings(NOTIFICATIONS_EAGER=True)
+class BoardFanoutTest(APITestCase):
+    """Test cases for board-wide notification fan-out."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.guide = User.objects.create_user(username='guide', email='guide@example.com', password='testpass123')
+        self.driver = User.objects.create_user(username='driver', email='driver@example.com', password='testpass123')
+        self.board = Board.objects.create(title='Peru', owner=self.owner)
+        self.board.members.add(self.guide, self.driver)
+        self.lists = list(self.board.lists.order_by('position'))
+        access_token = str(RefreshToken.for_user(self.owner).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def test_card_move_notifies_other_members(self):
+        """Test that moving a card notifies members except the mover and those who muted it."""
+        NotificationPreference.objects.create(user=self.driver, event='card_moved', enabled=False)
+        card = Card.objects.create(list=self.lists[0], title='Book hostel')
+
+        response = self.client.patch(reverse('card-move', args=[card.pk]), {'new_list_id': self.lists[1].pk, 'new_position': 0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        moved = Notification.objects.filter(event='card_moved')
+        self.assertEqual(list(moved.values_list('user_id', 'board_id')), [(self.guide.pk, self.board.pk)])
+
+    def test_membership_change_notifies_existing_members(self):
+        """Test that members are told who joined, but the new member is not."""
+        hiker = User.objects.create_user(username='hiker', email='hiker@example.com', password='testpass123')
+        self.board.members.add(hiker)
+        joined = Notification.objects.filter(event='members_changed')
+        self.assertEqual(set(joined.values_list('user_id', flat=True)), {self.owner.pk, self.guide.pk, self.driver.pk})
+        self.assertIn('hiker joined', joined.first().message)
+
+    def test_fanout_is_one_select_and_one_insert(self):
+        """Test that fan-out cost does not grow with the number of members."""
+        self.board.members.add(*[
+            User.objects.create_user(username=f'member{i}', email=f'member{i}@example.com')
+            for i in range(50)
+        ])
+        Notification.objects.all().delete()
+        with self.assertNumQueries(2):
+            notify_board(self.board.pk, 'expense_added', 'Expense added', 'Dinner', exclude_user_ids=[self.owner.pk])
+        self.assertEqual(Notification.objects.count(), 52)
+
+    @override_settings(NOTIFICATION_FANOUT_EVENTS=['card_moved'])
+    def test_unconfigured_events_not_fanned_out(self):
+        """Test that events missing from NOTIFICATION_FANOUT_EVENTS only reach the actor."""
+        Notification.objects.all().delete()
+        Expense.objects.create(board=self.board, title='Dinner', amount=Decimal('20.00'), category='food', created_by=self.owner)
+        self.assertEqual(list(Notification.objects.values_list('user_id', flat=True)), [self.owner.pk])
+
+    def test_preferences_endpoint(self):
+        """Test that users can mute and unmute board events."""
+        url = reverse('users:notification_preferences')
+        response = self.client.put(url, [{'event': 'expense_added', 'enabled': False}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn({'event': 'expense_added', 'enabled': False}, response.data)
+        self.assertIn({'event': 'card_moved', 'enabled': True}, response.data)
+
+        response = self.client.put(url, [{'event': 'expense_added', 'enabled': True}], format='json')
+        self.assertIn({'event': 'expense_added', 'enabled': True}, response.data)
+        self.assertEqual(NotificationPreference.objects.filter(user=self.owner).count(), 1)
+
+
+# Cached data is invalidated when writes commit, so these tests commit
+class NotificationReadStateTest(APITransactionTestCase):
+    """Test cases for the unread counter and bulk mark-read."""
+
+    def setUp(self):
+        """Set up test data."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        Notification.objects.filter(user=self.user).delete()
+        self.notifications = [
+            Notification.objects.create(user=self.user, title=f'Update {i}', message='') for i in range(4)
+        ]
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def unread(self):
+        return self.client.get(reverse('users:notification_unread_count')).data['unread']
+
+    def test_unread_count_cached_and_kept_in_step(self):
+        """Test that the counter is served from cache and follows inserts."""
+        self.assertEqual(self.unread(), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 4)
+
+        Notification.objects.create(user=self.user, title='Another', message='')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 5)
+
+    def test_caches_change_only_when_writes_commit(self):
+        """Test that rolled-back writes leave counters alone and commits invalidate."""
+        self.assertEqual(self.unread(), 4)
+        with transaction.atomic():
+            Notification.objects.create(user=self.user, title='Draft', message='')
+            transaction.set_rollback(True)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 4)
+
+        versions = current_versions([user_tag(self.user.pk)])
+        with transaction.atomic():
+            Notification.objects.create(user=self.user, title='Update', message='')
+            self.assertEqual(current_versions([user_tag(self.user.pk)]), versions)
+        self.assertNotEqual(current_versions([user_tag(self.user.pk)]), versions)
+        self.assertEqual(self.unread(), 5)
+
+    def test_mark_read_by_ids_and_before(self):
+        """Test that bulk mark-read updates rows and the counter."""
+        self.assertEqual(self.unread(), 4)
+        url = reverse('users:notification_mark_read')
+        response = self.client.post(url, {'ids': [self.notifications[0].pk, self.notifications[1].pk]}, format='json')
+        self.assertEqual(response.data, {'updated': 2, 'unread': 2})
+
+        Notification.objects.filter(pk=self.notifications[2].pk).update(created_at=timezone.now() - timedelta(days=2))
+        response = self.client.post(url, {'before': (timezone.now() - timedelta(days=1)).isoformat()}, format='json')
+        self.assertEqual(response.data, {'updated': 1, 'unread': 1})
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 1)
+
+    def test_mark_read_only_touches_own_notifications(self):
+        """Test that ids belonging to another user are ignored."""
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        theirs = Notification.objects.create(user=other, title='Private', message='')
+        url = reverse('users:notification_mark_read')
+        response = self.client.post(url, {'ids': [theirs.pk]}, format='json')
+        self.assertEqual(response.data['updated'], 0)
+        theirs.refresh_from_db()
+        self.assertFalse(theirs.is_read)
+
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'all': True}, format='json')
+        self.assertEqual(response.data, {'updated': 4, 'unread': 0})
+
+
+@override_settings(NOTIFICATIONS_EAGER=True, NOTIFICATION_COALESCE_SECONDS=60)
+class NotificationCompactionTest(TestCase):
+    """Test cases for digest coalescing and retention."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        self.guide = User.objects.create_user(username='guide', email='guide@example.com', password='testpass123')
+        self.board = Board.objects.create(title='Peru', owner=self.owner)
+        self.board.members.add(self.guide)
+
+    def add_expense(self, title):
+        Expense.objects.create(board=self.board, title=title, amount=Decimal('10.00'), category='food', created_by=self.owner)
+
+    def test_bursts_coalesce_into_digest(self):
+        """Test that repeated events within the window bump one row's count."""
+        for title in ('Lunch', 'Taxi', 'Museum'):
+            self.add_expense(title)
+
+        digest = Notification.objects.get(user=self.guide, event='expense_added')
+        self.assertEqual(digest.count, 3)
+        self.assertIn('Museum', digest.message)
+        self.assertEqual(Notification.objects.get(user=self.owner, title='Budget updated').count, 3)
+
+    def test_read_or_old_notifications_start_new_rows(self):
+        """Test that read digests and events outside the window are not merged."""
+        self.add_expense('Lunch')
+        Notification.objects.filter(user=self.guide).update(is_read=True)
+        self.add_expense('Taxi')
+        Notification.objects.filter(user=self.guide, is_read=False).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.add_expense('Museum')
+        self.assertEqual(Notification.objects.filter(user=self.guide, event='expense_added').count(), 3)
+
+    @override_settings(NOTIFICATION_READ_RETENTION_DAYS=30, NOTIFICATION_UNREAD_RETENTION_DAYS=90)
+    def test_purge_applies_retention_in_batches(self):
+        """Test that the purge command deletes only notifications past retention."""
+        Notification.objects.all().delete()
+        now = timezone.now()
+        ages = [(True, 10), (True, 40), (True, 40), (False, 40), (False, 100)]
+        for is_read, days in ages:
+            notification = Notification.objects.create(user=self.guide, title='Old', message='', is_read=is_read)
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(days=days))
+
+        out = StringIO()
+        call_command('purge_notifications', '--batch-size', '1', stdout=out)
+        self.assertIn('Notifications purged: 3', out.getvalue())
+        self.assertEqual(
+            sorted(Notification.objects.values_list('is_read', flat=True)), [False, True]
+        )
+
+
+@override_settings(NOTIFICATION_STREAM_TIMEOUT=0, NOTIFICATION_STREAM_CHECK_SECONDS=0.01)
+class NotificationStreamTest(APITestCase):
+    """Test cases for the long-poll and SSE notification stream."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        self.url = reverse('users:notification_stream')
+        self.cursor = encode_cursor((timezone.now() - timedelta(seconds=1), 0))
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def test_long_poll_resumes_from_cursor(self):
+        """Test that the long-poll returns notifications after last_event_id."""
+        first = Notification.objects.create(user=self.user, title='First', message='')
+        second = Notification.objects.create(user=self.user, title='Second', message='')
+
+        response = self.client.get(self.url, {'last_event_id': event_id(first)})
+        self.assertEqual([n['title'] for n in response.data['notifications']], ['Second'])
+        self.assertEqual(response.data['last_event_id'], event_id(second))
+
+        response = self.client.get(self.url, {'last_event_id': response.data['last_event_id']})
+        self.assertEqual(response.data['notifications'], [])
+        self.assertEqual(response.data['last_event_id'], event_id(second))
+
+    def test_event_stream_with_last_event_id(self):
+        """Test that SSE clients get id-tagged events after Last-Event-ID."""
+        notification = Notification.objects.create(user=self.user, title='Hello', message='')
+        Notification.objects.create(user=User.objects.create_user(username='other', email='other@example.com'), title='Private', message='')
+
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID=self.cursor)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn(f'id: {event_id(notification)}\nevent: notification\n', body)
+        self.assertNotIn('Private', body)
+
+    @override_settings(NOTIFICATION_STREAM_TIMEOUT=30, NOTIFICATION_STREAM_MAX_WAITERS=0)
+    def test_full_streams_answer_at_once(self):
+        """Test that requests beyond the waiting limit return without waiting."""
+        started = time.monotonic()
+        response = self.client.get(self.url, {'last_event_id': self.cursor})
+        self.assertEqual(response.data['notifications'], [])
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(b''.join(response.streaming_content).decode(), 'retry: 10\n\n')
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_publish_wakes_waiters_after_commit(self):
+        """Test that new notifications wake waiting streams once committed."""
+        version = hub.version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, title='Hello', message='')
+            self.assertEqual(hub.version(self.user.pk), version)
+        self.assertEqual(hub.version(self.user.pk), version + 1)
+
+    def test_hub_wait(self):
+        """Test that the hub wakes a waiting thread without polling."""
+        local_hub = NotificationHub()
+        woken = []
+        waiter = threading.Thread(target=lambda: woken.append(local_hub.wait(1, 0, timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        local_hub.publish([1])
+        waiter.join()
+        self.assertEqual(woken, [True])
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertFalse(local_hub.wait(2, 0, timeout=0))
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    """Locmem backend that counts connections opened."""
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+class FailingEmailBackend(LocmemEmailBackend):
+    """Backend whose sends always fail, like an unreachable mail server."""
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("Mail server unavailable")
+
+
+class EmailOutboxTest(APITestCase):
+    """Test cases for queued invitation emails."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        # Throttle buckets live in the cache and ids are reused across tests
+        cache.clear()
+
+    def send_outbox(self):
+        call_command('send_outbox', stdout=StringIO())
+
+    def test_invite_is_queued_then_sent(self):
+        """Test that invitations are only sent by the outbox worker."""
+        response = self.client.post(reverse('invite'), {'email': 'friend@example.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.send_outbox()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['friend@example.com'])
+        self.assertEqual(EmailOutbox.objects.get().status, 'sent')
+
+    @override_settings(EMAIL_BACKEND='users.tests.CountingEmailBackend')
+    def test_bulk_invite_uses_one_connection(self):
+        """Test that bulk invitations are deduplicated and sent over one connection."""
+        CountingEmailBackend.opened = 0
+        User.objects.create_user(username='mixed', email='Mixed@Example.com')
+        response = self.client.post(reverse('invite-bulk'), {
+            'emails': ['a@example.com', 'B@example.com', 'b@example.com', 'traveller@example.com', 'mixed@example.com'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data, {'queued': 4})
+
+        self.send_outbox()
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 4)
+        for address in ('traveller@example.com', 'mixed@example.com'):
+            existing = next(message for message in mail.outbox if message.to == [address])
+            self.assertIn('Log in to view your boards', existing.body)
+
+        response = self.client.post(reverse('invite-bulk'), {'emails': ['not-an-email']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        EMAIL_BACKEND='users.tests.FailingEmailBackend', EMAIL_OUTBOX_RETRY_SECONDS=60, EMAIL_OUTBOX_MAX_ATTEMPTS=2
+    )
+    def test_failed_sends_back_off_then_give_up(self):
+        """Test that failures are retried later and eventually marked failed."""
+        self.client.post(reverse('invite'), {'email': 'friend@example.com'}, format='json')
+        self.send_outbox()
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertIn('Mail server unavailable', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        # Not due yet, so nothing is attempted
+        self.send_outbox()
+        self.assertEqual(EmailOutbox.objects.get().attempts, 1)
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        self.send_outbox()
+        email = EmailOutbox.objects.get()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
+
+
+class CachedAuthenticationTest(APITestCase):
+    """Test cases for the cached JWT user lookup."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        access_token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.url = reverse('users:notification_unread_count')
+        cache.clear()
+
+    def test_repeat_requests_skip_user_query(self):
+        """Test that only the first request loads the user."""
+        with self.assertNumQueries(2):  # User, then unread count
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_takes_effect_immediately(self):
+        """Test that saving the user drops the cached copy."""
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=0)
+    def test_expired_entries_are_reloaded(self):
+        """Test that users are loaded again once their entry expires."""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+
+class TokenRevocationTest(APITestCase):
+    """Test cases for the blacklist filter and expired token purge."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        revocations.reset()
+        cache.clear()
+
+    def refresh_token(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(token)}, format='json')
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test that every added item is found and few others are."""
+        bloom = BloomFilter(1000, 0.01)
+        for index in range(1000):
+            bloom.add(f'jti-{index}')
+        self.assertTrue(all(f'jti-{index}' in bloom for index in range(1000)))
+        false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+    @override_settings(REVOCATION_FILTER_SYNC_SECONDS=0)
+    def test_catch_ups_do_not_fill_the_filter(self):
+        """Test that rows read again by each catch-up are not counted again."""
+        for _ in range(3):
+            RefreshToken.for_user(self.user).blacklist()
+        revocations.might_be_revoked(self.refresh['jti'])
+        built_at, count = revocations._built_at, revocations._bloom.count
+
+        for _ in range(5):
+            revocations.might_be_revoked(self.refresh['jti'])
+        self.assertEqual((revocations._built_at, revocations._bloom.count), (built_at, count))
+        self.assertEqual(count, 3)
+
+    def test_rotated_and_logged_out_tokens_are_rejected(self):
+        """Test that blacklisted refresh tokens cannot be used again."""
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        rotated = response.data['refresh']
+        response = self.client.post(reverse('logout'), {'refresh': rotated}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh_token(rotated).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unrevoked_tokens_skip_the_blacklist(self):
+        """Test that the filter answers for tokens that were never blacklisted."""
+        revoked = RefreshToken.for_user(self.user)
+        revoked.blacklist()
+        self.assertTrue(revocations.might_be_revoked(revoked['jti']))
+        with self.assertNumQueries(0):
+            self.assertFalse(revocations.might_be_revoked(self.refresh['jti']))
+
+    def test_catches_up_with_other_processes(self):
+        """Test that a generation bump makes the filter read new blacklist rows."""
+        self.assertFalse(revocations.might_be_revoked(self.refresh['jti']))
+        # Blacklisted elsewhere: the row exists but this process's filter was not told
+        token = OutstandingToken.objects.get(jti=self.refresh['jti'])
+        BlacklistedToken.objects.create(token=token)
+        self.assertFalse(revocations.might_be_revoked(self.refresh['jti']))
+
+        cache.set(GENERATION_KEY, 'bumped')
+        self.assertTrue(revocations.might_be_revoked(self.refresh['jti']))
+
+    def test_purge_expired_tokens(self):
+        """Test that only expired tokens and their blacklist rows are deleted."""
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+
+        call_command('purge_expired_tokens', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [self.refresh['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+def throttle_rates(num_proxies=0, **rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'NUM_PROXIES': num_proxies,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class ThrottlingTest(APITestCase):
+    """Test cases for the token bucket throttles."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='testpass123')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        cache.clear()
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    @throttle_rates(login='2/min')
+    def test_login_burst_is_rejected_with_retry_after(self):
+        """Test that logins past the bucket size get a 429 until a token refills."""
+        credentials = {'email': 'traveller@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            self.assertNotEqual(self.client.post(reverse('login'), credentials, format='json').status_code, 429)
+
+        response = self.client.post(reverse('login'), credentials, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # A token is due 30 seconds after the burst, less the time it took
+        self.assertIn(int(response['Retry-After']), range(25, 31))
+
+    @throttle_rates(num_proxies=1, login='1/min')
+    def test_spoofed_forwarded_for_shares_the_bucket(self):
+        """Test that anonymous buckets key on the address the proxy saw."""
+        credentials = {'email': 'traveller@example.com', 'password': 'wrong'}
+
+        def login(forwarded_for):
+            return self.client.post(reverse('login'), credentials, format='json', HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+        self.assertNotEqual(login('10.0.0.1, 203.0.113.7'), 429)
+        self.assertEqual(login('10.0.0.2, 203.0.113.7'), 429)
+        self.assertNotEqual(login('198.51.100.4'), 429)
+
+    @throttle_rates(invite='1/hour')
+    def test_scoped_buckets_are_per_user(self):
+        """Test that one user's exhausted bucket does not affect another's."""
+        self.authenticate(self.user)
+        self.assertEqual(self.client.post(reverse('invite'), {'email': 'a@example.com'}, format='json').status_code, 202)
+        self.assertEqual(self.client.post(reverse('invite-bulk'), {'emails': ['b@example.com']}, format='json').status_code, 429)
+
+        self.authenticate(self.other)
+        self.assertEqual(self.client.post(reverse('invite'), {'email': 'a@example.com'}, format='json').status_code, 202)
+
+    @throttle_rates(invite='5/hour')
+    def test_bulk_invites_take_a_token_per_address(self):
+        """Test that bulk invites are charged per recipient, not per request."""
+        self.authenticate(self.user)
+        emails = [f'friend{index}@example.com' for index in range(4)]
+        self.assertEqual(self.client.post(reverse('invite-bulk'), {'emails': emails}, format='json').status_code, 202)
+        self.assertEqual(self.client.post(reverse('invite-bulk'), {'emails': emails[:2]}, format='json').status_code, 429)
+        self.assertEqual(self.client.post(reverse('invite'), {'email': emails[0]}, format='json').status_code, 202)
+
+    @throttle_rates(writes='1/min')
+    def test_reads_do_not_use_write_tokens(self):
+        """Test that safe methods are only limited by the per-user bucket."""
+        self.authenticate(self.user)
+        url = reverse('users:notification_mark_read')
+        self.assertEqual(self.client.post(url, {'all': True}, format='json').status_code, 200)
+        self.assertEqual(self.client.post(url, {'all': True}, format='json').status_code, 429)
+        self.assertEqual(self.client.get(reverse('users:notification_unread_count')).status_code, 200)
+
+
+class UserSearchTest(APITestCase):
+    """Test cases for user autocomplete."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create_user(username='traveller', email='traveller@example.com')
+        self.anna = User.objects.create_user(username='anna_s', email='anna@example.com', first_name='Anna', last_name='Smith')
+        self.annika = User.objects.create_user(username='nika', email='Annika@Example.com', first_name='Annika', last_name='Berg')
+        self.bob = User.objects.create_user(username='bobby', email='bob@example.com', first_name='Bob', last_name='Annan')
+        self.board = Board.objects.create(title='Road trip', owner=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.url = reverse('users:user_search')
+
+    def search(self, **params):
+        params.setdefault('board', self.board.pk)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['username'] for user in response.data]
+
+    def test_prefix_matches_are_case_insensitive(self):
+        """Test that username and name prefixes match, username matches first."""
+        self.assertEqual(self.search(q='ANN'), ['anna_s', 'nika', 'bobby'])
+        self.assertEqual(self.search(q='nik'), ['nika'])
+        self.assertEqual(self.search(q='nn'), [])
+
+    def test_full_name_and_short_queries(self):
+        """Test that two terms match first and last names and short queries match nothing."""
+        self.assertEqual(self.search(q='anna smi'), ['anna_s'])
+        self.assertEqual(self.search(q='a'), [])
+
+    def test_emails_are_not_exposed(self):
+        """Test that emails only match in full and prefix results omit them."""
+        response = self.client.get(self.url, {'q': 'ann', 'board': self.board.pk})
+        self.assertNotIn('email', response.data[0])
+        self.assertEqual(self.search(q='annika@'), [])
+        self.assertEqual(self.search(q='ANNIKA@example.com'), ['nika'])
+
+        response = self.client.get(self.url, {'q': 'annika@example.com'})
+        self.assertEqual([user['username'] for user in response.data], ['nika'])
+        self.assertIn('email', response.data[0])
+        response = self.client.get(self.url, {'q': 'ann'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_board_members_are_excluded(self):
+        """Test that searching for a board leaves out its members."""
+        self.board.members.add(self.anna)
+        self.assertEqual(self.search(q='ann', board=self.board.pk), ['nika', 'bobby'])
+
+        other = Board.objects.create(title='Not mine', owner=self.bob)
+        response = self.client.get(self.url, {'q': 'ann', 'board': other.pk})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisioningTest(APITestCase):
+    """Test cases for bulk user provisioning."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        self.board = Board.objects.create(title='Agency trip', owner=self.admin)
+        self.url = reverse('users:user_provision')
+
+    def csv_file(self, rows):
+        lines = ['email,username,full_name,password'] + [','.join(row) for row in rows]
+        return SimpleUploadedFile('users.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+    @override_settings(PROVISION_HASH_WORKERS=2)
+    def test_command_creates_users_and_memberships(self):
+        """Test that users are created with hashed passwords and added to the board."""
+        rows = [(f'Guest{index}@Example.com', f'guest{index}', f'Guest Number{index}', f'secret-pass-{index}') for index in range(10)]
+        rows.append(('nopass@example.com', 'nopass', 'No Password', ''))
+        with tempfile.NamedTemporaryFile(suffix='.csv') as path:
+            path.write(self.csv_file(rows).read())
+            path.flush()
+            call_command('provision_users', path.name, '--board', str(self.board.pk), stdout=StringIO())
+
+        guest = User.objects.get(email='guest3@example.com')
+        self.assertEqual((guest.first_name, guest.last_name), ('Guest', 'Number3'))
+        self.assertTrue(guest.check_password('secret-pass-3'))
+        self.assertFalse(User.objects.get(username='nopass').has_usable_password())
+        self.assertEqual(self.board.members.count(), 12)
+
+    def test_conflicts_are_reported_and_nothing_is_created(self):
+        """Test that existing and repeated emails or usernames fail the whole file."""
+        self.client.force_authenticate(self.admin)
+        upload = self.csv_file([
+            ('new@example.com', 'newbie', 'New Person', 'secret-pass-1'),
+            ('ADMIN@example.com', 'other', 'Taken Email', 'secret-pass-2'),
+            ('another@example.com', 'newbie', 'Repeated Username', 'secret-pass-3'),
+        ])
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['rows']), {'3', '4'})
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_non_utf8_csv_is_rejected(self):
+        """Test that a Latin-1 upload is refused with the failing line and creates nobody."""
+        self.client.force_authenticate(self.admin)
+        content = 'email,username,full_name\nnew@example.com,newbie,José Núñez\n'.encode('latin-1')
+        upload = SimpleUploadedFile('users.csv', content, content_type='text/csv')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Line 2', response.data['file'][0])
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_endpoint_is_staff_only(self):
+        """Test that only staff can provision users through the API."""
+        member = User.objects.create_user(username='member', email='member@example.com')
+        self.client.force_authenticate(member)
+        upload = self.csv_file([('new@example.com', 'newbie', 'New Person', 'secret-pass-1')])
+        self.assertEqual(self.client.post(self.url, {'file': upload}, format='multipart').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        upload = self.csv_file([('new@example.com', 'newbie', 'New Person', 'secret-pass-1')])
+        response = self.client.post(self.url, {'file': upload, 'boards': [self.board.pk]}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(self.board.members.filter(username='newbie').exists())
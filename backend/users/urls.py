@@ -10,6 +10,19 @@ urlpatterns = [
 
     # Notifications
     path('notifications/', views.NotificationListView.as_view(), name='notifications'),
+    path('notifications/stream/', views.NotificationStreamView.as_view(), name='notification_stream'),
+    path('notifications/unread-count/', views.NotificationUnreadCountView.as_view(), name='notification_unread_count'),
+    path('notifications/mark-read/', views.NotificationMarkReadView.as_view(), name='notification_mark_read'),
+    path('notifications/preferences/', views.NotificationPreferenceView.as_view(), name='notification_preferences'),
+
+    # Autocomplete for adding board members
+    path('search/', views.UserSearchView.as_view(), name='user_search'),
+
+    # Bulk account creation from CSV (staff only)
+    path('provision/', views.ProvisionUsersView.as_view(), name='user_provision'),
+
+    # Home-screen dashboard
+    path('me/dashboard/', views.DashboardView.as_view(), name='dashboard'),
 
     # Future user management endpoints
     # These will be useful when you need user listing, searching, etc.
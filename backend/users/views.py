@@ -2,13 +2,30 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
+import json
+import time
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.core.mail import send_mail
-from .models import User, Notification
-from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, NotificationSerializer, CustomTokenRefreshSerializer
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.http import StreamingHttpResponse
+from boards.models import Board
+from budget.imports import iter_csv_rows
+from travelkanban.caching import CachedResponseMixin, user_tag
+from .models import User, Notification, NotificationPreference
+from .dashboard import get_dashboard
+from .notifications import mark_read, unread_count
+from .outbox import enqueue_email, enqueue_emails
+from .provisioning import provision_users
+from .revocation import RevocableRefreshToken
+from .search import is_email_query, search_users
+from .stream import current_cursor, decode_cursor, encode_cursor, event_id, hub, wait_for_notifications
+from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, NotificationSerializer, NotificationPreferenceSerializer, MarkReadSerializer, BulkInviteSerializer, MAX_BULK_INVITE_EMAILS, ProvisionUploadSerializer, CustomTokenRefreshSerializer, UserSearchResultSerializer
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
@@ -16,6 +33,7 @@ from django.utils.decorators import method_decorator
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
     serializer_class = RegisterSerializer
 
     def create(self, request, *args, **kwargs):
@@ -36,6 +54,7 @@ class RegisterView(generics.CreateAPIView):
 @method_decorator(csrf_exempt, name='dispatch')
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = LoginSerializer
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -83,7 +102,7 @@ class LogoutView(APIView):
         try:
             refresh_token = request.data.get("refresh")
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = RevocableRefreshToken(refresh_token)
                 token.blacklist()
                 return Response({
                     'message': 'Successfully logged out'
@@ -118,30 +137,226 @@ def health_check(request):
         'status': 'healthy'
     }, status=status.HTTP_200_OK)
 
+INVITE_SUBJECT = 'Invitation to Join TripBoard'
+INVITE_MESSAGE = 'You have been invited to join TripBoard. Please register or log in to collaborate on travel plans.'
+INVITE_MESSAGE_EXISTING = 'You have been invited to join a team on TripBoard. Log in to view your boards.'
+
 # FIXED: Added csrf_exempt decorator to InviteView
 @method_decorator(csrf_exempt, name='dispatch')
 class InviteView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'invite'
 
     def post(self, request):
         email = request.data.get('email')
         if not email:
             return Response({'error': 'Email is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        subject = 'Invitation to Join TripBoard'
-        message = 'You have been invited to join TripBoard. Please register or log in to collaborate on travel plans.'
-        from_email = 'noreply@tripboard.com'
-        recipient_list = [email]
-
+        message = INVITE_MESSAGE
         if User.objects.filter(email=email).exists():
-            message = 'You have been invited to join a team on TripBoard. Log in to view your boards.'
+            message = INVITE_MESSAGE_EXISTING
+
+        # Sent by `manage.py send_outbox`, so a slow mail server never stalls the request
+        enqueue_email(email, INVITE_SUBJECT, message)
+        return Response({'message': 'Invitation queued'}, status=status.HTTP_202_ACCEPTED)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BulkInviteView(APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_scope = 'invite'
 
-        send_mail(subject, message, from_email, recipient_list)
-        return Response({'message': 'Invitation sent successfully'}, status=status.HTTP_200_OK)
+    def get_throttle_cost(self, request):
+        # One invite token per address, so batches do not multiply the rate.
+        # Oversized lists are rejected by validation, not charged in full
+        emails = request.data.get('emails') if hasattr(request.data, 'get') else None
+        return min(len(emails), MAX_BULK_INVITE_EMAILS) if isinstance(emails, list) and emails else 1
 
-class NotificationListView(generics.ListAPIView):
+    def post(self, request):
+        serializer = BulkInviteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        emails = list(dict.fromkeys(email.lower() for email in serializer.validated_data['emails']))
+
+        existing = set(
+            User.objects.annotate(email_key=Lower('email'))
+            .filter(email_key__in=emails)
+            .values_list('email_key', flat=True)
+        )
+        enqueue_emails([
+            (email, INVITE_SUBJECT, INVITE_MESSAGE_EXISTING if email in existing else INVITE_MESSAGE)
+            for email in emails
+        ])
+        return Response({'queued': len(emails)}, status=status.HTTP_202_ACCEPTED)
+
+class NotificationListView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_cache_tags(self, request):
+        return [user_tag(request.user.pk)]
+
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
\ No newline at end of file
+        queryset = Notification.objects.filter(user=self.request.user)
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            queryset = queryset.filter(is_read=False)
+        return queryset.order_by('-created_at')
+
+class NotificationUnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'unread': unread_count(request.user.pk)})
+
+class NotificationMarkReadView(APIView):
+    """Mark notifications read by id, created before a timestamp, or all of them"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = mark_read(
+            request.user,
+            ids=serializer.validated_data.get('ids'),
+            before=serializer.validated_data.get('before'),
+        )
+        return Response({'updated': updated, 'unread': unread_count(request.user.pk)})
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients negotiate text/event-stream; the view streams the body itself."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error responses are rendered (e.g. 401), as JSON
+        return JSONRenderer().render(data)
+
+class NotificationStreamView(APIView):
+    """
+    New notifications as they arrive: Server-Sent Events when the client
+    accepts text/event-stream, otherwise a long-poll returning JSON as soon as
+    there is something to deliver. Both resume from Last-Event-ID (or
+    ?last_event_id=) and close after NOTIFICATION_STREAM_TIMEOUT seconds, or
+    at once when NOTIFICATION_STREAM_MAX_WAITERS requests are already waiting.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def get(self, request):
+        # Without a valid cursor, deliver only notifications from now on
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        cursor = (decode_cursor(last_event_id) if last_event_id else None) or current_cursor()
+        timeout = settings.NOTIFICATION_STREAM_TIMEOUT
+
+        if request.accepted_renderer.format == 'event-stream':
+            response = StreamingHttpResponse(self.events(request.user, cursor, timeout), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        with hub.waiting(settings.NOTIFICATION_STREAM_MAX_WAITERS) as admitted:
+            notifications = wait_for_notifications(
+                request.user, cursor, timeout if admitted else 0, settings.NOTIFICATION_STREAM_CHECK_SECONDS
+            )
+        return Response({
+            'notifications': NotificationSerializer(notifications, many=True).data,
+            'last_event_id': event_id(notifications[-1]) if notifications else encode_cursor(cursor),
+        })
+
+    def events(self, user, cursor, timeout):
+        check_interval = settings.NOTIFICATION_STREAM_CHECK_SECONDS
+        with hub.waiting(settings.NOTIFICATION_STREAM_MAX_WAITERS) as admitted:
+            if not admitted:
+                # Deliver what is there and have the client come back later
+                timeout = 0
+            deadline = time.monotonic() + timeout
+            yield f'retry: {1000 if admitted else round(check_interval * 1000)}\n\n'
+            while True:
+                remaining = max(deadline - time.monotonic(), 0)
+                notifications = wait_for_notifications(user, cursor, min(remaining, check_interval), check_interval)
+                if notifications:
+                    for notification in notifications:
+                        data = json.dumps(NotificationSerializer(notification).data)
+                        yield f"id: {event_id(notification)}\nevent: notification\ndata: {data}\n\n"
+                    cursor = (notifications[-1].created_at, notifications[-1].pk)
+                elif remaining <= 0:
+                    return
+                else:
+                    yield ': keepalive\n\n'
+
+class NotificationPreferenceView(APIView):
+    """Which board-wide notification events the user receives"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        muted = set(
+            NotificationPreference.objects.filter(user=request.user, enabled=False).values_list('event', flat=True)
+        )
+        return Response([
+            {'event': event, 'enabled': event not in muted}
+            for event, _ in Notification.EVENT_CHOICES
+        ])
+
+    def put(self, request):
+        serializer = NotificationPreferenceSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        # The last entry wins when an event is listed twice
+        choices = {item['event']: item['enabled'] for item in serializer.validated_data}
+        NotificationPreference.objects.bulk_create(
+            [NotificationPreference(user=request.user, event=event, enabled=enabled) for event, enabled in choices.items()],
+            update_conflicts=True,
+            unique_fields=['user', 'event'],
+            update_fields=['enabled'],
+        )
+        return self.get(request)
+
+class UserSearchView(APIView):
+    """
+    Find users to add to ``?board=`` (a board the requester belongs to) by
+    username or name prefix, leaving out its members. Results carry no email
+    addresses; a full email address finds its account, with or without a
+    board.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        board_id = request.query_params.get('board')
+        if board_id is not None:
+            board_id = board_id if board_id.isdigit() else None
+            if board_id is None or not Board.objects.filter(
+                Q(owner=request.user) | Q(members=request.user), pk=board_id
+            ).exists():
+                return Response({'error': 'Board not found'}, status=status.HTTP_404_NOT_FOUND)
+        elif not is_email_query(query):
+            # Searching everyone by name would let any user list every account
+            return Response({'error': 'board is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        users = search_users(query, exclude_board_id=board_id, limit=max(limit, 1))
+        # Whoever typed a full address already knows it
+        serializer_class = UserSerializer if is_email_query(query) else UserSearchResultSerializer
+        return Response(serializer_class(users, many=True).data)
+
+
+class ProvisionUsersView(APIView):
+    """Create users from a CSV upload and optionally add them to boards (staff only)"""
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        serializer = ProvisionUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Passwords are hashed inline; only the management command forks a pool
+        users = provision_users(
+            iter_csv_rows(serializer.validated_data['file']),
+            board_ids=serializer.validated_data['boards'],
+        )
+        return Response({'created': len(users)}, status=status.HTTP_201_CREATED)
+
+
+class DashboardView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_dashboard(request.user))